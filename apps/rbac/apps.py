@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class RbacConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "rbac"
+
+    def ready(self):
+        # 注册RBAC信号：角色/权限变更时失效用户权限缓存
+        from . import signals  # noqa: F401
@@ -0,0 +1,124 @@
+# apps/rbac/assign.py
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from .materialize import BATCH_SIZE, _chunks, refresh_role_users, refresh_user_permissions
+from .models import Role, RoleClosure
+from .services import bump_rbac_version, invalidate_user_permissions
+
+User = get_user_model()
+UserRole = User.roles.through
+RolePermission = Role.permissions.through
+
+# 批量分配的操作类型
+ACTION_ADD = 'add'
+ACTION_REMOVE = 'remove'
+ACTION_SET = 'set'
+ACTIONS = (ACTION_ADD, ACTION_REMOVE, ACTION_SET)
+
+
+def _diff_pairs(existing_pairs, owner_ids, target_ids, action):
+    """
+    计算关联记录的差集
+    :param existing_pairs: 现有的(所属ID, 目标ID)集合
+    :return: (待新增的(所属ID, 目标ID)列表, 待删除的(所属ID, 目标ID)列表)
+    """
+    target_ids = set(target_ids)
+    to_add = []
+    to_remove = []
+    for owner_id in owner_ids:
+        if action in (ACTION_ADD, ACTION_SET):
+            to_add.extend((owner_id, target_id) for target_id in target_ids if (owner_id, target_id) not in existing_pairs)
+        if action == ACTION_REMOVE:
+            to_remove.extend((owner_id, target_id) for target_id in target_ids if (owner_id, target_id) in existing_pairs)
+    if action == ACTION_SET:
+        to_remove.extend(pair for pair in existing_pairs if pair[1] not in target_ids)
+    return to_add, to_remove
+
+
+def held_role_ids(user):
+    """
+    用户实际拥有的角色ID集合：直接分配的角色及其继承的祖先角色（祖先角色的权限是其子集）
+    用于限制非超级管理员只能分配/移除自己已拥有的角色，避免借批量分配提升权限
+    """
+    direct_role_ids = UserRole.objects.filter(user_id=user.pk).values('role_id')
+    return set(
+        RoleClosure.objects.filter(descendant_id__in=direct_role_ids).values_list('ancestor_id', flat=True)
+    )
+
+
+def unassignable_role_ids(user, user_ids, role_ids, action=ACTION_SET):
+    """
+    校验操作者能否执行本次批量分配：超级管理员不受限制；
+    其他用户新增/移除的角色、以及set覆盖时将被移除的角色，都必须是操作者已拥有的角色
+    :return: 超出操作者权限范围的角色ID集合（为空表示允许）
+    """
+    if user.is_superuser:
+        return set()
+    touched = set(role_ids)
+    if action == ACTION_SET:
+        touched |= set(
+            UserRole.objects.filter(user_id__in=user_ids).exclude(role_id__in=role_ids)
+            .order_by().values_list('role_id', flat=True).distinct()
+        )
+    return touched - held_role_ids(user)
+
+
+def assign_user_roles(user_ids, role_ids, action=ACTION_SET):
+    """
+    批量分配/移除用户角色：与中间表现有记录比对，仅批量插入/删除差异部分（事务内执行）
+    直接操作中间表不会触发m2m_changed信号，因此在此统一刷新物化权限，并在事务提交后失效一次缓存
+    :param user_ids: 用户ID可迭代对象
+    :param role_ids: 角色ID可迭代对象（需已校验存在）
+    :param action: add（追加）/ remove（移除）/ set（覆盖为指定角色）
+    :return: {'added': 新增条数, 'removed': 删除条数, 'users': 受影响用户数}
+    """
+    role_ids = set(role_ids)
+    user_ids = set(user_ids)
+    with transaction.atomic():
+        # 1. 分批读取现有记录（仅读取涉及的用户），收集为 {(用户ID, 角色ID): 中间表主键}
+        existing = {}
+        for chunk in _chunks(user_ids):
+            existing_rows = UserRole.objects.filter(user_id__in=chunk)
+            if action != ACTION_SET:
+                existing_rows = existing_rows.filter(role_id__in=role_ids)
+            existing.update(
+                ((user_id, role_id), pk) for pk, user_id, role_id in existing_rows.values_list('pk', 'user_id', 'role_id')
+            )
+
+        # 2. 计算差集后，整批删除一次、整批插入一次（bulk_create按BATCH_SIZE分批提交参数）
+        to_add, to_remove = _diff_pairs(existing.keys(), user_ids, role_ids, action)
+        removed = UserRole.objects.filter(pk__in=[existing[pair] for pair in to_remove]).delete()[0] if to_remove else 0
+        UserRole.objects.bulk_create(
+            [UserRole(user_id=user_id, role_id=role_id) for user_id, role_id in to_add], batch_size=BATCH_SIZE
+        )
+        added = len(to_add)
+        changed_user_ids = {user_id for user_id, _ in to_add} | {user_id for user_id, _ in to_remove}
+
+        if changed_user_ids:
+            refresh_user_permissions(changed_user_ids)
+            transaction.on_commit(lambda: invalidate_user_permissions(changed_user_ids))
+    return {'added': added, 'removed': removed, 'users': len(changed_user_ids)}
+
+
+def assign_role_permissions(role_id, permission_ids):
+    """
+    覆盖角色的权限：与中间表现有记录比对，仅批量插入/删除差异部分（事务内执行）
+    刷新拥有该角色（及其子角色）的用户的物化权限，事务提交后递增一次全局版本号
+    :return: {'added': 新增条数, 'removed': 删除条数}
+    """
+    with transaction.atomic():
+        existing_pairs = set(RolePermission.objects.filter(role_id=role_id).values_list('role_id', 'permission_id'))
+        to_add, to_remove = _diff_pairs(existing_pairs, [role_id], permission_ids, ACTION_SET)
+        if to_remove:
+            RolePermission.objects.filter(
+                role_id=role_id, permission_id__in=[permission_id for _, permission_id in to_remove]
+            ).delete()
+        RolePermission.objects.bulk_create(
+            [RolePermission(role_id=role_id, permission_id=permission_id) for _, permission_id in to_add],
+            batch_size=BATCH_SIZE,
+        )
+        if to_add or to_remove:
+            refresh_role_users([role_id])
+            transaction.on_commit(bump_rbac_version)
+    return {'added': len(to_add), 'removed': len(to_remove)}
@@ -0,0 +1,70 @@
+# apps/rbac/audit.py
+import random
+import threading
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import AccessDecisionLog
+from .writers import BufferedBulkWriter
+
+# 是否启用访问决策审计，可在settings中通过RBAC_AUDIT_ENABLED覆盖
+AUDIT_ENABLED = getattr(settings, 'RBAC_AUDIT_ENABLED', True)
+# 放行决策的抽样比例（0~1，拒绝决策始终记录），可通过RBAC_AUDIT_ALLOW_SAMPLE_RATE覆盖
+AUDIT_ALLOW_SAMPLE_RATE = getattr(settings, 'RBAC_AUDIT_ALLOW_SAMPLE_RATE', 0.0)
+# 后台批量写入参数：每批条数、最长写入间隔（秒）、队列容量
+AUDIT_BATCH_SIZE = getattr(settings, 'RBAC_AUDIT_BATCH_SIZE', 500)
+AUDIT_FLUSH_INTERVAL = getattr(settings, 'RBAC_AUDIT_FLUSH_INTERVAL', 2.0)
+AUDIT_QUEUE_SIZE = getattr(settings, 'RBAC_AUDIT_QUEUE_SIZE', 10000)
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_audit_writer():
+    """获取进程内唯一的审计日志写入器（首次使用时创建）"""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = BufferedBulkWriter(
+                    AccessDecisionLog,
+                    batch_size=AUDIT_BATCH_SIZE,
+                    flush_interval=AUDIT_FLUSH_INTERVAL,
+                    max_queue_size=AUDIT_QUEUE_SIZE,
+                    name='rbac-audit-writer',
+                )
+    return _writer
+
+
+def should_record(allowed):
+    """拒绝决策始终记录，放行决策按抽样比例记录"""
+    if not AUDIT_ENABLED:
+        return False
+    if not allowed:
+        return True
+    return AUDIT_ALLOW_SAMPLE_RATE > 0 and random.random() < AUDIT_ALLOW_SAMPLE_RATE
+
+
+def record_decision(user, path, allowed, latency, source, permission_code=''):
+    """
+    记录一次访问决策（仅入队，不访问数据库，可在同步/异步代码中直接调用）
+    :param user: 用户对象（未登录时为None或匿名用户）
+    :param path: 访问路径
+    :param allowed: 是否放行
+    :param latency: 权限校验耗时（秒）
+    :param source: AccessDecisionLog.SOURCE_PAGE / SOURCE_API
+    :param permission_code: 权限标识或路由名称
+    """
+    if not should_record(allowed):
+        return
+    user_id = user.pk if user is not None and user.is_authenticated else None
+    get_audit_writer().put(
+        user_id=user_id,
+        path=path[:256],
+        permission_code=(permission_code or '')[:128],
+        allowed=allowed,
+        source=source,
+        latency_ms=round(latency * 1000, 3),
+        create_time=timezone.now(),
+    )
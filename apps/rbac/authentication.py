@@ -0,0 +1,160 @@
+# apps/rbac/authentication.py
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.utils.functional import cached_property
+from rest_framework import exceptions
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+
+from apps.rbac.registry import get_permission_index, permission_registry
+from apps.rbac.services import get_effective_permissions, get_user_permission_version
+
+# 令牌签名盐值（与其他签名数据隔离）
+TOKEN_SALT = 'apps.rbac.authentication'
+# 令牌有效期（秒），可在settings中通过RBAC_TOKEN_MAX_AGE覆盖
+TOKEN_MAX_AGE = getattr(settings, 'RBAC_TOKEN_MAX_AGE', 900)
+# 令牌可刷新期限（秒）：超过有效期但仍在该期限内的令牌可换取新令牌
+TOKEN_REFRESH_MAX_AGE = getattr(settings, 'RBAC_TOKEN_REFRESH_MAX_AGE', 86400)
+
+
+def encode_permission_bits(positions):
+    """位序号集合 → 十六进制位图字符串（第N位为1表示拥有位序号为N的权限，见PermissionIndex.code_bits）"""
+    bits = 0
+    for position in positions:
+        bits |= 1 << position
+    return format(bits, 'x')
+
+
+def issue_token(user, issued_at=None):
+    """
+    签发RBAC访问令牌（HMAC签名，内嵌用户ID、超级管理员标识、权限位图、权限版本号、位图所用的权限索引版本号、首次签发时间）
+    :param user: 用户对象
+    :param issued_at: 首次签发时间（时间戳，刷新令牌时沿用旧令牌的值；None表示本次登录签发）
+    :return: 令牌字符串
+    """
+    index = get_permission_index()
+    positions = [
+        index.code_bits[code] for code in get_effective_permissions(user).codes if code in index.code_bits
+    ]
+    payload = {
+        'uid': user.pk,
+        'su': int(user.is_superuser),
+        'ver': get_user_permission_version(user.pk),
+        'pv': index.version,
+        'bits': encode_permission_bits(positions),
+        # 首次签发时间：刷新后的令牌沿用该值，刷新链的总时长不超过TOKEN_REFRESH_MAX_AGE
+        'iat': int(time.time()) if issued_at is None else issued_at,
+    }
+    return signing.dumps(payload, salt=TOKEN_SALT, compress=True)
+
+
+def get_token_index(payload):
+    """
+    获取与令牌位图一致的权限索引（位序号随权限增删变化，须用签发时同一版本的索引解码）
+    本进程索引版本落后时立即检查一次版本号；仍不一致则返回None
+    """
+    index = get_permission_index()
+    if index.version != payload.get('pv'):
+        permission_registry.invalidate()
+        index = get_permission_index()
+    return index if index.version == payload.get('pv') else None
+
+
+def load_token(token, max_age=TOKEN_MAX_AGE):
+    """
+    校验令牌签名与有效期，返回令牌载荷
+    :raises AuthenticationFailed: 令牌无效或已过期
+    """
+    try:
+        return signing.loads(token, salt=TOKEN_SALT, max_age=max_age)
+    except signing.SignatureExpired:
+        raise exceptions.AuthenticationFailed('令牌已过期，请重新获取', code='token_expired')
+    except signing.BadSignature:
+        raise exceptions.AuthenticationFailed('令牌无效', code='token_invalid')
+
+
+def refresh_token(token):
+    """
+    刷新令牌：旧令牌在可刷新期限内（即使已过期或权限已变更），按数据库最新权限重新签发
+    可刷新期限从首次签发（登录）时计算，不因刷新而延长，超过后须重新登录
+    :raises AuthenticationFailed: 令牌无效、超过可刷新期限或用户已禁用
+    """
+    payload = load_token(token, max_age=TOKEN_REFRESH_MAX_AGE)
+    issued_at = payload.get('iat')
+    if issued_at is None or time.time() - issued_at > TOKEN_REFRESH_MAX_AGE:
+        raise exceptions.AuthenticationFailed('令牌已超过可刷新期限，请重新登录', code='token_expired')
+    try:
+        user = get_user_model().objects.get(pk=payload['uid'], is_active=True)
+    except get_user_model().DoesNotExist:
+        raise exceptions.AuthenticationFailed('用户不存在或已禁用', code='user_inactive')
+    return issue_token(user, issued_at)
+
+
+class RbacTokenUser:
+    """
+    令牌用户：直接由令牌载荷构造，无需查询数据库
+    访问令牌中未包含的属性（如username）时，才按ID加载真实用户对象
+    is_active恒为True：用户被禁用、超级管理员/职员标识变更或密码变更时递增其权限版本号，旧令牌随之被拒绝（见signals.py）
+    """
+    is_authenticated = True
+    is_anonymous = False
+    is_active = True
+
+    def __init__(self, payload, index=None):
+        self.pk = self.id = payload['uid']
+        self.is_superuser = bool(payload['su'])
+        self.permission_bits = int(payload['bits'], 16)
+        # 签发令牌时的用户权限版本号（令牌内的权限为该版本的快照）
+        self.permission_version = payload['ver']
+        # 解码位图所用的权限索引（与签发时版本一致）
+        self.index = index
+
+    def has_permission_code(self, permission_code):
+        """位运算判断是否拥有指定权限标识（位序号对应的位为1）"""
+        position = (self.index or get_permission_index()).code_bits.get(permission_code)
+        if position is None:
+            return False
+        return bool(self.permission_bits >> position & 1)
+
+    @cached_property
+    def user(self):
+        """按需加载的真实用户对象"""
+        return get_user_model().objects.get(pk=self.pk)
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.user, name)
+
+    def __str__(self):
+        return f'RbacTokenUser {self.pk}'
+
+
+class RbacTokenAuthentication(BaseAuthentication):
+    """
+    RBAC无状态令牌认证（基于DRF）：
+    1.  请求头格式：Authorization: Rbac <令牌>
+    2.  校验签名与有效期，不查询会话与用户表
+    3.  令牌中的权限版本号或权限索引版本号与当前不一致时拒绝（返回token_stale），客户端需调用刷新接口
+    """
+    keyword = 'Rbac'
+
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed('令牌格式错误', code='token_invalid')
+
+        payload = load_token(auth[1].decode())
+        if payload['ver'] != get_user_permission_version(payload['uid']):
+            raise exceptions.AuthenticationFailed('权限已变更，请刷新令牌', code='token_stale')
+        index = get_token_index(payload)
+        if index is None:
+            raise exceptions.AuthenticationFailed('权限已变更，请刷新令牌', code='token_stale')
+        return RbacTokenUser(payload, index), payload
+
+    def authenticate_header(self, request):
+        return self.keyword
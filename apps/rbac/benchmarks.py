@@ -0,0 +1,406 @@
+# apps/rbac/benchmarks.py
+import asyncio
+import os
+import platform
+import random
+import statistics
+import subprocess
+import time
+import tracemalloc
+
+import django
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.db import connection
+from django.http import HttpResponse
+from django.template import Context, Template
+from django.test import AsyncRequestFactory, RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from . import audit, services
+from .materialize import rebuild_all
+from .matcher import PermissionIndex
+from .middleware import RbacPagePermissionMiddleware
+from .models import Permission, Role, RowRule, UserEffectivePermission
+from .permissions import RbacApiPermission
+from .registry import permission_registry
+
+
+def make_permission_rows(size, seed=0):
+    """
+    生成模拟权限数据（不落库）
+    :param size: 权限数量
+    :return: [(id, permission_code, url_path, route_name), ...]
+    """
+    rng = random.Random(seed)
+    rows = []
+    for i in range(size):
+        module = f'module{rng.randint(0, 49)}'
+        rows.append((i + 1, f'perm_{i}', f'/{module}/resource{i}/', f'{module}:resource_{i}'))
+    return rows
+
+
+def bench_matcher(size, lookups=20000, seed=0):
+    """
+    对比权限匹配耗时：预编译索引（前缀树+路由名称字典） vs 原逐条startswith扫描
+    :param size: 权限数量
+    :param lookups: 查询次数
+    :return: 结果字典（耗时单位：纳秒/次）
+    """
+    rng = random.Random(seed)
+    rows = make_permission_rows(size, seed)
+    index = PermissionIndex(rows)
+    url_paths = [url_path for _, _, url_path, _ in rows]
+    # 用户持有一半权限；查询路径一半命中、一半未命中
+    user_codes = frozenset(code for _, code, _, _ in rows[::2])
+    paths = []
+    view_names = []
+    for _ in range(lookups):
+        _, code, url_path, route_name = rows[rng.randrange(size)]
+        if rng.random() < 0.5:
+            paths.append(f'{url_path}detail/{rng.randint(1, 9999)}/')
+        else:
+            paths.append(f'/missing{rng.randint(0, 49)}/resource/')
+        view_names.append(route_name)
+
+    start = time.perf_counter()
+    for path in paths:
+        index.match_path(path, user_codes)
+    trie_ns = (time.perf_counter() - start) / lookups * 1e9
+
+    start = time.perf_counter()
+    for view_name in view_names:
+        index.match_route(view_name, user_codes)
+    route_ns = (time.perf_counter() - start) / lookups * 1e9
+
+    start = time.perf_counter()
+    for path in paths:
+        for url_path in url_paths:
+            if path.startswith(url_path):
+                break
+    linear_ns = (time.perf_counter() - start) / lookups * 1e9
+
+    return {
+        'permissions': size,
+        'lookups': lookups,
+        'trie_ns': round(trie_ns, 1),
+        'route_ns': round(route_ns, 1),
+        'linear_ns': round(linear_ns, 1),
+    }
+
+
+class SyncOnlyRbacMiddleware(RbacPagePermissionMiddleware):
+    """改造前的中间件形态：仅支持同步调用（ASGI下由Django包装为线程执行）"""
+    sync_capable = True
+    async_capable = False
+
+
+def seed_asgi_user(permission_count=50):
+    """
+    准备ASGI基准测试数据（需在测试数据库中执行）：一个普通用户，通过角色持有全部模拟权限
+    :return: (用户, 可访问的URL列表)
+    """
+    User = get_user_model()
+    rows = make_permission_rows(permission_count)
+    Permission.objects.bulk_create([
+        Permission(permission_name=f'模拟权限{pk}', permission_code=code, url_path=url_path, route_name=route_name)
+        for pk, code, url_path, route_name in rows
+    ])
+    role = Role.objects.create(role_name='基准测试角色')
+    role.permissions.set(Permission.objects.all())
+    user = User.objects.create_user(username='rbac_bench', phone='13900000000', password='rbac_bench')
+    user.roles.add(role)
+    user = User.objects.get(pk=user.pk)
+    return user, [f'{url_path}detail/' for _, _, url_path, _ in rows]
+
+
+def bench_asgi(user, paths, total=2000, concurrency=50, view_delay=0.005):
+    """
+    ASGI下中间件吞吐量对比：异步原生中间件 vs 仅同步中间件（按Django的适配方式包装：
+    中间件整体放入线程执行，下游异步视图再切回事件循环，期间该线程一直被占用）
+    :param user: 已持有权限的用户（paths均应有权访问）
+    :param total: 每种模式的请求总数
+    :param concurrency: 并发请求数
+    :param view_delay: 视图模拟的下游I/O耗时（秒）
+    :return: 结果字典（吞吐量单位：请求/秒）
+    """
+    factory = AsyncRequestFactory()
+
+    async def view(request):
+        await asyncio.sleep(view_delay)
+        return HttpResponse('ok')
+
+    async_chain = RbacPagePermissionMiddleware(view)
+    sync_chain = sync_to_async(SyncOnlyRbacMiddleware(async_to_sync(view)), thread_sensitive=True)
+
+    async def run(handler):
+        queue = list(range(total))
+        statuses = {}
+
+        async def worker():
+            while queue:
+                index = queue.pop()
+                request = factory.get(paths[index % len(paths)])
+                request.user = user
+                response = await handler(request)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        # 预热：加载权限索引与用户权限缓存
+        request = factory.get(paths[0])
+        request.user = user
+        await handler(request)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+        return round(total / elapsed, 1), statuses
+
+    async def main():
+        sync_rps, sync_statuses = await run(sync_chain)
+        async_rps, async_statuses = await run(async_chain)
+        return sync_rps, sync_statuses, async_rps, async_statuses
+
+    sync_rps, sync_statuses, async_rps, async_statuses = asyncio.run(main())
+    return {
+        'requests': total,
+        'concurrency': concurrency,
+        'view_delay_ms': view_delay * 1000,
+        'sync_rps': sync_rps,
+        'async_rps': async_rps,
+        'sync_statuses': sync_statuses,
+        'async_statuses': async_statuses,
+    }
+
+
+# ---------------- 权限校验基准测试套件：三个校验点 × 参数化数据集 ----------------
+
+# 基准测试报告格式版本（报告结构变化时递增，比较时需一致）
+REPORT_VERSION = 1
+# 参与比较的指标及其判定方向（均为越小越好）
+COMPARE_METRICS = ('mean_us', 'p95_us', 'queries', 'alloc_bytes')
+
+
+def clear_rbac_data():
+    """清空基准测试造数（测试数据库中执行）"""
+    User = get_user_model()
+    UserEffectivePermission.objects.all().delete()
+    RowRule.objects.all().delete()
+    User.roles.through.objects.all().delete()
+    Role.objects.all().delete()
+    Permission.objects.all().delete()
+    User.objects.filter(username='rbac_bench').delete()
+
+
+def reset_rbac_caches():
+    """清空缓存、进程内权限集缓存与权限索引，模拟冷启动"""
+    cache.clear()
+    services._local_perms.clear()
+    permission_registry.reset()
+
+
+def seed_dataset(roles_per_user, permission_count, seed=0):
+    """
+    造数：permission_count个权限平均分配给2×roles_per_user个角色，用户持有其中roles_per_user个角色（约一半权限）
+    批量写入后统一物化（闭包表+用户有效权限）
+    :return: (用户, 命中的URL, 命中的权限标识)
+    """
+    User = get_user_model()
+    clear_rbac_data()
+    rows = make_permission_rows(permission_count, seed)
+    Permission.objects.bulk_create(
+        [
+            Permission(permission_name=f'模拟权限{pk}', permission_code=code, url_path=url_path, route_name=route_name)
+            for pk, code, url_path, route_name in rows
+        ],
+        batch_size=1000,
+    )
+    role_count = roles_per_user * 2
+    Role.objects.bulk_create([Role(role_name=f'基准测试角色{i}') for i in range(role_count)])
+    role_ids = list(Role.objects.order_by('id').values_list('id', flat=True))
+    permission_ids = dict(Permission.objects.values_list('permission_code', 'id'))
+    Role.permissions.through.objects.bulk_create(
+        [
+            Role.permissions.through(role_id=role_ids[index % role_count], permission_id=permission_ids[code])
+            for index, (_, code, _, _) in enumerate(rows)
+        ],
+        batch_size=1000,
+    )
+    user = User.objects.create_user(username='rbac_bench', phone='13900000000', password='rbac_bench')
+    User.roles.through.objects.bulk_create(
+        [User.roles.through(user_id=user.pk, role_id=role_id) for role_id in role_ids[::2]]
+    )
+    rebuild_all()
+    # 用户持有偶数下标角色的权限：取最后一个命中的权限，避免前缀树/集合的首元素偏差
+    _, code, url_path, _ = [row for index, row in enumerate(rows) if index % role_count % 2 == 0][-1]
+    reset_rbac_caches()
+    return User.objects.get(pk=user.pk), f'{url_path}detail/', code
+
+
+def _measure(check, iterations, before=None):
+    """
+    执行校验并统计：单次耗时分位数、单次查询数、单次内存分配（alloc_bytes为校验期间的内存峰值增量，
+    retained_bytes为校验结束后仍被持有的内存，如写入缓存的权限集）
+    :param check: 无参可调用对象，执行一次校验
+    :param before: 每次校验前执行的准备工作（不计入耗时，如清空缓存）
+    """
+    durations = []
+    with CaptureQueriesContext(connection) as queries:
+        for _ in range(iterations):
+            if before:
+                before()
+            start = time.perf_counter()
+            check()
+            durations.append(time.perf_counter() - start)
+    query_count = len(queries.captured_queries)
+
+    # 内存分配单独统计（tracemalloc会显著拖慢执行，不与耗时混测）
+    alloc_iterations = max(1, min(iterations, 200))
+    tracemalloc.start()
+    allocated = 0
+    retained = 0
+    for _ in range(alloc_iterations):
+        if before:
+            before()
+        tracemalloc.reset_peak()
+        snapshot_start = tracemalloc.get_traced_memory()[0]
+        check()
+        current, iteration_peak = tracemalloc.get_traced_memory()
+        allocated += iteration_peak - snapshot_start
+        retained += max(current - snapshot_start, 0)
+    tracemalloc.stop()
+
+    durations.sort()
+    return {
+        'iterations': iterations,
+        'mean_us': round(statistics.fmean(durations) * 1e6, 2),
+        'p50_us': round(durations[len(durations) // 2] * 1e6, 2),
+        'p95_us': round(durations[min(len(durations) - 1, int(len(durations) * 0.95))] * 1e6, 2),
+        'queries': round(query_count / iterations, 3),
+        'alloc_bytes': round(allocated / alloc_iterations),
+        'retained_bytes': round(retained / alloc_iterations),
+    }
+
+
+def bench_checkpoints(user, path, permission_code, iterations=1000, cold_iterations=50):
+    """
+    分别测量三个校验点（页面中间件、接口权限类、has_permission模板标签）的单次校验开销
+    warm：缓存已预热，每次为新的请求对象（不命中请求级缓存）；cold：每次校验前清空缓存
+    :return: [{'checkpoint', 'mode', 指标...}, ...]
+    """
+    factory = RequestFactory()
+    middleware = RbacPagePermissionMiddleware(lambda request: HttpResponse('ok'))
+    api_permission = RbacApiPermission()
+    template = Template("{% load rbac_tags %}{% has_permission code as ok %}{{ ok }}")
+
+    class BenchView:
+        required_permission_code = permission_code
+
+    view = BenchView()
+
+    def new_request():
+        request = factory.get(path)
+        request.user = user
+        return request
+
+    def check_middleware():
+        response = middleware(new_request())
+        assert response.status_code == 200, 'middleware拒绝了应放行的请求'
+
+    def check_api():
+        assert api_permission.has_permission(new_request(), view), 'RbacApiPermission拒绝了应放行的请求'
+
+    def check_tag():
+        assert template.render(Context({'request': new_request(), 'code': permission_code})) == 'True'
+
+    results = []
+    for checkpoint, check in (('middleware', check_middleware), ('api_permission', check_api), ('template_tag', check_tag)):
+        reset_rbac_caches()
+        check()  # 预热
+        results.append({'checkpoint': checkpoint, 'mode': 'warm', **_measure(check, iterations)})
+        results.append({'checkpoint': checkpoint, 'mode': 'cold', **_measure(check, cold_iterations, reset_rbac_caches)})
+    return results
+
+
+def bench_suite(roles_per_user_list, permission_counts, iterations=1000, cold_iterations=50):
+    """
+    参数化基准测试：每组（每用户角色数 × 权限数量）造数后测量三个校验点（需在测试数据库中执行）
+    :return: 结果列表
+    """
+    # 基准测试期间不抽样记录放行决策，避免审计写入干扰测量
+    sample_rate = audit.AUDIT_ALLOW_SAMPLE_RATE
+    audit.AUDIT_ALLOW_SAMPLE_RATE = 0.0
+    results = []
+    try:
+        for roles_per_user in roles_per_user_list:
+            for permission_count in permission_counts:
+                user, path, permission_code = seed_dataset(roles_per_user, permission_count)
+                for row in bench_checkpoints(user, path, permission_code, iterations, cold_iterations):
+                    results.append({'roles_per_user': roles_per_user, 'permissions': permission_count, **row})
+    finally:
+        audit.AUDIT_ALLOW_SAMPLE_RATE = sample_rate
+        clear_rbac_data()
+    return results
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, timeout=5, check=True,
+        ).stdout.strip()
+    except Exception:
+        return ''
+
+
+def build_report(results):
+    """生成可在不同提交间比较的JSON报告"""
+    return {
+        'version': REPORT_VERSION,
+        'meta': {
+            'revision': _git_revision(),
+            'created': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'cache': caches['default'].__class__.__name__,
+        },
+        'results': results,
+    }
+
+
+def _result_key(row):
+    return row['roles_per_user'], row['permissions'], row['checkpoint'], row['mode']
+
+
+def compare_reports(baseline, current, threshold=0.2):
+    """
+    比较两份报告：按（每用户角色数, 权限数量, 校验点, 模式）对齐，计算各指标的相对变化
+    :param threshold: 相对变化超过该比例视为退化（查询数任何增加均视为退化）
+    :return: [{'key', 'metric', 'baseline', 'current', 'change', 'regression'}, ...]
+    """
+    if baseline.get('version') != current.get('version'):
+        raise ValueError('报告格式版本不一致，无法比较')
+    baseline_rows = {_result_key(row): row for row in baseline['results']}
+    rows = []
+    for row in current['results']:
+        old = baseline_rows.get(_result_key(row))
+        if old is None:
+            continue
+        for metric in COMPARE_METRICS:
+            before, after = old[metric], row[metric]
+            change = (after - before) / before if before else (0.0 if after == before else float('inf'))
+            if metric == 'queries':
+                regression = after > before
+            else:
+                regression = change > threshold
+            rows.append({
+                'key': _result_key(row),
+                'metric': metric,
+                'baseline': before,
+                'current': after,
+                'change': round(change, 4),
+                'regression': regression,
+            })
+    return rows
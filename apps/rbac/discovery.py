@@ -0,0 +1,172 @@
+# apps/rbac/discovery.py
+import re
+from collections import namedtuple
+
+from django.conf import settings
+from django.db import transaction
+from django.urls import URLPattern, URLResolver, get_resolver
+
+from .matcher import PrefixTrie
+from .models import Permission
+from .services import bump_permission_version, bump_rbac_version
+
+# 默认扫描的路由命名空间（仅为业务应用生成权限），可通过RBAC_DISCOVER_NAMESPACES覆盖
+DISCOVER_NAMESPACES = getattr(settings, 'RBAC_DISCOVER_NAMESPACES', ('users', 'rbac'))
+# 正则路由中静态前缀的结束位置（第一个正则元字符）
+_REGEX_SPECIAL = re.compile(r'[\\.^$*+?{}\[\]|()]')
+# 生成权限标识时需替换为下划线的字符
+_CODE_INVALID = re.compile(r'[^0-9A-Za-z_]+')
+
+# 扫描到的命名路由：路由名称（含命名空间）、静态路径前缀、是否含路径参数
+DiscoveredRoute = namedtuple('DiscoveredRoute', ('view_name', 'path_prefix', 'dynamic'))
+
+
+def _static_prefix(pattern):
+    """
+    提取路由模式的静态前缀
+    :return: (静态前缀, 是否含路径参数/正则部分)
+    """
+    route = str(pattern)
+    if hasattr(pattern, 'converters'):
+        # path()：截取到第一个<参数>为止
+        index = route.find('<')
+    else:
+        # re_path()：去掉开头的^，截取到第一个正则元字符为止（结尾的$视为静态）
+        route = route[1:] if route.startswith('^') else route
+        route = route[:-1] if route.endswith('$') and not route.endswith('\\$') else route
+        match = _REGEX_SPECIAL.search(route)
+        index = match.start() if match else -1
+    if index == -1:
+        return route, False
+    return route[:index], True
+
+
+def iter_named_routes(patterns=None, prefix='/', namespace=None):
+    """
+    深度遍历路由解析树，生成所有命名路由
+    :param patterns: 路由列表（默认根URLconf）
+    :param prefix: 已累积的静态路径前缀
+    :param namespace: 已累积的命名空间
+    """
+    if patterns is None:
+        patterns = get_resolver().url_patterns
+    for pattern in patterns:
+        part, dynamic = _static_prefix(pattern.pattern)
+        if isinstance(pattern, URLResolver):
+            child_namespace = namespace
+            if pattern.namespace:
+                child_namespace = f'{namespace}:{pattern.namespace}' if namespace else pattern.namespace
+            for route in iter_named_routes(pattern.url_patterns, prefix + part, child_namespace):
+                # 含参数的include无法得到完整静态前缀，其下路由的前缀截止到参数之前
+                yield route._replace(path_prefix=prefix + part, dynamic=True) if dynamic else route
+        elif isinstance(pattern, URLPattern) and pattern.name:
+            view_name = f'{namespace}:{pattern.name}' if namespace else pattern.name
+            yield DiscoveredRoute(view_name, prefix + part, dynamic)
+
+
+def make_permission_code(view_name):
+    """由路由名称生成权限标识，如 users:login_log_list → users_login_log_list"""
+    return _CODE_INVALID.sub('_', view_name).strip('_')[:64]
+
+
+def discover_routes(namespaces=DISCOVER_NAMESPACES, white_list=()):
+    """
+    扫描指定命名空间下的命名路由，并确定每个路由权限的关联路由（前缀）：
+    前缀会覆盖其他命名路由时（如 /users/profile/ 覆盖 /users/profile/update/）不写关联路由，
+    仅按路由名称精确匹配，避免自动生成的权限越权放行其他页面
+    :param namespaces: 顶级命名空间元组（None表示全部）
+    :param white_list: 白名单路径前缀（命中的路由无需权限，跳过）
+    :return: {路由名称: (关联路由或None, DiscoveredRoute)}
+    """
+    white_trie = PrefixTrie((white_path, white_path) for white_path in white_list)
+    routes = {}
+    for route in iter_named_routes():
+        if namespaces is not None and route.view_name.split(':', 1)[0] not in namespaces:
+            continue
+        if white_trie.has_match(route.path_prefix) or route.view_name in routes:
+            continue
+        routes[route.view_name] = route
+
+    prefixes = sorted({route.path_prefix for route in routes.values()})
+    result = {}
+    for view_name, route in routes.items():
+        covers_other = any(
+            other != route.path_prefix and other.startswith(route.path_prefix) for other in prefixes
+        )
+        result[view_name] = (None if covers_other else route.path_prefix, route)
+    return result
+
+
+def build_discovery_plan(discovered):
+    """
+    与现有权限比对（一次查询），生成新增/更新计划与孤立权限列表：
+    已绑定该路由名称、或未绑定路由名称但关联路由与该路由前缀相同的权限沿用原权限标识，其余按路由名称生成权限标识
+    :param discovered: discover_routes()的结果
+    :return: {'create': [Permission], 'update': [Permission], 'unchanged': 条数, 'orphans': [Permission]}
+    """
+    existing = {
+        permission.permission_code: permission
+        for permission in Permission.objects.order_by().only(
+            'id', 'permission_name', 'permission_code', 'url_path', 'route_name'
+        )
+    }
+    code_by_route = {
+        permission.route_name: code for code, permission in existing.items() if permission.route_name
+    }
+    code_by_path = {
+        permission.url_path: code for code, permission in existing.items()
+        if permission.url_path and not permission.route_name
+    }
+    plan = {'create': [], 'update': [], 'unchanged': 0, 'orphans': []}
+    for view_name, (url_path, route) in sorted(discovered.items()):
+        code = code_by_route.get(view_name) or code_by_path.pop(route.path_prefix, None) or make_permission_code(view_name)
+        current = existing.get(code)
+        if current is None:
+            plan['create'].append(Permission(
+                permission_name=view_name[:64], permission_code=code, url_path=url_path, route_name=view_name,
+                description='由 rbac_discover_routes 根据路由自动生成',
+            ))
+        elif (current.url_path or None, current.route_name) != (url_path, view_name):
+            plan['update'].append(Permission(
+                permission_name=current.permission_name, permission_code=code, url_path=url_path,
+                route_name=view_name,
+            ))
+        else:
+            plan['unchanged'] += 1
+
+    # 孤立权限：绑定的路由名称已不存在，或关联路由未覆盖任何现有路由
+    all_routes = list(iter_named_routes())
+    route_names = {route.view_name for route in all_routes}
+    route_trie = PrefixTrie((route.path_prefix, route.path_prefix) for route in all_routes if route.dynamic)
+    route_prefixes = [route.path_prefix for route in all_routes]
+    for code, permission in sorted(existing.items()):
+        if permission.route_name:
+            if permission.route_name not in route_names:
+                plan['orphans'].append(permission)
+        elif permission.url_path:
+            covered = any(prefix.startswith(permission.url_path) for prefix in route_prefixes)
+            if not covered and not route_trie.has_match(permission.url_path):
+                plan['orphans'].append(permission)
+    return plan
+
+
+def apply_discovery_plan(plan):
+    """
+    按权限标识批量upsert（bulk_create(update_conflicts=True)，只更新关联路由与路由名称）
+    批量写入不触发信号，写入后统一递增权限目录版本号与全局版本号
+    :return: 写入条数
+    """
+    rows = plan['create'] + plan['update']
+    if not rows:
+        return 0
+    with transaction.atomic():
+        Permission.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['permission_code'],
+            update_fields=['url_path', 'route_name', 'update_time'],
+            batch_size=500,
+        )
+        transaction.on_commit(bump_permission_version)
+        transaction.on_commit(bump_rbac_version)
+    return len(rows)
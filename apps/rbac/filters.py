@@ -0,0 +1,122 @@
+# apps/rbac/filters.py
+from django.core.cache import cache
+from django.db.models import Q
+from rest_framework.filters import BaseFilterBackend
+
+from apps.rbac.models import RoleClosure, RowRule
+from apps.rbac.services import PERMS_CACHE_TIMEOUT, get_user_permission_version
+
+# 用户行级规则的缓存键模板（带用户权限版本号，角色/规则变更后旧键自然作废）
+ROW_RULES_KEY = 'rbac:row_rules:{version}:{user_id}:{model_label}'
+# 不做行级限制的标记（超级管理员、模型未配置规则、规则范围为全部数据）
+UNRESTRICTED = None
+
+
+def load_row_rules(user_id, model_label):
+    """
+    加载用户在指定模型上的行级规则并展开为可缓存的规则描述
+    :return: UNRESTRICTED，或 (本人数据字段元组, ((角色关联字段, 目标角色ID元组), ...))
+    """
+    if not RowRule.objects.filter(model_label=model_label).exists():
+        return UNRESTRICTED
+
+    # 用户角色的所有祖先角色上配置的规则均对用户生效（一次联表查询）
+    rows = (
+        RowRule.objects
+        .filter(model_label=model_label, role__descendant_links__descendant__user_roles__id=user_id)
+        .values_list('id', 'scope', 'field_path', 'target_roles__id')
+        .distinct()
+    )
+    self_fields = set()
+    role_targets = {}
+    for rule_id, scope, field_path, target_role_id in rows:
+        if scope == RowRule.SCOPE_ALL:
+            return UNRESTRICTED
+        if scope == RowRule.SCOPE_SELF:
+            self_fields.add(field_path or 'id')
+        elif scope == RowRule.SCOPE_ROLES and target_role_id is not None:
+            role_targets.setdefault(field_path or 'roles', set()).add(target_role_id)
+
+    # 目标角色展开为其自身及所有子角色（继承了目标角色的用户同样视为属于目标角色）
+    all_targets = set().union(*role_targets.values()) if role_targets else set()
+    descendants = {}
+    for ancestor_id, descendant_id in (
+        RoleClosure.objects.filter(ancestor_id__in=all_targets).values_list('ancestor_id', 'descendant_id')
+    ):
+        descendants.setdefault(ancestor_id, set()).add(descendant_id)
+    role_rules = tuple(
+        (field_path, tuple(sorted(set().union(*(descendants.get(role_id, {role_id}) for role_id in role_ids)))))
+        for field_path, role_ids in sorted(role_targets.items())
+    )
+    return tuple(sorted(self_fields)), role_rules
+
+
+def get_row_rules(user, model_label):
+    """获取用户行级规则描述（优先读缓存，缓存键随用户权限版本号变化）"""
+    if user.is_superuser:
+        return UNRESTRICTED
+    key = ROW_RULES_KEY.format(
+        version=get_user_permission_version(user.pk), user_id=user.pk, model_label=model_label
+    )
+    # 缓存中以空元组表示不限制（None无法与缓存未命中区分）
+    cached = cache.get(key)
+    if cached is None:
+        rules = load_row_rules(user.pk, model_label)
+        cache.set(key, () if rules is UNRESTRICTED else rules, PERMS_CACHE_TIMEOUT)
+        return rules
+    return cached or UNRESTRICTED
+
+
+def compile_row_predicate(user, model, rules):
+    """
+    将规则描述编译为单个Q对象（多条规则取并集）
+    多对多关联（如roles）编译为主键子查询，避免联表产生重复行，整体仍为一条SQL
+    """
+    predicate = Q(pk__in=[])
+    self_fields, role_rules = rules
+    for field_path in self_fields:
+        predicate |= Q(**{field_path: user.pk})
+    for field_path, role_ids in role_rules:
+        predicate |= Q(pk__in=model._default_manager.filter(**{f'{field_path}__in': role_ids}).values('pk'))
+    return predicate
+
+
+def get_row_predicate(request, model):
+    """
+    获取当前请求用户在指定模型上的行级过滤条件（同一请求内只编译一次，结果缓存在request上）
+    :return: Q对象，不做限制时返回UNRESTRICTED
+    """
+    model_label = model._meta.label
+    memo = getattr(request, '_rbac_row_predicates', None)
+    if memo is None:
+        memo = request._rbac_row_predicates = {}
+    if model_label not in memo:
+        user = request.user
+        if not user or not user.is_authenticated:
+            memo[model_label] = Q(pk__in=[])
+        else:
+            rules = get_row_rules(user, model_label)
+            memo[model_label] = UNRESTRICTED if rules is UNRESTRICTED else compile_row_predicate(user, model, rules)
+    return memo[model_label]
+
+
+def row_predicate_allows(request, obj):
+    """判断单个对象是否满足行级规则（供未使用RbacRowFilterBackend的视图做对象级校验，一次exists查询）"""
+    predicate = get_row_predicate(request, type(obj))
+    if predicate is UNRESTRICTED:
+        return True
+    return type(obj)._default_manager.filter(predicate, pk=obj.pk).exists()
+
+
+class RbacRowFilterBackend(BaseFilterBackend):
+    """
+    RBAC行级数据过滤（基于DRF过滤后端）：
+    将当前用户适用的行级规则编译为一个filter()条件，列表接口一条SQL完成授权；
+    详情/修改/删除接口经get_object()同样走该条件，无权数据直接返回404
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        predicate = get_row_predicate(request, queryset.model)
+        if predicate is UNRESTRICTED:
+            return queryset
+        return queryset.filter(predicate)
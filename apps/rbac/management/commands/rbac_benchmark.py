@@ -0,0 +1,109 @@
+# apps/rbac/management/commands/rbac_benchmark.py
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from apps.rbac.benchmarks import (
+    bench_asgi, bench_matcher, bench_suite, build_report, compare_reports, seed_asgi_user,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'RBAC权限校验性能基准测试（matcher：预编译权限索引 vs 逐条前缀扫描；'
+        'asgi：异步原生中间件 vs 仅同步中间件的吞吐量；'
+        'suite：参数化数据集下页面中间件/接口权限类/模板标签的耗时、查询数与内存分配，输出可比较的JSON报告）'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenario', choices=['matcher', 'asgi', 'suite'], default='matcher', help='测试场景')
+        parser.add_argument('--sizes', default='10,100,1000,10000', help='权限数量列表，逗号分隔')
+        parser.add_argument('--lookups', type=int, default=20000, help='每组数据的查询次数')
+        parser.add_argument('--requests', type=int, default=2000, help='asgi场景：每种模式的请求总数')
+        parser.add_argument('--concurrency', type=int, default=50, help='asgi场景：并发请求数')
+        parser.add_argument('--view-delay', type=float, default=5, help='asgi场景：视图模拟的下游I/O耗时（毫秒）')
+        parser.add_argument('--roles', default='1,10,50', help='suite场景：每用户角色数列表，逗号分隔')
+        parser.add_argument('--iterations', type=int, default=1000, help='suite场景：每个校验点的预热后校验次数')
+        parser.add_argument('--cold-iterations', type=int, default=50, help='suite场景：每个校验点的冷启动校验次数')
+        parser.add_argument('--output', help='suite场景：JSON报告输出路径')
+        parser.add_argument('--compare', help='suite场景：与该JSON报告（如上一次提交的结果）比较')
+        parser.add_argument('--threshold', type=float, default=0.2, help='suite场景：耗时/内存相对增长超过该比例视为退化')
+        parser.add_argument('--fail-on-regression', action='store_true', help='suite场景：存在退化时以非零状态退出')
+
+    def handle(self, *args, **options):
+        if options['scenario'] == 'asgi':
+            return self.handle_asgi(options)
+        if options['scenario'] == 'suite':
+            return self.handle_suite(options)
+
+        sizes = [int(size) for size in options['sizes'].split(',') if size]
+        self.stdout.write(f"{'权限数量':>10} {'前缀树(ns)':>12} {'路由名称(ns)':>12} {'逐条扫描(ns)':>12}")
+        for size in sizes:
+            result = bench_matcher(size, options['lookups'])
+            self.stdout.write(
+                f"{result['permissions']:>10} {result['trie_ns']:>12} "
+                f"{result['route_ns']:>12} {result['linear_ns']:>12}"
+            )
+
+    def handle_asgi(self, options):
+        # 在独立的测试数据库中造数，避免污染业务数据
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            user, paths = seed_asgi_user()
+            result = bench_asgi(
+                user, paths, options['requests'], options['concurrency'], options['view_delay'] / 1000
+            )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+        self.stdout.write(
+            f"请求数：{result['requests']}，并发：{result['concurrency']}，视图耗时：{result['view_delay_ms']}ms"
+        )
+        self.stdout.write(f"仅同步中间件：{result['sync_rps']} 请求/秒 {result['sync_statuses']}")
+        self.stdout.write(f"异步原生中间件：{result['async_rps']} 请求/秒 {result['async_statuses']}")
+
+    def handle_suite(self, options):
+        roles = [int(count) for count in options['roles'].split(',') if count]
+        sizes = [int(size) for size in options['sizes'].split(',') if size]
+        baseline = None
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as f:
+                baseline = json.load(f)
+
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            results = bench_suite(roles, sizes, options['iterations'], options['cold_iterations'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+        report = build_report(results)
+
+        self.stdout.write(
+            f"{'角色数':>6} {'权限数':>7} {'校验点':>15} {'模式':>5} {'平均(us)':>10} {'P95(us)':>10} "
+            f"{'查询数':>7} {'分配(B)':>9}"
+        )
+        for row in results:
+            self.stdout.write(
+                f"{row['roles_per_user']:>6} {row['permissions']:>7} {row['checkpoint']:>15} {row['mode']:>5} "
+                f"{row['mean_us']:>10} {row['p95_us']:>10} {row['queries']:>7} {row['alloc_bytes']:>9}"
+            )
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"报告已写入 {options['output']}"))
+
+        if baseline is None:
+            return
+        try:
+            rows = compare_reports(baseline, report, options['threshold'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        regressions = [row for row in rows if row['regression']]
+        self.stdout.write(f"与 {baseline['meta'].get('revision') or options['compare']} 比较：{len(rows)}项指标，{len(regressions)}项退化")
+        for row in regressions:
+            roles_per_user, permissions, checkpoint, mode = row['key']
+            self.stdout.write(self.style.WARNING(
+                f"  {roles_per_user}角色/{permissions}权限 {checkpoint}({mode}) {row['metric']}："
+                f"{row['baseline']} → {row['current']}（{row['change']:+.1%}）"
+            ))
+        if regressions and options['fail_on_regression']:
+            raise CommandError(f'存在{len(regressions)}项性能退化')
@@ -0,0 +1,43 @@
+# apps/rbac/management/commands/rbac_discover_routes.py
+from django.core.management.base import BaseCommand
+
+from apps.rbac.discovery import DISCOVER_NAMESPACES, apply_discovery_plan, build_discovery_plan, discover_routes
+from apps.rbac.middleware import get_white_list
+
+
+class Command(BaseCommand):
+    help = '扫描URLconf中的命名路由，按路由批量新增/更新权限（关联路由、路由名称），并列出孤立权限'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--namespace', action='append', dest='namespaces',
+            help=f"扫描的顶级命名空间，可重复指定，默认{'、'.join(DISCOVER_NAMESPACES)}",
+        )
+        parser.add_argument('--all-namespaces', action='store_true', help='扫描全部命名路由')
+        parser.add_argument('--include-white-list', action='store_true', help='白名单中的路由同样生成权限')
+        parser.add_argument('--dry-run', action='store_true', help='仅输出计划，不写入数据库')
+
+    def handle(self, *args, **options):
+        namespaces = None if options['all_namespaces'] else tuple(options['namespaces'] or DISCOVER_NAMESPACES)
+        white_list = () if options['include_white_list'] else get_white_list()
+        discovered = discover_routes(namespaces, white_list)
+        plan = build_discovery_plan(discovered)
+
+        for label, key in (('新增', 'create'), ('更新', 'update')):
+            for permission in plan[key]:
+                self.stdout.write(
+                    f'{label} {permission.permission_code}：{permission.route_name} {permission.url_path or "（仅路由名称）"}'
+                )
+        for permission in plan['orphans']:
+            self.stdout.write(self.style.WARNING(
+                f'孤立 {permission.permission_code}：{permission.route_name or permission.url_path}'
+            ))
+        self.stdout.write(
+            f"扫描到{len(discovered)}个路由：新增{len(plan['create'])}条，更新{len(plan['update'])}条，"
+            f"未变化{plan['unchanged']}条，孤立权限{len(plan['orphans'])}条"
+        )
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('dry-run：未写入数据库'))
+            return
+        written = apply_discovery_plan(plan)
+        self.stdout.write(self.style.SUCCESS(f'已写入{written}条权限'))
@@ -0,0 +1,30 @@
+# apps/rbac/management/commands/rbac_materialize.py
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.rbac.materialize import rebuild_all, verify_all
+from apps.rbac.services import bump_rbac_version
+
+
+class Command(BaseCommand):
+    help = '批量重建并校验RBAC物化数据（角色继承闭包表、用户有效权限表）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify-only', action='store_true', help='仅校验，不重建')
+
+    def handle(self, *args, **options):
+        if not options['verify_only']:
+            stats = rebuild_all()
+            # 物化结果可能已变化，使所有用户的权限缓存失效
+            bump_rbac_version()
+            self.stdout.write(
+                f"闭包表：新增{stats['closure_created']}条，删除{stats['closure_deleted']}条；"
+                f"用户有效权限：新增{stats['created']}条，删除{stats['deleted']}条"
+            )
+
+        result = verify_all()
+        if not result['closure_ok']:
+            raise CommandError('校验失败：角色继承闭包表与继承关系不一致')
+        if result['mismatched_users']:
+            sample = ', '.join(str(user_id) for user_id in result['mismatched_users'][:20])
+            raise CommandError(f"校验失败：{len(result['mismatched_users'])}个用户的有效权限不一致（{sample}）")
+        self.stdout.write(self.style.SUCCESS('校验通过：物化数据与角色/权限关系一致'))
@@ -0,0 +1,65 @@
+# apps/rbac/management/commands/rbac_sync.py
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.rbac.matrix import (
+    DIFF_LABELS, FORMATS, MatrixError, apply_matrix, diff_matrix, export_matrix, guess_format, has_changes,
+    parse_matrix, summarize_diff,
+)
+
+
+class Command(BaseCommand):
+    help = '导入/导出RBAC角色×权限矩阵（CSV/JSON）：import按权限标识、角色名称新增或更新，export流式导出当前矩阵'
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['import', 'export'], help='import：导入矩阵；export：导出矩阵')
+        parser.add_argument('path', nargs='?', default='-', help='矩阵文件路径，默认标准输入/标准输出')
+        parser.add_argument('--format', choices=FORMATS, help='文件格式，默认按扩展名推断（未知时为csv）')
+        parser.add_argument('--dry-run', action='store_true', help='仅输出差异，不写入数据库')
+        parser.add_argument('--verbose-diff', action='store_true', help='输出每条差异明细（默认仅输出统计）')
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or guess_format(options['path'])
+        if options['action'] == 'export':
+            return self.handle_export(options['path'], fmt)
+
+        if options['path'] == '-':
+            text = sys.stdin.read()
+        else:
+            with open(options['path'], encoding='utf-8-sig') as f:
+                text = f.read()
+        try:
+            matrix = parse_matrix(text, fmt)
+            diff = diff_matrix(matrix)
+        except MatrixError as e:
+            raise CommandError(str(e))
+
+        self.write_diff(diff, options['verbose_diff'])
+        if not has_changes(diff):
+            self.stdout.write(self.style.SUCCESS('矩阵与数据库一致，无需同步'))
+            return
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('dry-run：未写入数据库'))
+            return
+        apply_matrix(matrix, diff)
+        self.stdout.write(self.style.SUCCESS('同步完成'))
+
+    def handle_export(self, path, fmt):
+        if path == '-':
+            for chunk in export_matrix(fmt):
+                self.stdout.write(chunk, ending='')
+            return
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            for chunk in export_matrix(fmt):
+                f.write(chunk)
+        self.stdout.write(self.style.SUCCESS(f'已导出到 {path}'))
+
+    def write_diff(self, diff, verbose):
+        counts = summarize_diff(diff)
+        self.stdout.write('；'.join(f'{label}{counts[key]}条' for key, label in DIFF_LABELS))
+        if not verbose:
+            return
+        for key, label in DIFF_LABELS:
+            for item in diff[key]:
+                self.stdout.write(f"  {label}：{' → '.join(item) if isinstance(item, tuple) else item}")
@@ -0,0 +1,113 @@
+# apps/rbac/matcher.py
+from .models import Permission
+
+
+class PrefixTrie:
+    """
+    URL前缀树：
+    1.  insert：插入前缀并关联一个值（同一前缀可关联多个值）
+    2.  match：沿请求路径逐字符下行，收集所有命中前缀关联的值
+    查询耗时只与路径长度有关，与前缀（权限）数量无关
+    """
+    __slots__ = ('_root',)
+
+    # 节点中存放关联值的特殊键（URL字符不会是None）
+    _VALUES = None
+
+    def __init__(self, items=()):
+        self._root = {}
+        for prefix, value in items:
+            self.insert(prefix, value)
+
+    def insert(self, prefix, value):
+        """插入前缀，并将value关联到该前缀的末尾节点"""
+        node = self._root
+        for char in prefix:
+            node = node.setdefault(char, {})
+        node.setdefault(self._VALUES, set()).add(value)
+
+    def match(self, path):
+        """返回path所有命中前缀关联的值集合"""
+        matched = set()
+        node = self._root
+        values = node.get(self._VALUES)
+        if values:
+            matched |= values
+        for char in path:
+            node = node.get(char)
+            if node is None:
+                break
+            values = node.get(self._VALUES)
+            if values:
+                matched |= values
+        return matched
+
+    def has_match(self, path):
+        """判断path是否命中任一前缀（命中即返回，不收集值）"""
+        node = self._root
+        if self._VALUES in node:
+            return True
+        for char in path:
+            node = node.get(char)
+            if node is None:
+                return False
+            if self._VALUES in node:
+                return True
+        return False
+
+
+class PermissionIndex:
+    """
+    预编译的权限索引（进程内共享，只读）：
+    1.  url_trie：权限关联路由 → 权限标识（前缀树）
+    2.  route_codes：路由名称（含命名空间，即resolver_match.view_name）→ 权限标识集合（字典，O(1)查找）
+    3.  code_ids：权限标识 → 权限ID
+    4.  code_bits：权限标识 → 位序号（按权限ID排序后的位置，连续且从0开始，即令牌权限位图中的位序号，
+        位图长度只与权限数量有关，与ID的增长无关；权限增删后位序号会变化，令牌需携带索引版本号）
+    5.  entries：权限标识 → (权限ID, 关联路由)，索引包含全部权限，未收录的标识即不存在
+    6.  version：构建索引时的权限目录版本号（由注册表传入）
+    """
+    __slots__ = ('url_trie', 'route_codes', 'code_ids', 'code_bits', 'entries', 'version')
+
+    def __init__(self, rows=(), version=None):
+        self.version = version
+        self.url_trie = PrefixTrie()
+        self.code_ids = {}
+        self.code_bits = {}
+        self.entries = {}
+        route_codes = {}
+        for position, (permission_id, permission_code, url_path, route_name) in enumerate(
+            sorted(rows, key=lambda row: row[0])
+        ):
+            self.code_ids[permission_code] = permission_id
+            self.code_bits[permission_code] = position
+            self.entries[permission_code] = (permission_id, url_path)
+            if url_path:
+                self.url_trie.insert(url_path, permission_code)
+            if route_name:
+                route_codes.setdefault(route_name, set()).add(permission_code)
+        self.route_codes = {name: frozenset(codes) for name, codes in route_codes.items()}
+
+    def match_path(self, path, user_codes):
+        """判断用户权限标识中是否存在关联路由为path前缀的权限"""
+        matched = self.url_trie.match(path)
+        return bool(matched) and not matched.isdisjoint(user_codes)
+
+    def match_route(self, view_name, user_codes):
+        """判断用户权限标识中是否存在绑定了该路由名称的权限"""
+        codes = self.route_codes.get(view_name)
+        return bool(codes) and not codes.isdisjoint(user_codes)
+
+
+def build_permission_index(version=None):
+    """从数据库加载全部权限（一次查询）并编译为权限索引"""
+    rows = Permission.objects.order_by().values_list('id', 'permission_code', 'url_path', 'route_name')
+    return PermissionIndex(rows, version)
+
+
+async def abuild_permission_index(version=None):
+    """build_permission_index的异步版本（async for加载权限）"""
+    rows = [
+        row async for row in Permission.objects.order_by().values_list('id', 'permission_code', 'url_path', 'route_name')
+    ]
+    return PermissionIndex(rows, version)
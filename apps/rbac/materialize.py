@@ -0,0 +1,198 @@
+# apps/rbac/materialize.py
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from .models import Role, RoleClosure, UserEffectivePermission
+
+User = get_user_model()
+UserRole = User.roles.through
+RoleParent = Role.parents.through
+
+# 批量处理时每批的用户数量
+BATCH_SIZE = 500
+
+
+def _chunks(items, size=BATCH_SIZE):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def compute_role_closure():
+    """
+    根据角色继承关系计算传递闭包（一次查询加载所有继承边，内存中广度优先展开）
+    :return: {(ancestor_id, descendant_id): depth}
+    """
+    parents = {}
+    for child_id, parent_id in RoleParent.objects.values_list('from_role_id', 'to_role_id'):
+        parents.setdefault(child_id, []).append(parent_id)
+
+    closure = {}
+    for role_id in Role.objects.values_list('id', flat=True):
+        closure[(role_id, role_id)] = 0
+        frontier = [role_id]
+        depth = 0
+        while frontier:
+            depth += 1
+            next_frontier = []
+            for child_id in frontier:
+                for parent_id in parents.get(child_id, ()):
+                    if (parent_id, role_id) not in closure:
+                        closure[(parent_id, role_id)] = depth
+                        next_frontier.append(parent_id)
+            frontier = next_frontier
+    return closure
+
+
+@transaction.atomic
+def rebuild_role_closure():
+    """
+    重建角色继承闭包表：与现有记录比对，仅批量插入/删除差异部分
+    :return: (新增条数, 删除条数)
+    """
+    expected = compute_role_closure()
+    existing = {
+        (ancestor_id, descendant_id): (pk, depth)
+        for pk, ancestor_id, descendant_id, depth
+        in RoleClosure.objects.values_list('id', 'ancestor_id', 'descendant_id', 'depth')
+    }
+    stale_ids = [
+        pk for key, (pk, depth) in existing.items()
+        if key not in expected or expected[key] != depth
+    ]
+    to_create = [
+        RoleClosure(ancestor_id=ancestor_id, descendant_id=descendant_id, depth=depth)
+        for (ancestor_id, descendant_id), depth in expected.items()
+        if existing.get((ancestor_id, descendant_id), (None, None))[1] != depth
+    ]
+    if stale_ids:
+        RoleClosure.objects.filter(id__in=stale_ids).delete()
+    RoleClosure.objects.bulk_create(to_create, batch_size=BATCH_SIZE)
+    return len(to_create), len(stale_ids)
+
+
+def would_create_cycle(child_ids, parent_ids):
+    """判断为child_ids添加parent_ids作为父角色后是否会形成继承环（父角色是子角色自身或其后代）"""
+    return RoleClosure.objects.filter(ancestor_id__in=child_ids, descendant_id__in=parent_ids).exists()
+
+
+def users_for_roles(role_ids):
+    """获取拥有指定角色（或继承自这些角色的子角色）的用户ID集合"""
+    descendant_ids = RoleClosure.objects.filter(ancestor_id__in=role_ids).values('descendant_id')
+    return set(UserRole.objects.filter(role_id__in=descendant_ids).values_list('user_id', flat=True))
+
+
+def expected_user_permissions(user_ids):
+    """
+    计算用户应有的有效权限（用户→角色→闭包祖先角色→权限，一次联表查询）
+    :return: {user_id: {permission_id: permission_code}}
+    """
+    expected = {user_id: {} for user_id in user_ids}
+    rows = (
+        UserRole.objects
+        .filter(user_id__in=user_ids, role__ancestor_links__ancestor__permissions__isnull=False)
+        .values_list(
+            'user_id',
+            'role__ancestor_links__ancestor__permissions__id',
+            'role__ancestor_links__ancestor__permissions__permission_code',
+        )
+        .distinct()
+    )
+    for user_id, permission_id, permission_code in rows:
+        expected[user_id][permission_id] = permission_code
+    return expected
+
+
+def existing_user_permissions(user_ids):
+    """读取物化表中用户当前的有效权限：{user_id: {permission_id: (pk, permission_code)}}"""
+    existing = {user_id: {} for user_id in user_ids}
+    rows = (
+        UserEffectivePermission.objects
+        .filter(user_id__in=user_ids)
+        .values_list('id', 'user_id', 'permission_id', 'permission_code')
+    )
+    for pk, user_id, permission_id, permission_code in rows:
+        existing[user_id][permission_id] = (pk, permission_code)
+    return existing
+
+
+@transaction.atomic
+def refresh_user_permissions(user_ids):
+    """
+    增量刷新指定用户的物化权限：计算应有权限与现有记录的差集，批量插入/删除
+    :param user_ids: 用户ID可迭代对象
+    :return: (新增条数, 删除条数)
+    """
+    created = deleted = 0
+    for chunk in _chunks(set(user_ids)):
+        expected = expected_user_permissions(chunk)
+        existing = existing_user_permissions(chunk)
+        to_create = []
+        stale_ids = []
+        for user_id in chunk:
+            wanted = expected[user_id]
+            current = existing[user_id]
+            for permission_id, (pk, permission_code) in current.items():
+                if wanted.get(permission_id) != permission_code:
+                    stale_ids.append(pk)
+            for permission_id, permission_code in wanted.items():
+                if current.get(permission_id, (None, None))[1] != permission_code:
+                    to_create.append(UserEffectivePermission(
+                        user_id=user_id, permission_id=permission_id, permission_code=permission_code
+                    ))
+        if stale_ids:
+            UserEffectivePermission.objects.filter(id__in=stale_ids).delete()
+        UserEffectivePermission.objects.bulk_create(to_create, batch_size=BATCH_SIZE)
+        created += len(to_create)
+        deleted += len(stale_ids)
+    return created, deleted
+
+
+def refresh_role_users(role_ids):
+    """角色权限/继承关系变更后，刷新所有受影响用户（含继承这些角色的子角色的用户）"""
+    return refresh_user_permissions(users_for_roles(role_ids))
+
+
+def rebuild_all():
+    """
+    全量重建：角色继承闭包 + 所有用户的物化权限
+    :return: 统计字典
+    """
+    closure_created, closure_deleted = rebuild_role_closure()
+    created = deleted = 0
+    # 仅物化有角色的用户；无角色用户的残留记录单独清理
+    user_ids = set(UserRole.objects.values_list('user_id', flat=True))
+    for chunk in _chunks(user_ids):
+        chunk_created, chunk_deleted = refresh_user_permissions(chunk)
+        created += chunk_created
+        deleted += chunk_deleted
+    orphan_deleted, _ = UserEffectivePermission.objects.exclude(user_id__in=UserRole.objects.values('user_id')).delete()
+    return {
+        'closure_created': closure_created,
+        'closure_deleted': closure_deleted,
+        'created': created,
+        'deleted': deleted + orphan_deleted,
+    }
+
+
+def verify_all():
+    """
+    校验物化结果是否与实时计算结果一致（不修改数据）
+    :return: {'closure_ok': 闭包表是否一致, 'mismatched_users': 物化权限不一致的用户ID列表}
+    """
+    closure_ok = compute_role_closure() == {
+        (ancestor_id, descendant_id): depth
+        for ancestor_id, descendant_id, depth
+        in RoleClosure.objects.values_list('ancestor_id', 'descendant_id', 'depth')
+    }
+    mismatched = []
+    user_ids = set(UserRole.objects.values_list('user_id', flat=True))
+    user_ids |= set(UserEffectivePermission.objects.values_list('user_id', flat=True).distinct())
+    for chunk in _chunks(user_ids):
+        expected = expected_user_permissions(chunk)
+        existing = existing_user_permissions(chunk)
+        for user_id in chunk:
+            current = {permission_id: code for permission_id, (_, code) in existing[user_id].items()}
+            if current != expected[user_id]:
+                mismatched.append(user_id)
+    return {'closure_ok': closure_ok, 'mismatched_users': sorted(mismatched)}
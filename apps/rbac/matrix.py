@@ -0,0 +1,413 @@
+# apps/rbac/matrix.py
+import csv
+import io
+import json
+
+from django.db import transaction
+
+from .materialize import BATCH_SIZE, rebuild_role_closure, refresh_role_users
+from .models import Permission, Role
+from .services import bump_permission_version, bump_rbac_version
+
+RolePermission = Role.permissions.through
+
+# 矩阵文件格式
+FORMAT_CSV = 'csv'
+FORMAT_JSON = 'json'
+FORMATS = (FORMAT_CSV, FORMAT_JSON)
+# CSV矩阵的固定列（其后每一列为一个角色，单元格非空表示授予该权限）
+CSV_PERMISSION_COLUMNS = ('permission_code', 'permission_name', 'url_path', 'route_name', 'description')
+# 权限的可同步字段（permission_code为匹配键）
+PERMISSION_FIELDS = ('permission_name', 'url_path', 'route_name', 'description')
+# CSV单元格中表示「未授予」的取值
+CSV_FALSE_VALUES = ('', '0', 'n', 'no', 'false', '否')
+# 差异类型的中文说明（按输出顺序）
+DIFF_LABELS = (
+    ('permission_create', '新增权限'),
+    ('permission_update', '更新权限'),
+    ('role_create', '新增角色'),
+    ('role_update', '更新角色'),
+    ('grant_add', '新增授权'),
+    ('grant_remove', '移除授权'),
+)
+
+
+class MatrixError(ValueError):
+    """矩阵文件格式或内容错误"""
+
+
+def guess_format(filename, default=FORMAT_CSV):
+    """按文件扩展名推断矩阵格式"""
+    if filename and filename.lower().endswith('.json'):
+        return FORMAT_JSON
+    if filename and filename.lower().endswith('.csv'):
+        return FORMAT_CSV
+    return default
+
+
+def _clean(value):
+    """去除首尾空白，空字符串视为None"""
+    value = (value or '').strip()
+    return value or None
+
+
+def parse_matrix(text, fmt=FORMAT_CSV):
+    """
+    解析角色×权限矩阵
+    :param text: 文件内容（字符串）
+    :param fmt: csv / json
+    :return: {'permissions': {权限标识: {字段: 值}}, 'roles': {角色名称: {'description': 描述, 'permissions': 权限标识集合}}}
+    """
+    if fmt == FORMAT_JSON:
+        return _parse_json(text)
+    if fmt == FORMAT_CSV:
+        return _parse_csv(text)
+    raise MatrixError(f'不支持的格式：{fmt}')
+
+
+def _parse_csv(text):
+    reader = csv.reader(io.StringIO(text.lstrip('\ufeff')))
+    header = next(reader, None)
+    if not header or tuple(column.strip() for column in header[:len(CSV_PERMISSION_COLUMNS)]) != CSV_PERMISSION_COLUMNS:
+        raise MatrixError(f"CSV表头须以 {','.join(CSV_PERMISSION_COLUMNS)} 开头，其后每列为一个角色名称")
+    role_names = [name.strip() for name in header[len(CSV_PERMISSION_COLUMNS):]]
+    if any(not name for name in role_names) or len(set(role_names)) != len(role_names):
+        raise MatrixError('CSV表头中的角色名称不能为空或重复')
+
+    permissions = {}
+    roles = {name: {'description': None, 'permissions': set()} for name in role_names}
+    for line_no, row in enumerate(reader, start=2):
+        if not any(cell.strip() for cell in row):
+            continue
+        row = row + [''] * (len(header) - len(row))
+        code = row[0].strip()
+        if not code:
+            raise MatrixError(f'第{line_no}行：权限标识不能为空')
+        if code in permissions:
+            raise MatrixError(f'第{line_no}行：权限标识「{code}」重复')
+        permissions[code] = {
+            field: _clean(row[index + 1]) for index, field in enumerate(PERMISSION_FIELDS)
+        }
+        for role_name, cell in zip(role_names, row[len(CSV_PERMISSION_COLUMNS):]):
+            if cell.strip().lower() not in CSV_FALSE_VALUES:
+                roles[role_name]['permissions'].add(code)
+    return _validate({'permissions': permissions, 'roles': roles})
+
+
+def _json_list(data, key):
+    """读取JSON矩阵中的对象数组（缺省为空数组），元素须为对象"""
+    items = data.get(key) or []
+    if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+        raise MatrixError(f'JSON矩阵的{key}须为对象数组')
+    return items
+
+
+def _json_text(item, field):
+    """读取JSON对象中的文本字段（缺省或null视为None），非字符串时抛出MatrixError"""
+    value = item.get(field)
+    if value is not None and not isinstance(value, str):
+        raise MatrixError(f'字段{field}须为字符串：{value!r}')
+    return _clean(value)
+
+
+def _parse_json(text):
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise MatrixError(f'JSON解析失败：{e}')
+    if not isinstance(data, dict):
+        raise MatrixError('JSON矩阵须为对象：{"permissions": [...], "roles": [...]}')
+
+    permissions = {}
+    for item in _json_list(data, 'permissions'):
+        code = _json_text(item, 'permission_code')
+        if not code:
+            raise MatrixError('权限标识不能为空')
+        if code in permissions:
+            raise MatrixError(f'权限标识「{code}」重复')
+        permissions[code] = {field: _json_text(item, field) for field in PERMISSION_FIELDS}
+
+    roles = {}
+    for item in _json_list(data, 'roles'):
+        name = _json_text(item, 'role_name')
+        if not name:
+            raise MatrixError('角色名称不能为空')
+        if name in roles:
+            raise MatrixError(f'角色名称「{name}」重复')
+        codes = item.get('permissions') or []
+        if not isinstance(codes, list) or not all(isinstance(code, str) for code in codes):
+            raise MatrixError(f'角色「{name}」的permissions须为权限标识（字符串）数组')
+        roles[name] = {'description': _json_text(item, 'description'), 'permissions': set(codes)}
+    return _validate({'permissions': permissions, 'roles': roles})
+
+
+def _validate(matrix):
+    """校验矩阵内部一致性：权限名称缺省取权限标识且不能重复；角色引用的权限须已定义"""
+    names = set()
+    for code, fields in matrix['permissions'].items():
+        fields['permission_name'] = fields['permission_name'] or code
+        if fields['permission_name'] in names:
+            raise MatrixError(f"权限名称「{fields['permission_name']}」重复")
+        names.add(fields['permission_name'])
+    for name, role in matrix['roles'].items():
+        unknown = role['permissions'] - matrix['permissions'].keys()
+        if unknown:
+            raise MatrixError(f"角色「{name}」引用了未定义的权限：{', '.join(sorted(unknown)[:10])}")
+    return matrix
+
+
+def diff_matrix(matrix):
+    """
+    计算矩阵与数据库现状的差异（只读，三次查询加载现状）
+    矩阵中出现的权限/角色按名称新增或更新；矩阵中的角色，其权限被覆盖为矩阵所列权限；
+    矩阵中未出现的权限/角色保持不变
+    :return: 差异字典
+    """
+    current_permissions = {
+        row[0]: row for row in Permission.objects.order_by().values_list('permission_code', 'id', *PERMISSION_FIELDS)
+    }
+    current_roles = {}
+    role_descriptions = {}
+    for name, role_id, description in Role.objects.order_by().values_list('role_name', 'id', 'description'):
+        current_roles[name] = role_id
+        role_descriptions[name] = description
+    name_owners = {row[2]: code for code, row in current_permissions.items()}
+
+    permission_create = []
+    permission_update = []
+    for code, fields in matrix['permissions'].items():
+        owner = name_owners.get(fields['permission_name'])
+        if owner is not None and owner != code and owner not in matrix['permissions']:
+            raise MatrixError(f"权限名称「{fields['permission_name']}」已被权限「{owner}」使用")
+        current = current_permissions.get(code)
+        if current is None:
+            permission_create.append(code)
+        elif tuple(current[2:]) != tuple(fields[field] for field in PERMISSION_FIELDS):
+            permission_update.append(code)
+
+    role_create = [name for name in matrix['roles'] if name not in current_roles]
+    role_update = [
+        name for name, role in matrix['roles'].items()
+        if name in current_roles and role['description'] is not None and role['description'] != role_descriptions[name]
+    ]
+
+    id_codes = {row[1]: code for code, row in current_permissions.items()}
+    id_roles = {role_id: name for name, role_id in current_roles.items()}
+    existing_grants = set()
+    matrix_role_ids = [current_roles[name] for name in matrix['roles'] if name in current_roles]
+    for role_id, permission_id in (
+        RolePermission.objects.filter(role_id__in=matrix_role_ids).values_list('role_id', 'permission_id')
+    ):
+        existing_grants.add((id_roles[role_id], id_codes[permission_id]))
+    wanted_grants = {(name, code) for name, role in matrix['roles'].items() for code in role['permissions']}
+
+    return {
+        'permission_create': permission_create,
+        'permission_update': permission_update,
+        'role_create': role_create,
+        'role_update': role_update,
+        'grant_add': list(wanted_grants - existing_grants),
+        'grant_remove': list(existing_grants - wanted_grants),
+    }
+
+
+def summarize_diff(diff):
+    """差异统计：{差异类型: 条数}"""
+    return {key: len(items) for key, items in diff.items()}
+
+
+def has_changes(diff):
+    """是否存在任何差异"""
+    return any(diff.values())
+
+
+@transaction.atomic
+def apply_matrix(matrix, diff=None):
+    """
+    将矩阵同步到数据库：权限/角色批量新增与更新，角色-权限中间表批量插入（忽略冲突）与按角色批量删除
+    批量操作不触发模型信号，结束后统一重建闭包表、刷新受影响用户的物化权限并递增版本号
+    :return: 差异字典（即实际应用的变更）
+    """
+    if diff is None:
+        diff = diff_matrix(matrix)
+    if not has_changes(diff):
+        return diff
+
+    permissions = matrix['permissions']
+    Permission.objects.bulk_create(
+        [Permission(permission_code=code, **permissions[code]) for code in diff['permission_create']],
+        batch_size=BATCH_SIZE,
+    )
+    if diff['permission_update']:
+        to_update = list(Permission.objects.filter(permission_code__in=diff['permission_update']))
+        for permission in to_update:
+            for field in PERMISSION_FIELDS:
+                setattr(permission, field, permissions[permission.permission_code][field])
+        Permission.objects.bulk_update(to_update, PERMISSION_FIELDS, batch_size=BATCH_SIZE)
+
+    roles = matrix['roles']
+    Role.objects.bulk_create(
+        [Role(role_name=name, description=roles[name]['description']) for name in diff['role_create']],
+        batch_size=BATCH_SIZE,
+    )
+    if diff['role_update']:
+        to_update = list(Role.objects.filter(role_name__in=diff['role_update']))
+        for role in to_update:
+            role.description = roles[role.role_name]['description']
+        Role.objects.bulk_update(to_update, ['description'], batch_size=BATCH_SIZE)
+
+    # 新增记录后按名称重新加载ID映射（各一次查询）
+    permission_ids = dict(Permission.objects.order_by().values_list('permission_code', 'id'))
+    role_ids = dict(Role.objects.filter(role_name__in=list(roles)).order_by().values_list('role_name', 'id'))
+
+    insert_grants([(role_ids[name], permission_ids[code]) for name, code in diff['grant_add']])
+    removals = {}
+    for name, code in diff['grant_remove']:
+        removals.setdefault(role_ids[name], []).append(permission_ids[code])
+    for role_id, ids in removals.items():
+        RolePermission.objects.filter(role_id=role_id, permission_id__in=ids).delete()
+
+    if diff['role_create']:
+        # 新角色需要闭包自身记录
+        rebuild_role_closure()
+    refresh_role_users({role_ids[name] for name, _ in diff['grant_add'] + diff['grant_remove']})
+    # 权限字段变更（如关联路由）由版本号递增使权限缓存与权限索引失效
+    if diff['permission_create'] or diff['permission_update']:
+        transaction.on_commit(bump_permission_version)
+    transaction.on_commit(bump_rbac_version)
+    return diff
+
+
+def load_matrix_arrays():
+    """
+    加载矩阵编辑器所需数据（三次查询：角色、权限、角色-权限中间表），以紧凑的列式ID数组返回：
+    roles/permissions各字段为等长数组，grants[i]为第i个角色已授予的权限ID数组
+    """
+    role_rows = list(Role.objects.order_by('id').values_list('id', 'role_name'))
+    permission_rows = list(Permission.objects.order_by('id').values_list('id', 'permission_code', 'permission_name'))
+    grants = {role_id: [] for role_id, _ in role_rows}
+    for role_id, permission_id in RolePermission.objects.order_by().values_list('role_id', 'permission_id').iterator(
+        chunk_size=10000
+    ):
+        grants[role_id].append(permission_id)
+    return {
+        'roles': {
+            'ids': [role_id for role_id, _ in role_rows],
+            'names': [name for _, name in role_rows],
+        },
+        'permissions': {
+            'ids': [permission_id for permission_id, _, _ in permission_rows],
+            'codes': [code for _, code, _ in permission_rows],
+            'names': [name for _, _, name in permission_rows],
+        },
+        'grants': [grants[role_id] for role_id, _ in role_rows],
+    }
+
+
+def parse_cell_pairs(raw_pairs):
+    """解析单元格差异 [[role_id, permission_id], ...]，格式错误时抛出MatrixError"""
+    try:
+        return {(int(role_id), int(permission_id)) for role_id, permission_id in raw_pairs or ()}
+    except (TypeError, ValueError):
+        raise MatrixError('单元格差异须为 [[角色ID, 权限ID], ...] 格式')
+
+
+@transaction.atomic
+def apply_cell_diff(add_pairs, remove_pairs):
+    """
+    应用矩阵编辑器提交的单元格差异：中间表批量插入（忽略已存在）与按角色批量删除
+    结束后刷新受影响角色（含子角色）用户的物化权限，事务提交后递增一次全局版本号
+    :param add_pairs: 待授予的(角色ID, 权限ID)集合
+    :param remove_pairs: 待移除的(角色ID, 权限ID)集合
+    :return: {'added': 条数, 'removed': 条数, 'roles': 受影响角色数}
+    """
+    conflicts = add_pairs & remove_pairs
+    if conflicts:
+        raise MatrixError(f'同一单元格不能同时授予和移除：{sorted(conflicts)[:10]}')
+    pairs = add_pairs | remove_pairs
+    if not pairs:
+        return {'added': 0, 'removed': 0, 'roles': 0}
+
+    role_ids = {role_id for role_id, _ in pairs}
+    permission_ids = {permission_id for _, permission_id in pairs}
+    missing_roles = role_ids - set(Role.objects.filter(id__in=role_ids).order_by().values_list('id', flat=True))
+    missing_permissions = permission_ids - set(
+        Permission.objects.filter(id__in=permission_ids).order_by().values_list('id', flat=True)
+    )
+    if missing_roles or missing_permissions:
+        raise MatrixError(f'角色或权限不存在：角色{sorted(missing_roles)[:10]}，权限{sorted(missing_permissions)[:10]}')
+
+    insert_grants(sorted(add_pairs))
+    removals = {}
+    for role_id, permission_id in remove_pairs:
+        removals.setdefault(role_id, []).append(permission_id)
+    removed = 0
+    for role_id, ids in removals.items():
+        removed += RolePermission.objects.filter(role_id=role_id, permission_id__in=ids).delete()[0]
+
+    refresh_role_users(role_ids)
+    transaction.on_commit(bump_rbac_version)
+    return {'added': len(add_pairs), 'removed': removed, 'roles': len(role_ids)}
+
+
+def insert_grants(pairs, batch_size=5000):
+    """
+    角色-权限中间表批量插入，忽略已存在的记录
+    :param pairs: [(role_id, permission_id), ...]
+    """
+    RolePermission.objects.bulk_create(
+        [RolePermission(role_id=role_id, permission_id=permission_id) for role_id, permission_id in pairs],
+        ignore_conflicts=True,
+        batch_size=batch_size,
+    )
+
+
+class _Echo:
+    """伪文件对象：csv.writer写入时直接返回该行内容，用于流式输出"""
+
+    def write(self, value):
+        return value
+
+
+def export_matrix(fmt=FORMAT_CSV):
+    """
+    流式导出当前角色×权限矩阵（与导入格式一致，可直接再次导入）
+    :return: 逐块产出字符串的生成器
+    """
+    role_rows = list(Role.objects.order_by('id').values_list('id', 'role_name', 'description'))
+    grants = {}
+    for role_id, permission_id in RolePermission.objects.values_list('role_id', 'permission_id').iterator():
+        grants.setdefault(permission_id, set()).add(role_id)
+    permission_rows = (
+        Permission.objects.order_by('id')
+        .values_list('id', 'permission_code', *PERMISSION_FIELDS)
+        .iterator(chunk_size=2000)
+    )
+    if fmt == FORMAT_JSON:
+        return _export_json(role_rows, grants, permission_rows)
+    return _export_csv(role_rows, grants, permission_rows)
+
+
+def _export_csv(role_rows, grants, permission_rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(CSV_PERMISSION_COLUMNS + tuple(name for _, name, _ in role_rows))
+    for permission_id, code, *fields in permission_rows:
+        granted = grants.get(permission_id, ())
+        yield writer.writerow(
+            [code] + [value or '' for value in fields] + ['1' if role_id in granted else '' for role_id, _, _ in role_rows]
+        )
+
+
+def _export_json(role_rows, grants, permission_rows):
+    role_codes = {role_id: [] for role_id, _, _ in role_rows}
+    yield '{"permissions": ['
+    for index, (permission_id, code, *fields) in enumerate(permission_rows):
+        item = {'permission_code': code, **dict(zip(PERMISSION_FIELDS, fields))}
+        yield (',\n' if index else '\n') + json.dumps(item, ensure_ascii=False)
+        for role_id in grants.get(permission_id, ()):
+            role_codes[role_id].append(code)
+    yield '\n], "roles": ['
+    for index, (role_id, name, description) in enumerate(role_rows):
+        item = {'role_name': name, 'description': description, 'permissions': role_codes[role_id]}
+        yield (',\n' if index else '\n') + json.dumps(item, ensure_ascii=False)
+    yield '\n]}\n'
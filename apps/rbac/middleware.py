@@ -1,7 +1,56 @@
 # apps/rbac/middleware.py
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
 from django.http import HttpResponseForbidden, HttpResponseRedirect
 from django.urls import reverse
 from django.conf import settings
+from apps.rbac.audit import record_decision
+from apps.rbac.models import AccessDecisionLog
+from apps.rbac.matcher import PrefixTrie
+from apps.rbac.registry import aget_permission_index, get_permission_index
+from apps.rbac.services import aget_request_permissions, aget_request_user, get_request_permissions
+
+
+def get_white_list():
+    """无需权限校验的白名单路由（中间件与路由权限自动发现共用）"""
+    # 内置白名单
+    white_list = set([
+        reverse('users:login'),
+        reverse('users:register'),
+        '/admin/',
+        '/captcha/',
+        '/static/',
+        '/media/'
+    ])
+    # 追加settings中配置的白名单（如DRF接口前缀，由RbacApiPermission负责校验）
+    white_list.update(getattr(settings, 'RBAC_WHITE_LIST', []))
+    return white_list
+
+
+_white_list_trie = None
+
+
+def get_white_list_trie():
+    """白名单前缀树（进程内首次使用时构建，供中间件以外的权限判断复用）"""
+    global _white_list_trie
+    if _white_list_trie is None:
+        _white_list_trie = PrefixTrie((white_path, white_path) for white_path in get_white_list())
+    return _white_list_trie
+
+
+_api_white_list_trie = None
+
+
+def get_api_white_list_trie():
+    """接口白名单前缀树（settings.RBAC_WHITE_LIST，中间件放行，由RbacApiPermission负责校验）"""
+    global _api_white_list_trie
+    if _api_white_list_trie is None:
+        _api_white_list_trie = PrefixTrie(
+            (white_path, white_path) for white_path in getattr(settings, 'RBAC_WHITE_LIST', [])
+        )
+    return _api_white_list_trie
+
 
 class RbacPagePermissionMiddleware:
     """
@@ -9,62 +58,158 @@ class RbacPagePermissionMiddleware:
     1.  排除无需权限校验的路由（如登录、注册、静态资源等）
     2.  校验登录状态：未登录用户重定向到登录页
     3.  校验权限：已登录用户通过「用户→角色→权限」判断是否有权访问当前URL
+        （先按关联路由前缀匹配，未命中时再按路由名称匹配）
+    同时支持WSGI（同步）与ASGI（异步）：ASGI下使用异步缓存接口/异步ORM，避免整条请求链被切换到线程中执行
     """
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
-        # 无需权限校验的白名单路由（可在settings.py中全局配置，此处先内置）
-        self.white_list = set([
-            reverse('users:login'),
-            reverse('users:register'),
-            '/admin/',
-            '/captcha/',
-            '/static/',
-            '/media/'
-        ])
+        # 白名单预编译为前缀树，启动时构建一次
+        self.white_list_trie = get_white_list_trie()
+        self.api_white_list_trie = get_api_white_list_trie()
+
+        # 下游为异步处理器时（ASGI），以协程方式工作；process_view同样提供协程版本，避免Django为其做线程切换
+        self.async_mode = iscoroutinefunction(self.get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+            self.process_view = self.aprocess_view
 
     def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
         # 1. 获取当前请求的URL路径
         current_path = request.path_info
         # 2. 排除白名单路由，直接放行
-        for white_path in self.white_list:
-            if current_path.startswith(white_path):
-                response = self.get_response(request)
-                return response
+        if self.white_list_trie.has_match(current_path):
+            response = self.get_response(request)
+            return response
 
         # 3. 校验用户登录状态：未登录则重定向到登录页
         if not request.user.is_authenticated:
-            return HttpResponseRedirect(f"{reverse('users:login')}?next={current_path}")
+            return self.redirect_to_login(current_path)
 
         # 4. 校验用户权限：超级管理员（is_superuser）直接放行
         if request.user.is_superuser:
             response = self.get_response(request)
             return response
 
-        # 5. 非超级管理员：获取用户所有角色对应的权限，匹配当前URL
-        has_permission = False
+        # 5. 非超级管理员：在预编译的权限索引中按前缀匹配当前URL，再与用户缓存的权限标识求交集
+        #    （权限集缓存在request上，后续接口权限类、模板标签直接复用）
+        start = time.perf_counter()
         try:
-            # 5.1 通过「用户→角色→权限」反向查询，获取用户所有权限
-            user_roles = request.user.roles.all()  # 用户关联的所有角色
-            # 5.2 提取所有权限的关联路由（去重）
-            permission_urls = set()
-            for role in user_roles:
-                role_permissions = role.permissions.all()  # 角色关联的所有权限
-                for perm in role_permissions:
-                    if perm.url_path:  # 仅当权限配置了关联路由时才参与匹配
-                        permission_urls.add(perm.url_path)
-
-            # 5.3 匹配当前URL是否在权限路由列表中（支持前缀匹配）
-            for perm_url in permission_urls:
-                if current_path.startswith(perm_url):
-                    has_permission = True
-                    break
+            has_permission = self.check_permission(
+                request, current_path, get_request_permissions(request).codes, get_permission_index()
+            )
         except Exception as e:
             # 异常情况下，默认无权限
             has_permission = False
+        self.audit(request, request.user, current_path, has_permission, start)
 
         # 6. 权限判断：有权限放行，无权限返回403禁止访问
         if has_permission:
             response = self.get_response(request)
             return response
         else:
-            return HttpResponseForbidden("您没有访问该页面的权限，请联系管理员！")
\ No newline at end of file
+            return self.forbidden()
+
+    async def __acall__(self, request):
+        """异步请求处理：流程与同步版本一致，用户/权限/权限索引均通过异步接口获取"""
+        current_path = request.path_info
+        if self.white_list_trie.has_match(current_path):
+            if self.api_white_list_trie.has_match(current_path):
+                await self.apreload_api_permissions(request)
+            return await self.get_response(request)
+
+        user = await aget_request_user(request)
+        if not user.is_authenticated:
+            return self.redirect_to_login(current_path)
+        if user.is_superuser:
+            return await self.get_response(request)
+
+        start = time.perf_counter()
+        try:
+            # 权限集优先命中进程内缓存，权限索引在检查间隔内直接使用进程内注册表
+            permissions = await aget_request_permissions(request)
+            permission_index = await aget_permission_index()
+            has_permission = self.check_permission(request, current_path, permissions.codes, permission_index)
+        except Exception as e:
+            has_permission = False
+        self.audit(request, user, current_path, has_permission, start)
+
+        if has_permission:
+            return await self.get_response(request)
+        return self.forbidden()
+
+    async def apreload_api_permissions(self, request):
+        """
+        接口请求（ASGI）：DRF的视图与权限类只能同步执行，在此通过异步接口预先加载会话用户的权限集（缓存在request上）
+        与权限索引，RbacApiPermission随后命中请求级缓存，首次未命中时也不再在同步路径中查询数据库
+        令牌认证的请求（会话用户为匿名）直接使用令牌内的权限位图，无需预加载
+        """
+        try:
+            user = await aget_request_user(request)
+            if user.is_authenticated and not user.is_superuser:
+                await aget_request_permissions(request)
+                await aget_permission_index()
+        except Exception as e:
+            # 预加载失败不影响请求，由权限类按同步路径加载
+            pass
+
+    def check_permission(self, request, current_path, user_codes, permission_index):
+        """
+        前缀匹配当前URL；未命中且存在按路由名称配置的权限时，先放行到process_view按view_name再校验一次
+        :return: True（放行）/ False（无权限）
+        """
+        if permission_index.match_path(current_path, user_codes):
+            return True
+        if permission_index.route_codes:
+            request.rbac_route_codes = user_codes
+            request.rbac_permission_index = permission_index
+            return True
+        return False
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        return self.check_route(request)
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        """process_view的协程版本（纯内存判断，无需线程切换）"""
+        return self.check_route(request)
+
+    def check_route(self, request):
+        """
+        路由名称匹配：URL解析完成后，按request.resolver_match.view_name（如users:user_status_update）
+        在权限索引中O(1)查找，使带参数的路由无需前缀扫描即可授权
+        :return: None（放行）/ 403响应
+        """
+        user_codes = getattr(request, 'rbac_route_codes', None)
+        if user_codes is None:
+            return None
+        start = time.perf_counter()
+        view_name = ''
+        try:
+            view_name = request.resolver_match.view_name
+            allowed = request.rbac_permission_index.match_route(view_name, user_codes)
+        except Exception as e:
+            allowed = False
+        record_decision(
+            request.user, request.path_info, allowed, time.perf_counter() - start, AccessDecisionLog.SOURCE_PAGE, view_name
+        )
+        return None if allowed else self.forbidden()
+
+    def audit(self, request, user, current_path, has_permission, start):
+        """
+        记录访问决策（拒绝必记，放行按比例抽样；仅入队，不阻塞请求）
+        放行结果若需交由process_view按路由名称再校验，则由check_route记录最终决策
+        """
+        if has_permission and getattr(request, 'rbac_route_codes', None) is not None:
+            return
+        record_decision(user, current_path, has_permission, time.perf_counter() - start, AccessDecisionLog.SOURCE_PAGE)
+
+    def redirect_to_login(self, current_path):
+        return HttpResponseRedirect(f"{reverse('users:login')}?next={current_path}")
+
+    def forbidden(self):
+        return HttpResponseForbidden("您没有访问该页面的权限，请联系管理员！")
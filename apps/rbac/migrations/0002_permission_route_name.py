@@ -0,0 +1,24 @@
+# Generated by Django 4.2.17 on 2026-10-17 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("rbac", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="permission",
+            name="route_name",
+            field=models.CharField(
+                blank=True,
+                help_text="请输入该权限对应的路由名称（含命名空间），如：users:user_status_update，可匹配带参数的路由，可选填",
+                max_length=128,
+                null=True,
+                verbose_name="关联路由名称",
+            ),
+        ),
+    ]
@@ -0,0 +1,173 @@
+# Generated by Django 4.2.17 on 2026-10-17 03:07
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def materialize_existing(apps, schema_editor):
+    """为已有角色写入闭包自身记录，并物化已有用户的有效权限（此时尚无继承关系）"""
+    Role = apps.get_model("rbac", "Role")
+    RoleClosure = apps.get_model("rbac", "RoleClosure")
+    UserEffectivePermission = apps.get_model("rbac", "UserEffectivePermission")
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+
+    RoleClosure.objects.bulk_create(
+        [
+            RoleClosure(ancestor_id=pk, descendant_id=pk, depth=0)
+            for pk in Role.objects.values_list("id", flat=True)
+        ],
+        batch_size=500,
+    )
+    rows = (
+        User.roles.through.objects.filter(role__permissions__isnull=False)
+        .values_list(
+            "user_id", "role__permissions__id", "role__permissions__permission_code"
+        )
+        .distinct()
+    )
+    UserEffectivePermission.objects.bulk_create(
+        [
+            UserEffectivePermission(
+                user_id=user_id,
+                permission_id=permission_id,
+                permission_code=permission_code,
+            )
+            for user_id, permission_id, permission_code in rows
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("rbac", "0002_permission_route_name"),
+        ("users", "0002_user_roles"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="role",
+            name="parents",
+            field=models.ManyToManyField(
+                blank=True,
+                help_text="子角色自动继承所有父角色（含祖先角色）的权限，可多选",
+                related_name="children",
+                to="rbac.role",
+                verbose_name="父角色",
+            ),
+        ),
+        migrations.CreateModel(
+            name="RoleClosure",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "depth",
+                    models.PositiveIntegerField(
+                        default=0,
+                        help_text="0=自身，1=直接父角色，依此类推",
+                        verbose_name="继承层级",
+                    ),
+                ),
+                (
+                    "ancestor",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="descendant_links",
+                        to="rbac.role",
+                        verbose_name="祖先角色",
+                    ),
+                ),
+                (
+                    "descendant",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="ancestor_links",
+                        to="rbac.role",
+                        verbose_name="后代角色",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "角色继承闭包",
+                "verbose_name_plural": "角色继承闭包",
+            },
+        ),
+        migrations.CreateModel(
+            name="UserEffectivePermission",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "permission_code",
+                    models.CharField(
+                        help_text="冗余存储的权限标识，避免校验时联表",
+                        max_length=64,
+                        verbose_name="权限标识",
+                    ),
+                ),
+                (
+                    "permission",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="effective_users",
+                        to="rbac.permission",
+                        verbose_name="权限",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="effective_permissions",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="用户",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "用户有效权限",
+                "verbose_name_plural": "用户有效权限",
+                "indexes": [
+                    models.Index(
+                        fields=["user", "permission_code"],
+                        name="rbac_uep_user_code_idx",
+                    ),
+                    models.Index(
+                        fields=["permission_code", "user"],
+                        name="rbac_uep_code_user_idx",
+                    ),
+                ],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="usereffectivepermission",
+            constraint=models.UniqueConstraint(
+                fields=("user", "permission"), name="uniq_user_effective_permission"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="roleclosure",
+            constraint=models.UniqueConstraint(
+                fields=("ancestor", "descendant"), name="uniq_role_closure"
+            ),
+        ),
+        migrations.RunPython(materialize_existing, migrations.RunPython.noop),
+    ]
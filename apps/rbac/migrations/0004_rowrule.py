@@ -0,0 +1,99 @@
+# Generated by Django 4.2.17 on 2026-10-17 03:14
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("rbac", "0003_role_parents_materialized_permissions"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RowRule",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "model_label",
+                    models.CharField(
+                        help_text="请输入模型标识（应用名.模型名），如：users.User",
+                        max_length=64,
+                        verbose_name="数据模型",
+                    ),
+                ),
+                (
+                    "scope",
+                    models.CharField(
+                        choices=[
+                            ("all", "全部数据"),
+                            ("self", "仅本人数据"),
+                            ("roles", "指定角色下的数据"),
+                        ],
+                        default="self",
+                        max_length=16,
+                        verbose_name="数据范围",
+                    ),
+                ),
+                (
+                    "field_path",
+                    models.CharField(
+                        blank=True,
+                        default="",
+                        help_text="仅本人数据：与当前用户ID比较的字段（默认id，如LoginLog填user）；指定角色下的数据：指向角色的关联字段（默认roles，如LoginLog填user__roles）",
+                        max_length=128,
+                        verbose_name="关联字段",
+                    ),
+                ),
+                (
+                    "create_time",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now,
+                        editable=False,
+                        verbose_name="创建时间",
+                    ),
+                ),
+                (
+                    "role",
+                    models.ForeignKey(
+                        help_text="拥有该角色（或继承该角色）的用户适用此规则",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="row_rules",
+                        to="rbac.role",
+                        verbose_name="授权角色",
+                    ),
+                ),
+                (
+                    "target_roles",
+                    models.ManyToManyField(
+                        blank=True,
+                        help_text="数据范围为「指定角色下的数据」时生效，包含继承这些角色的子角色",
+                        related_name="targeted_row_rules",
+                        to="rbac.role",
+                        verbose_name="目标角色",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "行级数据规则",
+                "verbose_name_plural": "行级数据规则",
+                "ordering": ["-create_time"],
+                "indexes": [
+                    models.Index(
+                        fields=["model_label", "role"],
+                        name="rbac_rowrule_label_role_idx",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,89 @@
+# Generated by Django 4.2.17 on 2026-10-17 03:22
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("rbac", "0004_rowrule"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AccessDecisionLog",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("path", models.CharField(max_length=256, verbose_name="访问路径")),
+                (
+                    "permission_code",
+                    models.CharField(
+                        blank=True,
+                        default="",
+                        help_text="接口所需权限标识，或页面按路由名称校验时的路由名称",
+                        max_length=128,
+                        verbose_name="权限标识",
+                    ),
+                ),
+                (
+                    "allowed",
+                    models.BooleanField(default=False, verbose_name="是否放行"),
+                ),
+                (
+                    "source",
+                    models.CharField(
+                        choices=[("page", "页面"), ("api", "接口")],
+                        default="page",
+                        max_length=8,
+                        verbose_name="来源",
+                    ),
+                ),
+                (
+                    "latency_ms",
+                    models.FloatField(default=0, verbose_name="校验耗时（毫秒）"),
+                ),
+                (
+                    "create_time",
+                    models.DateTimeField(
+                        db_index=True,
+                        default=django.utils.timezone.now,
+                        verbose_name="记录时间",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        blank=True,
+                        db_constraint=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="access_decision_logs",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="用户",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "访问决策日志",
+                "verbose_name_plural": "访问决策日志",
+                "ordering": ["-create_time"],
+                "indexes": [
+                    models.Index(
+                        fields=["user", "create_time"], name="rbac_adl_user_time_idx"
+                    )
+                ],
+            },
+        ),
+    ]
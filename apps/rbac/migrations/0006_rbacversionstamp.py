@@ -0,0 +1,40 @@
+# Generated by Django 4.2.17 on 2026-10-17 03:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("rbac", "0005_accessdecisionlog"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RbacVersionStamp",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "key",
+                    models.CharField(max_length=64, unique=True, verbose_name="版本键"),
+                ),
+                ("version", models.BigIntegerField(default=0, verbose_name="版本号")),
+                (
+                    "update_time",
+                    models.DateTimeField(auto_now=True, verbose_name="更新时间"),
+                ),
+            ],
+            options={
+                "verbose_name": "RBAC版本戳",
+                "verbose_name_plural": "RBAC版本戳",
+            },
+        ),
+    ]
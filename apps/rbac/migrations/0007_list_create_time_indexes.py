@@ -0,0 +1,25 @@
+# Generated by Django 4.2.17 on 2026-10-17 03:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("rbac", "0006_rbacversionstamp"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="permission",
+            index=models.Index(
+                fields=["-create_time", "-id"], name="rbac_permission_ctime_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="role",
+            index=models.Index(
+                fields=["-create_time", "-id"], name="rbac_role_ctime_idx"
+            ),
+        ),
+    ]
@@ -37,10 +37,22 @@ class Role(models.Model):
         related_name='role_permissions',  # 反向关联名称，便于通过权限查询关联的角色
         help_text='请为该角色分配对应的权限，可多选'
     )
+    parents = models.ManyToManyField(
+        to='self',
+        verbose_name='父角色',
+        symmetrical=False,  # 继承关系有方向：子角色继承父角色的权限
+        blank=True,
+        related_name='children',  # 反向关联名称，便于通过父角色查询子角色
+        help_text='子角色自动继承所有父角色（含祖先角色）的权限，可多选'
+    )
     class Meta:
         verbose_name = '角色管理'  # Django后台显示的单数名称
         verbose_name_plural = '角色管理'  # Django后台显示的复数名称（统一为单数，更符合中文习惯）
         ordering = ['-create_time']  # 按创建时间倒序排列
+        indexes = [
+            # 列表页按 (创建时间, id) 倒序做键集分页
+            models.Index(fields=['-create_time', '-id'], name='rbac_role_ctime_idx'),
+        ]
 
     def __str__(self):
         """模型实例打印时，返回角色名称"""
@@ -71,6 +83,13 @@ class Permission(models.Model):
         null=True,
         help_text='请输入该权限对应的URL路径，如：/users/login/logs/，可选填'
     )
+    route_name = models.CharField(
+        verbose_name='关联路由名称',
+        max_length=128,
+        blank=True,
+        null=True,
+        help_text='请输入该权限对应的路由名称（含命名空间），如：users:user_status_update，可匹配带参数的路由，可选填'
+    )
     description = models.TextField(
         verbose_name='权限描述',
         blank=True,
@@ -91,7 +110,239 @@ class Permission(models.Model):
         verbose_name = '权限管理'
         verbose_name_plural = '权限管理'
         ordering = ['-create_time']
+        indexes = [
+            models.Index(fields=['-create_time', '-id'], name='rbac_permission_ctime_idx'),
+        ]
 
     def __str__(self):
         """模型实例打印时，返回权限名称"""
         return self.permission_name
+
+# 13.3 角色继承闭包表（RoleClosure）
+class RoleClosure(models.Model):
+    """
+    角色继承关系的传递闭包：每条记录表示 descendant 直接或间接继承 ancestor
+    每个角色都有一条 ancestor=descendant、depth=0 的自身记录，便于统一联表查询
+    """
+    ancestor = models.ForeignKey(
+        verbose_name='祖先角色',
+        to='Role',
+        on_delete=models.CASCADE,
+        related_name='descendant_links'
+    )
+    descendant = models.ForeignKey(
+        verbose_name='后代角色',
+        to='Role',
+        on_delete=models.CASCADE,
+        related_name='ancestor_links'
+    )
+    depth = models.PositiveIntegerField(
+        verbose_name='继承层级',
+        default=0,
+        help_text='0=自身，1=直接父角色，依此类推'
+    )
+
+    class Meta:
+        verbose_name = '角色继承闭包'
+        verbose_name_plural = '角色继承闭包'
+        constraints = [
+            models.UniqueConstraint(fields=['ancestor', 'descendant'], name='uniq_role_closure'),
+        ]
+
+    def __str__(self):
+        return f'{self.ancestor_id} → {self.descendant_id}（{self.depth}）'
+
+# 13.4 用户有效权限物化表（UserEffectivePermission）
+class UserEffectivePermission(models.Model):
+    """
+    用户有效权限的物化结果（用户→角色→继承角色→权限 展开后的去重结果）
+    由信号增量维护，可通过 manage.py rbac_materialize 批量重建与校验
+    """
+    user = models.ForeignKey(
+        verbose_name='用户',
+        to=settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='effective_permissions'
+    )
+    permission = models.ForeignKey(
+        verbose_name='权限',
+        to='Permission',
+        on_delete=models.CASCADE,
+        related_name='effective_users'
+    )
+    permission_code = models.CharField(
+        verbose_name='权限标识',
+        max_length=64,
+        help_text='冗余存储的权限标识，避免校验时联表'
+    )
+
+    class Meta:
+        verbose_name = '用户有效权限'
+        verbose_name_plural = '用户有效权限'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'permission'], name='uniq_user_effective_permission'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'permission_code'], name='rbac_uep_user_code_idx'),
+            models.Index(fields=['permission_code', 'user'], name='rbac_uep_code_user_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id} - {self.permission_code}'
+
+# 13.5 行级数据规则（RowRule）
+class RowRule(models.Model):
+    """
+    RBAC行级数据规则：限定角色在接口中可见/可操作的数据行，如「可管理角色A、B下的用户」
+    规则按「用户→角色→继承角色」生效，同一用户的多条规则取并集；
+    某模型未配置任何规则时不做行级限制（兼容未启用行级规则的场景）
+    """
+    SCOPE_ALL = 'all'
+    SCOPE_SELF = 'self'
+    SCOPE_ROLES = 'roles'
+    SCOPE_CHOICES = (
+        (SCOPE_ALL, '全部数据'),
+        (SCOPE_SELF, '仅本人数据'),
+        (SCOPE_ROLES, '指定角色下的数据'),
+    )
+
+    role = models.ForeignKey(
+        verbose_name='授权角色',
+        to='Role',
+        on_delete=models.CASCADE,
+        related_name='row_rules',
+        help_text='拥有该角色（或继承该角色）的用户适用此规则'
+    )
+    model_label = models.CharField(
+        verbose_name='数据模型',
+        max_length=64,
+        help_text='请输入模型标识（应用名.模型名），如：users.User'
+    )
+    scope = models.CharField(
+        verbose_name='数据范围',
+        max_length=16,
+        choices=SCOPE_CHOICES,
+        default=SCOPE_SELF
+    )
+    field_path = models.CharField(
+        verbose_name='关联字段',
+        max_length=128,
+        blank=True,
+        default='',
+        help_text='仅本人数据：与当前用户ID比较的字段（默认id，如LoginLog填user）；'
+                  '指定角色下的数据：指向角色的关联字段（默认roles，如LoginLog填user__roles）'
+    )
+    target_roles = models.ManyToManyField(
+        to='Role',
+        verbose_name='目标角色',
+        blank=True,
+        related_name='targeted_row_rules',
+        help_text='数据范围为「指定角色下的数据」时生效，包含继承这些角色的子角色'
+    )
+    create_time = models.DateTimeField(
+        verbose_name='创建时间',
+        default=timezone.now,
+        editable=False
+    )
+
+    class Meta:
+        verbose_name = '行级数据规则'
+        verbose_name_plural = '行级数据规则'
+        ordering = ['-create_time']
+        indexes = [
+            models.Index(fields=['model_label', 'role'], name='rbac_rowrule_label_role_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.role_id} - {self.model_label}（{self.get_scope_display()}）'
+
+# 13.6 访问决策审计日志（AccessDecisionLog）
+class AccessDecisionLog(models.Model):
+    """
+    RBAC访问决策审计日志：记录页面中间件/接口权限类的拒绝（403）决策，以及按比例抽样的放行决策
+    由后台线程批量写入，不阻塞请求
+    """
+    SOURCE_PAGE = 'page'
+    SOURCE_API = 'api'
+    SOURCE_CHOICES = (
+        (SOURCE_PAGE, '页面'),
+        (SOURCE_API, '接口'),
+    )
+
+    user = models.ForeignKey(
+        verbose_name='用户',
+        to=settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        db_constraint=False,  # 异步批量写入时用户可能已被删除，不做外键约束
+        related_name='access_decision_logs'
+    )
+    path = models.CharField(
+        verbose_name='访问路径',
+        max_length=256
+    )
+    permission_code = models.CharField(
+        verbose_name='权限标识',
+        max_length=128,
+        blank=True,
+        default='',
+        help_text='接口所需权限标识，或页面按路由名称校验时的路由名称'
+    )
+    allowed = models.BooleanField(
+        verbose_name='是否放行',
+        default=False
+    )
+    source = models.CharField(
+        verbose_name='来源',
+        max_length=8,
+        choices=SOURCE_CHOICES,
+        default=SOURCE_PAGE
+    )
+    latency_ms = models.FloatField(
+        verbose_name='校验耗时（毫秒）',
+        default=0
+    )
+    create_time = models.DateTimeField(
+        verbose_name='记录时间',
+        default=timezone.now,
+        db_index=True
+    )
+
+    class Meta:
+        verbose_name = '访问决策日志'
+        verbose_name_plural = '访问决策日志'
+        ordering = ['-create_time']
+        indexes = [
+            models.Index(fields=['user', 'create_time'], name='rbac_adl_user_time_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.path} {'放行' if self.allowed else '拒绝'}"
+
+# 13.7 RBAC版本戳（RbacVersionStamp）
+class RbacVersionStamp(models.Model):
+    """
+    单调递增的版本戳（每个键一行）：未配置共享缓存（如仅使用本地内存缓存）时，
+    各worker进程通过该表感知权限目录变更，重建进程内的权限注册表
+    """
+    key = models.CharField(
+        verbose_name='版本键',
+        max_length=64,
+        unique=True
+    )
+    version = models.BigIntegerField(
+        verbose_name='版本号',
+        default=0
+    )
+    update_time = models.DateTimeField(
+        verbose_name='更新时间',
+        auto_now=True
+    )
+
+    class Meta:
+        verbose_name = 'RBAC版本戳'
+        verbose_name_plural = 'RBAC版本戳'
+
+    def __str__(self):
+        return f'{self.key}={self.version}'
@@ -0,0 +1,130 @@
+# apps/rbac/navigation.py
+import hashlib
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.urls import NoReverseMatch, reverse
+
+from .middleware import get_white_list_trie
+from .registry import get_permission_index
+from .reports import codes_for_path
+from .services import PERMS_CACHE_TIMEOUT, get_rbac_version, get_request_permissions, get_user_permission_version
+
+# 导航菜单定义：[(分组名称, [(菜单名称, 路由名称, 是否仅超级管理员可见), ...]), ...]，可通过RBAC_NAV_MENU覆盖
+NAV_MENU = getattr(settings, 'RBAC_NAV_MENU', [
+    ('个人中心', [
+        ('个人资料', 'users:profile', False),
+        ('修改资料', 'users:profile_update', False),
+        ('重置密码', 'users:password_reset', False),
+    ]),
+    ('系统管理', [
+        ('登录日志', 'users:login_log_list', False),
+        ('角色管理', 'rbac:role_list', True),
+        ('权限管理', 'rbac:permission_list', True),
+        ('权限矩阵', 'rbac:matrix_editor', True),
+        ('权限反查', 'rbac:who_can_report', True),
+    ]),
+])
+# 导航片段模板
+NAV_TEMPLATE = 'rbac/nav.html'
+# 导航片段的缓存键模板：全局RBAC版本号 + 角色组合指纹（角色相同的用户共用同一份片段）
+NAV_CACHE_KEY = 'rbac:nav:{version}:{fingerprint}'
+# 用户角色ID的缓存键模板（带用户权限版本号，用户角色变更后旧键自然作废）
+USER_ROLE_IDS_KEY = 'rbac:role_ids:{version}:{user_id}'
+
+
+class NavCacheStats:
+    """导航片段缓存的命中统计（进程内计数）"""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def record(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def reset(self):
+        with self._lock:
+            self.hits = self.misses = 0
+
+    def as_dict(self):
+        total = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'hit_rate': round(self.hits / total, 4) if total else None}
+
+
+nav_cache_stats = NavCacheStats()
+
+
+def get_user_role_ids(user):
+    """获取用户直接分配的角色ID（升序元组，按用户权限版本号缓存）"""
+    key = USER_ROLE_IDS_KEY.format(version=get_user_permission_version(user.pk), user_id=user.pk)
+    role_ids = cache.get(key)
+    if role_ids is None:
+        role_ids = tuple(sorted(user.roles.order_by().values_list('id', flat=True)))
+        cache.set(key, role_ids, PERMS_CACHE_TIMEOUT)
+    return role_ids
+
+
+def get_nav_fingerprint(user):
+    """角色组合指纹：超级管理员共用一份，其余用户按排序后的角色ID取摘要"""
+    if user.is_superuser:
+        return 'superuser'
+    role_ids = ','.join(str(role_id) for role_id in get_user_role_ids(user))
+    return hashlib.md5(role_ids.encode()).hexdigest()
+
+
+def build_nav(request):
+    """
+    按当前用户权限筛选菜单（逐项判断，仅在缓存未命中时执行）：
+    关联路由匹配菜单URL的权限，以及直接绑定了菜单路由名称的权限（如覆盖其他路由、未设置关联路由的自动发现权限）
+    """
+    user = request.user
+    permissions = get_request_permissions(request)
+    white_list_trie = get_white_list_trie()
+    route_codes = get_permission_index().route_codes
+    groups = []
+    for group_title, items in NAV_MENU:
+        visible = []
+        for title, url_name, superuser_only in items:
+            if superuser_only and not user.is_superuser:
+                continue
+            try:
+                url = reverse(url_name)
+            except NoReverseMatch:
+                continue
+            if (
+                user.is_superuser
+                or white_list_trie.has_match(url)
+                or permissions.has_any(route_codes.get(url_name, ()))
+                or permissions.has_any(codes_for_path(url))
+            ):
+                visible.append({'title': title, 'url': url})
+        if visible:
+            groups.append({'title': group_title, 'items': visible})
+    return groups
+
+
+def render_nav(request):
+    """
+    渲染当前用户的导航片段：
+    缓存键只取决于全局RBAC版本号与角色组合，角色相同的成千上万个用户共用同一份片段；
+    角色/权限/继承关系变更递增全局版本号，用户角色变更改变其指纹，均无需主动清理缓存
+    片段中不能包含与单个用户相关的内容（如用户名、CSRF令牌）
+    """
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return ''
+    key = NAV_CACHE_KEY.format(version=get_rbac_version(), fingerprint=get_nav_fingerprint(user))
+    html = cache.get(key)
+    nav_cache_stats.record(html is not None)
+    if html is None:
+        html = render_to_string(NAV_TEMPLATE, {'nav_groups': build_nav(request)})
+        cache.set(key, html, PERMS_CACHE_TIMEOUT)
+    return html
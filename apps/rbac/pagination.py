@@ -0,0 +1,127 @@
+# apps/rbac/pagination.py
+import base64
+import json
+from datetime import datetime
+
+from django.db.models import Q
+from django.http import Http404
+
+
+class KeysetPage:
+    """
+    键集分页的一页数据（接口与Django的Page对象保持一致的部分：object_list、has_next、has_previous、has_other_pages）
+    不执行COUNT(*)，因此没有总页数与页码
+    """
+
+    def __init__(self, object_list, has_next, has_previous, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+
+class KeysetPaginator:
+    """
+    键集分页（游标分页）：按 (时间字段, id) 倒序，以上一页最后一条记录的键作为下一页的起点，
+    翻页条件为 WHERE (时间, id) < (游标时间, 游标id) ORDER BY 时间 DESC, id DESC LIMIT n+1，
+    配合 (时间字段, id) 索引，任意页的查询成本都与第一页相同，不随页码增长
+    """
+
+    def __init__(self, queryset, per_page, field='create_time'):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.field = field
+
+    @staticmethod
+    def encode_cursor(value, pk):
+        """将 (时间, id) 编码为URL安全的游标字符串"""
+        raw = json.dumps([value.isoformat(), pk], separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    @staticmethod
+    def decode_cursor(cursor):
+        """解析游标，非法游标抛出ValueError"""
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            value, pk = json.loads(raw)
+            return datetime.fromisoformat(value), int(pk)
+        except (TypeError, ValueError, UnicodeDecodeError, json.JSONDecodeError) as e:
+            raise ValueError('分页游标不合法') from e
+
+    def _cursor_of(self, obj):
+        return self.encode_cursor(getattr(obj, self.field), obj.pk)
+
+    def fetch(self, after=None, before=None, limit=None):
+        """
+        按已解析的游标键取数据（子类可覆盖以合并其他数据源）
+        :param after: (时间, id)，取该键之后（更早）的数据，按键倒序返回
+        :param before: (时间, id)，取该键之前（更新）的数据，按键正序返回（紧邻游标的在前）
+        :param limit: 最多条数
+        """
+        field = self.field
+        queryset = self.queryset
+        if before is not None:
+            value, pk = before
+            queryset = queryset.filter(Q(**{f'{field}__gt': value}) | Q(**{field: value, 'pk__gt': pk}))
+            return list(queryset.order_by(field, 'pk')[:limit])
+        if after is not None:
+            value, pk = after
+            queryset = queryset.filter(Q(**{f'{field}__lt': value}) | Q(**{field: value, 'pk__lt': pk}))
+        return list(queryset.order_by(f'-{field}', '-pk')[:limit])
+
+    def page(self, after=None, before=None):
+        """
+        获取一页数据
+        :param after: 下一页游标（返回该游标之后、即更早的数据）
+        :param before: 上一页游标（返回该游标之前、即更新的数据）
+        :return: KeysetPage
+        """
+        if before:
+            rows = self.fetch(before=self.decode_cursor(before), limit=self.per_page + 1)
+            has_previous = len(rows) > self.per_page
+            rows = rows[:self.per_page][::-1]
+            has_next = True
+        else:
+            rows = self.fetch(after=self.decode_cursor(after) if after else None, limit=self.per_page + 1)
+            has_next = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            has_previous = bool(after)
+        return KeysetPage(
+            rows,
+            has_next=has_next,
+            has_previous=has_previous,
+            next_cursor=self._cursor_of(rows[-1]) if has_next and rows else None,
+            previous_cursor=self._cursor_of(rows[0]) if has_previous and rows else None,
+        )
+
+
+class KeysetPaginationMixin:
+    """
+    ListView的键集分页Mixin：替换默认的OFFSET分页（页码越大越慢，且每页额外执行一次COUNT(*)）
+    请求参数 after/before 为游标，模板中通过 page_obj.next_cursor / page_obj.previous_cursor 生成翻页链接
+    """
+    keyset_field = 'create_time'
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = KeysetPaginator(queryset, page_size, self.keyset_field)
+        try:
+            page = paginator.page(after=self.request.GET.get('after'), before=self.request.GET.get('before'))
+        except ValueError as e:
+            raise Http404(str(e))
+        return paginator, page, page.object_list, page.has_other_pages()
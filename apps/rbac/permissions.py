@@ -1,6 +1,13 @@
 # apps/rbac/permissions.py
+import time
+
 from rest_framework import permissions
-from apps.rbac.models import Permission
+from apps.rbac.audit import record_decision
+from apps.rbac.authentication import RbacTokenUser
+from apps.rbac.models import AccessDecisionLog
+from apps.rbac.filters import RbacRowFilterBackend, row_predicate_allows
+from apps.rbac.registry import permission_registry
+from apps.rbac.services import get_request_permissions
 
 class RbacApiPermission(permissions.BasePermission):
     """
@@ -8,11 +15,30 @@ class RbacApiPermission(permissions.BasePermission):
     1.  校验用户登录状态
     2.  超级管理员豁免权限校验
     3.  非超级管理员校验「用户→角色→权限」是否匹配接口所需权限
+    ASGI部署时，RbacPagePermissionMiddleware已通过异步接口预加载会话用户的权限集，此处命中请求级缓存
     """
     # 接口所需权限标识（可在视图中动态指定，此处为默认值）
     required_permission_code = None
 
     def has_permission(self, request, view):
+        """校验接口访问权限（视图级别权限），同一请求内结果缓存在request上，供对象级校验复用"""
+        memo = getattr(request, '_rbac_view_decision', None)
+        if memo is not None and memo[0] is view:
+            return memo[1]
+        start = time.perf_counter()
+        decision = self.check_view_permission(request, view)
+        request._rbac_view_decision = (view, decision)
+        self.audit(request, view, decision, start)
+        return decision
+
+    def audit(self, request, view, decision, start):
+        """记录接口访问决策（拒绝必记，放行按比例抽样；仅入队，不阻塞请求）"""
+        record_decision(
+            request.user, request.path, decision, time.perf_counter() - start, AccessDecisionLog.SOURCE_API,
+            getattr(view, 'required_permission_code', self.required_permission_code),
+        )
+
+    def check_view_permission(self, request, view):
         """
         校验接口访问权限（视图级别权限）
         :param request: DRF的Request对象
@@ -33,29 +59,32 @@ class RbacApiPermission(permissions.BasePermission):
             # 若未指定权限标识，默认放行（可根据业务需求改为禁止）
             return True
 
-        # 4. 非超级管理员：校验「用户→角色→权限」是否包含指定权限标识
+        # 4. 非超级管理员：权限标识不存在（进程内权限注册表中查不到）时直接拒绝，不再加载用户权限集；
+        #    否则校验请求级缓存的有效权限集是否包含指定权限标识（缓存命中时无数据库查询）
+        #    令牌认证的用户直接对令牌内的权限位图做位运算，无需查询数据库
         try:
-            # 4.1 获取用户所有角色
-            user_roles = request.user.roles.all()
-            if not user_roles:
+            if not permission_registry.exists(required_perm_code):
                 return False
-
-            # 4.2 获取指定权限标识的权限对象
-            perm = Permission.objects.get(permission_code=required_perm_code)
-
-            # 4.3 校验用户角色是否绑定该权限
-            for role in user_roles:
-                if perm in role.permissions.all():
-                    return True
-            return False
-        except Permission.DoesNotExist:
-            return False
+            if isinstance(request.user, RbacTokenUser):
+                return request.user.has_permission_code(required_perm_code)
+            return get_request_permissions(request).has_code(required_perm_code)
         except Exception as e:
             return False
 
     def has_object_permission(self, request, view, obj):
         """
         校验对象级权限（如：修改指定用户时，校验是否有权限）
-        可根据业务需求扩展，此处默认返回视图级权限结果
+        1.  复用本请求已计算的视图级权限结果，不再重复查询
+        2.  视图已配置RbacRowFilterBackend时，get_object()已按行级规则过滤，无需再次校验；
+            否则按同一预编译的行级条件校验该对象
         """
-        return self.has_permission(request, view)
\ No newline at end of file
+        if not self.has_permission(request, view):
+            return False
+        if request.user.is_superuser:
+            return True
+        if any(issubclass(backend, RbacRowFilterBackend) for backend in getattr(view, 'filter_backends', ())):
+            return True
+        try:
+            return row_predicate_allows(request, obj)
+        except Exception as e:
+            return False
\ No newline at end of file
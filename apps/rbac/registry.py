@@ -0,0 +1,144 @@
+# apps/rbac/registry.py
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+
+from . import services
+from .matcher import abuild_permission_index, build_permission_index
+
+logger = logging.getLogger(__name__)
+
+# 注册表检查权限目录版本号的最短间隔（秒）：间隔内直接使用进程内索引，不读缓存/数据库；
+# 其他进程（worker）的权限变更最迟在该间隔后生效，可通过RBAC_REGISTRY_CHECK_INTERVAL覆盖（0表示每次都检查）
+REGISTRY_CHECK_INTERVAL = getattr(settings, 'RBAC_REGISTRY_CHECK_INTERVAL', 1.0)
+
+
+class PermissionRegistry:
+    """
+    进程内权限注册表：
+    1.  worker启动时预加载全部权限（一次查询）编译为PermissionIndex，权限标识→(权限ID, 关联路由)
+    2.  索引包含全部权限，查不到的标识即不存在（天然的否定缓存），未知标识不再访问数据库
+    3.  每隔check_interval秒读取一次单调递增的权限目录版本号（共享缓存或RbacVersionStamp版本表），
+        版本号变化时重建索引，各worker在有界的延迟内收敛
+    4.  本进程自身递增过版本号时立即重建（不依赖版本号比较，事务回滚导致版本号回退时也不会沿用旧索引）
+    """
+
+    def __init__(self, check_interval=REGISTRY_CHECK_INTERVAL):
+        self.check_interval = check_interval
+        # (权限目录版本号, PermissionIndex)
+        self._state = None
+        # 上次检查版本号的时间（monotonic）及当时本进程的版本号递增次数
+        self._checked_at = 0.0
+        self._local_bumps = -1
+        self._lock = threading.Lock()
+        self.checks = 0
+        self.rebuilds = 0
+
+    def _is_fresh(self):
+        """检查间隔内且本进程未递增过版本号时，直接使用当前索引"""
+        return (
+            self._state is not None
+            and self._local_bumps == services.local_permission_bumps
+            and time.monotonic() - self._checked_at < self.check_interval
+        )
+
+    def _mark_checked(self, local_bumps):
+        self._local_bumps = local_bumps
+        self._checked_at = time.monotonic()
+        self.checks += 1
+
+    def get_index(self):
+        """
+        获取当前权限索引（检查间隔内无任何IO）
+        :return: PermissionIndex
+        """
+        state = self._state
+        if state is not None and self._is_fresh():
+            return state[1]
+        with self._lock:
+            if self._is_fresh():
+                return self._state[1]
+            local_bumps = services.local_permission_bumps
+            version = services.get_permission_version()
+            state = self._state
+            if state is None or state[0] != version or local_bumps != self._local_bumps:
+                state = self._state = (version, build_permission_index(version))
+                self.rebuilds += 1
+            self._mark_checked(local_bumps)
+        return state[1]
+
+    async def aget_index(self):
+        """get_index的异步版本（版本号走异步接口，重建时用async for加载权限）"""
+        state = self._state
+        if state is not None and self._is_fresh():
+            return state[1]
+        local_bumps = services.local_permission_bumps
+        version = await services.aget_permission_version()
+        state = self._state
+        if state is None or state[0] != version or local_bumps != self._local_bumps:
+            state = self._state = (version, await abuild_permission_index(version))
+            self.rebuilds += 1
+        self._mark_checked(local_bumps)
+        return state[1]
+
+    def lookup(self, permission_code):
+        """
+        按权限标识查找权限
+        :return: (权限ID, 关联路由)，权限不存在时返回None
+        """
+        return self.get_index().entries.get(permission_code)
+
+    def exists(self, permission_code):
+        """判断权限标识是否存在"""
+        return permission_code in self.get_index().entries
+
+    def invalidate(self):
+        """使下次访问时立即检查版本号（不丢弃当前索引）"""
+        self._checked_at = 0.0
+
+    def reset(self):
+        """丢弃当前索引，下次访问时重新加载（测试、基准测试模拟冷启动时使用）"""
+        with self._lock:
+            self._state = None
+            self._checked_at = 0.0
+
+    def stats(self):
+        """运行统计：当前版本号、权限数、版本检查次数、重建次数"""
+        state = self._state
+        return {
+            'version': state[0] if state else None,
+            'permissions': len(state[1].entries) if state else 0,
+            'checks': self.checks,
+            'rebuilds': self.rebuilds,
+        }
+
+
+# 进程内唯一的权限注册表
+permission_registry = PermissionRegistry()
+
+
+def get_permission_index():
+    """获取当前进程的权限索引（见PermissionRegistry）"""
+    return permission_registry.get_index()
+
+
+async def aget_permission_index():
+    """get_permission_index的异步版本"""
+    return await permission_registry.aget_index()
+
+
+def preload_permission_registry():
+    """
+    worker启动时预加载权限注册表（在wsgi.py/asgi.py中创建application后调用）
+    数据库尚未迁移等情况下加载失败只记录日志，首次访问时会再次加载；
+    加载后关闭数据库连接，避免gunicorn --preload时fork出的worker共用主进程的连接
+    """
+    try:
+        permission_registry.get_index()
+    except Exception:
+        logger.exception('RBAC权限注册表预加载失败')
+    finally:
+        connections.close_all()
@@ -0,0 +1,103 @@
+# apps/rbac/reports.py
+import csv
+import hashlib
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.urls import Resolver404, resolve
+
+from .matrix import _Echo
+from .models import UserEffectivePermission
+from .registry import get_permission_index
+from .services import PERMS_CACHE_TIMEOUT, get_report_version
+from .streaming import iter_rows_by_pk
+
+User = get_user_model()
+
+# 「谁拥有该权限」汇总结果的缓存键模板（带全局版本号与报表版本号，RBAC变更后旧键自然作废）
+WHO_CAN_KEY = 'rbac:who_can:{version}:{report_version}:{digest}'
+# 导出/接口返回的用户字段
+USER_FIELDS = ('id', 'username', 'phone', 'email', 'is_active', 'is_superuser')
+CSV_HEADERS = ('用户ID', '用户名', '手机号', '邮箱', '是否启用', '超级管理员')
+
+
+def codes_for_path(path):
+    """
+    按URL反查可访问该路径的权限标识（与中间件的判断方式一致）：
+    关联路由为该路径前缀的权限，以及绑定了该路径路由名称的权限
+    """
+    index = get_permission_index()
+    codes = set(index.url_trie.match(path))
+    try:
+        view_name = resolve(path).view_name
+    except Resolver404:
+        view_name = None
+    if view_name:
+        codes |= index.route_codes.get(view_name, frozenset())
+    return codes
+
+
+def resolve_codes(permission_code=None, path=None):
+    """
+    报表查询条件 → 权限标识集合（仅保留存在的权限标识，查询进程内权限注册表，无数据库查询）
+    :param permission_code: 权限标识
+    :param path: URL路径
+    """
+    codes = set()
+    if permission_code:
+        codes.add(permission_code)
+    if path:
+        codes |= codes_for_path(path)
+    entries = get_permission_index().entries
+    return sorted(code for code in codes if code in entries)
+
+
+def who_can_queryset(codes, include_superusers=True):
+    """
+    拥有任一指定权限标识的用户（一条SQL：用户表 + 用户有效权限物化表子查询，已展开角色继承）
+    :param include_superusers: 是否包含超级管理员（超级管理员豁免权限校验，视为拥有全部权限）
+    """
+    condition = Q(pk__in=UserEffectivePermission.objects.filter(permission_code__in=codes).values('user_id'))
+    if include_superusers:
+        condition |= Q(is_superuser=True)
+    return User.objects.filter(condition).order_by('id')
+
+
+def who_can_summary(codes, include_superusers=True):
+    """
+    汇总「谁拥有该权限」：总人数、启用人数、超级管理员人数及按权限标识的人数
+    结果按RBAC版本号缓存，角色/权限/用户角色/用户状态变更后自动作废
+    """
+    digest = hashlib.md5(f"{include_superusers}|{'|'.join(codes)}".encode()).hexdigest()
+    version, report_version = get_report_version()
+    key = WHO_CAN_KEY.format(version=version, report_version=report_version, digest=digest)
+    summary = cache.get(key)
+    if summary is None:
+        summary = who_can_queryset(codes, include_superusers).aggregate(
+            users=Count('pk'),
+            active_users=Count('pk', filter=Q(is_active=True)),
+            superusers=Count('pk', filter=Q(is_superuser=True)),
+        )
+        summary['codes'] = list(codes)
+        summary['by_code'] = dict(
+            UserEffectivePermission.objects
+            .filter(permission_code__in=codes)
+            .order_by()
+            .values('permission_code')
+            .annotate(users=Count('user_id'))
+            .values_list('permission_code', 'users')
+        )
+        cache.set(key, summary, PERMS_CACHE_TIMEOUT)
+    return summary
+
+
+def export_who_can(codes, include_superusers=True):
+    """
+    流式导出拥有指定权限的用户（CSV，分块迭代，内存占用与用户总数无关）
+    :return: 逐行产出字符串的生成器
+    """
+    writer = csv.writer(_Echo())
+    yield writer.writerow(CSV_HEADERS)
+    for row in iter_rows_by_pk(who_can_queryset(codes, include_superusers), USER_FIELDS):
+        yield writer.writerow(row)
@@ -0,0 +1,403 @@
+# apps/rbac/services.py
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db.models import F
+from django.utils.functional import LazyObject, empty
+
+from .models import RbacVersionStamp, UserEffectivePermission
+
+# 全局RBAC版本号的缓存键：角色/权限任意变更时递增，所有用户权限缓存随之失效
+RBAC_VERSION_KEY = 'rbac:version'
+# 权限目录版本号的缓存键：仅Permission行新增/修改/删除时递增，用于重建预编译的权限索引
+PERMISSION_VERSION_KEY = 'rbac:permission_version'
+# 用户版本号的缓存键模板：用户-角色关系变更时递增，仅该用户的权限缓存失效
+USER_VERSION_KEY = 'rbac:user_version:{user_id}'
+# 报表版本号的缓存键：用户-角色关系、用户状态变更时递增（与全局版本号共同组成「谁拥有该权限」报表的缓存键）
+REPORT_VERSION_KEY = 'rbac:report_version'
+# 用户有效权限的缓存键模板（带全局版本号+用户版本号，版本变化后旧键自然作废）
+USER_PERMS_KEY = 'rbac:perms:{version}:{user_id}'
+# 用户有效权限缓存时长（秒），可在settings中通过RBAC_PERMS_CACHE_TIMEOUT覆盖
+PERMS_CACHE_TIMEOUT = getattr(settings, 'RBAC_PERMS_CACHE_TIMEOUT', 300)
+# 批量失效用户权限时，超过该数量则改为递增全局版本号
+BULK_INVALIDATE_THRESHOLD = 1000
+# 权限目录版本号的存储位置：cache（共享缓存，如Redis）/ db（RbacVersionStamp单行版本表）/
+# auto（默认缓存为本地内存或Dummy缓存、无法跨worker共享时使用db，否则使用cache），可通过RBAC_VERSION_SOURCE覆盖
+VERSION_SOURCE = getattr(settings, 'RBAC_VERSION_SOURCE', 'auto')
+# 进程内权限集缓存的最大条目数（键含版本号，版本变化后旧条目不再命中，超限时整体清空）
+LOCAL_PERMS_MAX_SIZE = 1024
+# 进程内权限集缓存的有效期（秒），可通过RBAC_LOCAL_PERMS_TTL覆盖：
+# 默认缓存为本地内存缓存时版本号无法跨worker共享，其他worker的权限变更只能靠过期感知，
+# 有效期保证进程内缓存不会比共享缓存条目（PERMS_CACHE_TIMEOUT）保留得更久
+LOCAL_PERMS_TTL = min(getattr(settings, 'RBAC_LOCAL_PERMS_TTL', 5), PERMS_CACHE_TIMEOUT)
+
+# 进程内权限集缓存：{用户有效权限缓存键: (过期时间（monotonic）, EffectivePermissions)}，命中时省去一次缓存读取与反序列化
+_local_perms = {}
+# 本进程递增权限目录版本号的次数：权限注册表据此立即感知本进程的变更（其他进程的变更在检查间隔内感知）
+local_permission_bumps = 0
+
+
+class EffectivePermissions:
+    """
+    用户有效权限集合（只读）：
+    1.  codes：用户所有角色绑定的权限标识集合，用于按钮级/接口级校验
+    2.  url_paths：用户所有权限的关联路由（去重），用于页面级前缀匹配
+    """
+    __slots__ = ('codes', 'url_paths')
+
+    def __init__(self, codes=(), url_paths=()):
+        self.codes = frozenset(codes)
+        self.url_paths = tuple(url_paths)
+
+    def __contains__(self, permission_code):
+        """支持模板中 {% if 'user_view' in perms %} 写法"""
+        return self.has_code(permission_code)
+
+    def has_code(self, permission_code):
+        """判断是否拥有指定权限标识"""
+        return permission_code in self.codes
+
+    def has_any(self, permission_codes):
+        """判断是否拥有任一权限标识"""
+        return not self.codes.isdisjoint(permission_codes)
+
+    def has_all(self, permission_codes):
+        """判断是否拥有全部权限标识"""
+        return self.codes.issuperset(permission_codes)
+
+    def match_url(self, path):
+        """判断当前URL是否命中任一权限路由（前缀匹配）"""
+        for url_path in self.url_paths:
+            if path.startswith(url_path):
+                return True
+        return False
+
+
+class SuperuserPermissions(EffectivePermissions):
+    """超级管理员权限集：任意权限标识/URL均视为拥有"""
+    __slots__ = ()
+
+    def has_code(self, permission_code):
+        return True
+
+    def has_any(self, permission_codes):
+        return True
+
+    def has_all(self, permission_codes):
+        return True
+
+    def match_url(self, path):
+        return True
+
+
+# 空权限集（未登录用户/无角色用户共用）
+EMPTY_PERMISSIONS = EffectivePermissions()
+# 超级管理员权限集（所有超级管理员共用）
+SUPERUSER_PERMISSIONS = SuperuserPermissions()
+
+
+def _get_version(key):
+    """读取缓存中的版本号（不存在时以毫秒时间戳初始化）"""
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, int(time.time() * 1000), timeout=None)
+        version = cache.get(key, 0)
+    return version
+
+
+def _bump_version(key):
+    """递增缓存中的版本号并返回新值"""
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # 版本键不存在（首次使用或被缓存淘汰）：以当前毫秒时间戳作为新版本，保证单调递增
+        version = int(time.time() * 1000)
+        cache.set(key, version, timeout=None)
+        return version
+
+
+def get_rbac_version():
+    """获取当前全局RBAC版本号"""
+    return _get_version(RBAC_VERSION_KEY)
+
+
+def bump_rbac_version():
+    """
+    递增全局RBAC版本号，使所有用户的权限缓存失效
+    :return: 递增后的版本号
+    """
+    return _bump_version(RBAC_VERSION_KEY)
+
+
+def permission_version_in_db():
+    """权限目录版本号是否存储在数据库版本表中（见VERSION_SOURCE）"""
+    if VERSION_SOURCE == 'auto':
+        return isinstance(caches['default'], (LocMemCache, DummyCache))
+    return VERSION_SOURCE == 'db'
+
+
+def get_permission_version():
+    """获取当前权限目录版本号（仅Permission行变更时递增）"""
+    if permission_version_in_db():
+        version = RbacVersionStamp.objects.filter(key=PERMISSION_VERSION_KEY).values_list('version', flat=True).first()
+        return version or 0
+    return _get_version(PERMISSION_VERSION_KEY)
+
+
+def bump_permission_version():
+    """
+    递增权限目录版本号，使各进程内预编译的权限注册表重建
+    :return: 递增后的版本号
+    """
+    global local_permission_bumps
+    if permission_version_in_db():
+        updated = RbacVersionStamp.objects.filter(key=PERMISSION_VERSION_KEY).update(version=F('version') + 1)
+        if not updated:
+            RbacVersionStamp.objects.get_or_create(key=PERMISSION_VERSION_KEY, defaults={'version': 1})
+        version = get_permission_version()
+    else:
+        version = _bump_version(PERMISSION_VERSION_KEY)
+    # 先写入新版本号再计数，保证注册表按计数重新检查时读到的是新版本号
+    local_permission_bumps += 1
+    return version
+
+
+def get_user_permission_version(user_id):
+    """
+    获取用户权限版本号：全局版本号 + 用户版本号（一次缓存往返）
+    任一变化即表示该用户的有效权限可能已变化，可用于缓存键、令牌刷新、ETag等
+    :return: 形如 "1760000000000.3" 的字符串
+    """
+    user_key = USER_VERSION_KEY.format(user_id=user_id)
+    versions = cache.get_many([RBAC_VERSION_KEY, user_key])
+    global_version = versions.get(RBAC_VERSION_KEY)
+    if global_version is None:
+        global_version = get_rbac_version()
+    user_version = versions.get(user_key)
+    if user_version is None:
+        user_version = _get_version(user_key)
+    return f'{global_version}.{user_version}'
+
+
+def invalidate_user_permissions(user_ids):
+    """
+    仅失效指定用户的权限缓存（用户-角色关系变更时使用，不影响其他用户）
+    :param user_ids: 用户ID可迭代对象
+    """
+    user_ids = list(user_ids)
+    if len(user_ids) > BULK_INVALIDATE_THRESHOLD:
+        # 受影响用户过多时，直接递增全局版本号（一次缓存操作），避免逐个递增用户版本号
+        bump_rbac_version()
+        return
+    for user_id in user_ids:
+        _bump_version(USER_VERSION_KEY.format(user_id=user_id))
+    if user_ids:
+        bump_report_version()
+
+
+def get_report_version():
+    """获取报表版本号（全局版本号, 报表版本号），任一变化时报表缓存作废"""
+    return get_rbac_version(), _get_version(REPORT_VERSION_KEY)
+
+
+def bump_report_version():
+    """递增报表版本号（仅影响报表缓存，不影响用户权限缓存）"""
+    return _bump_version(REPORT_VERSION_KEY)
+
+
+def load_user_permissions(user_id):
+    """
+    从物化表加载用户有效权限（已展开角色继承关系，一次查询）
+    :return: (权限标识元组, 关联路由元组)
+    """
+    rows = (
+        UserEffectivePermission.objects
+        .filter(user_id=user_id)
+        .values_list('permission_code', 'permission__url_path')
+    )
+    codes = set()
+    url_paths = set()
+    for permission_code, url_path in rows:
+        codes.add(permission_code)
+        if url_path:  # 仅当权限配置了关联路由时才参与匹配
+            url_paths.add(url_path)
+    return tuple(codes), tuple(url_paths)
+
+
+def get_effective_permissions(user):
+    """
+    获取用户有效权限（优先读缓存，未命中时查库并回写缓存）
+    :param user: 用户对象（未登录用户返回空权限集）
+    :return: EffectivePermissions
+    """
+    if not user or not user.is_authenticated:
+        return EMPTY_PERMISSIONS
+
+    key = USER_PERMS_KEY.format(version=get_user_permission_version(user.pk), user_id=user.pk)
+    permissions = _get_local_permissions(key)
+    if permissions is not None:
+        return permissions
+    cached = cache.get(key)
+    if cached is None:
+        cached = load_user_permissions(user.pk)
+        cache.set(key, cached, PERMS_CACHE_TIMEOUT)
+    return _remember_permissions(key, cached)
+
+
+def _get_local_permissions(key):
+    """读取进程内权限集缓存（已过期返回None）"""
+    item = _local_perms.get(key)
+    if item is None or item[0] <= time.monotonic():
+        return None
+    return item[1]
+
+
+def _remember_permissions(key, cached):
+    """将缓存读取结果写入进程内权限集缓存"""
+    if len(_local_perms) >= LOCAL_PERMS_MAX_SIZE:
+        _local_perms.clear()
+    permissions = EffectivePermissions(*cached)
+    _local_perms[key] = (time.monotonic() + LOCAL_PERMS_TTL, permissions)
+    return permissions
+
+
+def get_request_permissions(request):
+    """
+    获取当前请求用户的有效权限（同一请求内只计算一次，结果缓存在request对象上）
+    中间件、接口权限类、模板标签在同一请求中共用该结果
+    :param request: HttpRequest或DRF的Request对象
+    :return: EffectivePermissions（超级管理员返回SUPERUSER_PERMISSIONS）
+    """
+    user = getattr(request, 'user', None)
+    user_id = user.pk if user is not None and user.is_authenticated else None
+    memo = getattr(request, '_rbac_permissions', None)
+    # 缓存结果需与当前用户一致（DRF认证后的用户可能与会话用户不同）
+    if memo is not None and memo[0] == user_id:
+        return memo[1]
+
+    if user_id is None:
+        permissions = EMPTY_PERMISSIONS
+    elif user.is_superuser:
+        permissions = SUPERUSER_PERMISSIONS
+    else:
+        permissions = get_effective_permissions(user)
+    request._rbac_permissions = (user_id, permissions)
+    return permissions
+
+
+# ---------------- 异步版本（ASGI）：使用异步缓存接口与异步ORM，供异步中间件/异步视图调用 ----------------
+# 注：Django 4.2内置缓存后端的异步接口均为sync_to_async包装，每次调用都会切换一次线程，
+#     因此异步版本优先命中进程内权限集缓存，减少线程切换
+
+async def _aget_version(key):
+    """_get_version的异步版本"""
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, int(time.time() * 1000), timeout=None)
+        version = await cache.aget(key, 0)
+    return version
+
+
+async def aget_permission_version():
+    """get_permission_version的异步版本"""
+    if permission_version_in_db():
+        version = await (
+            RbacVersionStamp.objects.filter(key=PERMISSION_VERSION_KEY).values_list('version', flat=True).afirst()
+        )
+        return version or 0
+    return await _aget_version(PERMISSION_VERSION_KEY)
+
+
+async def aget_user_permission_version(user_id):
+    """get_user_permission_version的异步版本"""
+    user_key = USER_VERSION_KEY.format(user_id=user_id)
+    versions = await cache.aget_many([RBAC_VERSION_KEY, user_key])
+    global_version = versions.get(RBAC_VERSION_KEY)
+    if global_version is None:
+        global_version = await _aget_version(RBAC_VERSION_KEY)
+    user_version = versions.get(user_key)
+    if user_version is None:
+        user_version = await _aget_version(user_key)
+    return f'{global_version}.{user_version}'
+
+
+async def aload_user_permissions(user_id):
+    """load_user_permissions的异步版本（async for遍历查询集）"""
+    rows = (
+        UserEffectivePermission.objects
+        .filter(user_id=user_id)
+        .values_list('permission_code', 'permission__url_path')
+    )
+    codes = set()
+    url_paths = set()
+    async for permission_code, url_path in rows:
+        codes.add(permission_code)
+        if url_path:
+            url_paths.add(url_path)
+    return tuple(codes), tuple(url_paths)
+
+
+async def aget_effective_permissions(user, version=None):
+    """
+    get_effective_permissions的异步版本
+    :param version: 已读取的用户权限版本号（可选，避免重复读取缓存）
+    """
+    if not user or not user.is_authenticated:
+        return EMPTY_PERMISSIONS
+
+    if version is None:
+        version = await aget_user_permission_version(user.pk)
+    key = USER_PERMS_KEY.format(version=version, user_id=user.pk)
+    permissions = _get_local_permissions(key)
+    if permissions is not None:
+        return permissions
+    cached = await cache.aget(key)
+    if cached is None:
+        cached = await aload_user_permissions(user.pk)
+        await cache.aset(key, cached, PERMS_CACHE_TIMEOUT)
+    return _remember_permissions(key, cached)
+
+
+async def aget_request_user(request):
+    """
+    异步获取当前请求用户：Django 5.0+ 使用request.auser()；
+    更早版本的request.user为惰性对象（需同步查询会话与用户表），在线程中求值一次后缓存在request上
+    """
+    user = request.user
+    if not isinstance(user, LazyObject) or user._wrapped is not empty:
+        # 已求值（或由认证/测试代码直接赋值）的用户无需再切换线程
+        return user
+    auser = getattr(request, 'auser', None)
+    if auser is not None:
+        return await auser()
+
+    def resolve_user():
+        user.is_authenticated  # 触发惰性对象求值
+        return user
+
+    return await sync_to_async(resolve_user)()
+
+
+async def aget_request_permissions(request, version=None):
+    """
+    get_request_permissions的异步版本（与同步版本共用request上的缓存结果）
+    :param version: 已读取的用户权限版本号（可选）
+    """
+    user = await aget_request_user(request)
+    user_id = user.pk if user.is_authenticated else None
+    memo = getattr(request, '_rbac_permissions', None)
+    if memo is not None and memo[0] == user_id:
+        return memo[1]
+
+    if user_id is None:
+        permissions = EMPTY_PERMISSIONS
+    elif user.is_superuser:
+        permissions = SUPERUSER_PERMISSIONS
+    else:
+        permissions = await aget_effective_permissions(user, version)
+    request._rbac_permissions = (user_id, permissions)
+    return permissions
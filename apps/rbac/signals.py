@@ -0,0 +1,180 @@
+# apps/rbac/signals.py
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .materialize import (
+    rebuild_role_closure, refresh_role_users, refresh_user_permissions, users_for_roles, would_create_cycle,
+)
+from .models import Permission, Role, RoleClosure, RowRule, UserEffectivePermission
+from .services import bump_permission_version, bump_rbac_version, bump_report_version, invalidate_user_permissions
+
+User = get_user_model()
+
+# 注：版本号均在事务提交后递增（transaction.on_commit，未开启事务时立即执行）：
+# 若在事务内递增，并发请求可能在提交前读取旧数据并以新版本号写入缓存，旧权限会一直保留到缓存过期
+
+
+@receiver(m2m_changed, sender=User.roles.through)
+def user_roles_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """用户-角色关系变更：增量刷新受影响用户的物化权限，并仅失效这些用户的权限缓存"""
+    if action == 'pre_clear' and reverse:
+        # role.user_roles.clear()：post_clear时pk_set为空，需提前记录受影响的用户
+        instance._rbac_cleared_ids = list(instance.user_roles.values_list('id', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        # user.roles.add/remove/clear：instance为用户
+        user_ids = [instance.pk]
+    elif pk_set:
+        # role.user_roles.add/remove：pk_set为受影响的用户ID
+        user_ids = pk_set
+    else:
+        user_ids = getattr(instance, '_rbac_cleared_ids', [])
+    refresh_user_permissions(user_ids)
+    user_ids = list(user_ids)
+    transaction.on_commit(lambda: invalidate_user_permissions(user_ids))
+
+
+@receiver(m2m_changed, sender=Role.permissions.through)
+def role_permissions_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """角色-权限关系变更：刷新拥有该角色（及其子角色）的用户的物化权限，并递增全局版本号"""
+    if action == 'pre_clear' and reverse:
+        # permission.role_permissions.clear()：提前记录受影响的角色
+        instance._rbac_cleared_ids = list(instance.role_permissions.values_list('id', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        role_ids = [instance.pk]
+    elif pk_set:
+        role_ids = pk_set
+    else:
+        role_ids = getattr(instance, '_rbac_cleared_ids', [])
+    refresh_role_users(role_ids)
+    transaction.on_commit(bump_rbac_version)
+
+
+@receiver(m2m_changed, sender=Role.parents.through)
+def role_parents_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """角色继承关系变更：校验不形成环，重建闭包表并刷新受影响用户的物化权限"""
+    if action == 'pre_add':
+        # 正向：instance为子角色，pk_set为父角色；反向：instance为父角色，pk_set为子角色
+        child_ids, parent_ids = ([instance.pk], pk_set) if not reverse else (pk_set, [instance.pk])
+        if would_create_cycle(child_ids, parent_ids):
+            raise ValueError('角色继承关系不能形成环，请检查父角色设置')
+        return
+    if action == 'pre_clear' and reverse:
+        instance._rbac_cleared_ids = list(instance.children.values_list('id', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        role_ids = [instance.pk]
+    elif pk_set:
+        role_ids = pk_set
+    else:
+        role_ids = getattr(instance, '_rbac_cleared_ids', [])
+    rebuild_role_closure()
+    refresh_role_users(role_ids)
+    transaction.on_commit(bump_rbac_version)
+
+
+@receiver(post_save, sender=Role)
+def role_saved(sender, instance, created, raw=False, **kwargs):
+    """
+    角色新增：写入闭包自身记录
+    角色名称、描述等字段不参与权限判断，修改时不递增版本号（不清空所有用户的权限缓存）；
+    角色的权限、继承关系与用户分配均为多对多关系，其变更由m2m_changed信号处理
+    """
+    if created and not raw:
+        RoleClosure.objects.get_or_create(ancestor=instance, descendant=instance, defaults={'depth': 0})
+
+
+@receiver(pre_delete, sender=Role)
+def role_deleting(sender, instance, **kwargs):
+    """角色删除前：记录受影响的用户（关联记录随后会被级联删除）"""
+    instance._rbac_affected_user_ids = users_for_roles([instance.pk])
+
+
+@receiver(post_delete, sender=Role)
+def role_deleted(sender, instance, **kwargs):
+    """角色删除后：重建闭包表，刷新受影响用户的物化权限，递增全局版本号"""
+    rebuild_role_closure()
+    refresh_user_permissions(getattr(instance, '_rbac_affected_user_ids', []))
+    transaction.on_commit(bump_rbac_version)
+
+
+@receiver(post_save, sender=Permission)
+def permission_saved(sender, instance, raw=False, **kwargs):
+    """权限新增、修改：同步物化表中冗余的权限标识，递增全局版本号和权限目录版本号"""
+    if not raw:
+        (UserEffectivePermission.objects
+         .filter(permission=instance)
+         .exclude(permission_code=instance.permission_code)
+         .update(permission_code=instance.permission_code))
+    transaction.on_commit(bump_permission_version)
+    transaction.on_commit(bump_rbac_version)
+
+
+@receiver(post_delete, sender=Permission)
+def permission_deleted(sender, **kwargs):
+    """权限删除（物化记录随外键级联删除）：递增全局版本号和权限目录版本号（触发权限索引重建）"""
+    transaction.on_commit(bump_permission_version)
+    transaction.on_commit(bump_rbac_version)
+
+
+@receiver(post_save, sender=RowRule)
+@receiver(post_delete, sender=RowRule)
+@receiver(m2m_changed, sender=RowRule.target_roles.through)
+def row_rule_changed(sender, **kwargs):
+    """行级规则新增、修改、删除或目标角色变更：递增全局版本号，使用户行级规则缓存失效"""
+    action = kwargs.get('action')
+    if action is not None and action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    transaction.on_commit(bump_rbac_version)
+
+
+# 影响用户权限判断（及令牌有效性）的用户状态字段
+USER_STATUS_FIELDS = ('is_active', 'is_superuser', 'is_staff')
+# 变更后须作废已签发令牌的字段：状态字段与密码（修改/重置密码后，旧令牌既不能继续使用也不能再刷新）
+USER_VERSION_FIELDS = USER_STATUS_FIELDS + ('password',)
+
+
+@receiver(pre_save, sender=User)
+def user_saving(sender, instance, raw=False, update_fields=None, **kwargs):
+    """用户保存前：记录状态字段、密码是否变更（登录时仅更新last_login，不查询）"""
+    instance._rbac_status_changed = instance._rbac_password_changed = False
+    # 新建用户没有旧值可比较（包括显式指定主键的情况）
+    if raw or instance._state.adding:
+        return
+    if update_fields is not None and not set(USER_VERSION_FIELDS) & set(update_fields):
+        return
+    old = User.objects.filter(pk=instance.pk).values_list(*USER_VERSION_FIELDS).first()
+    if old is None:
+        return
+    instance._rbac_status_changed = old[:-1] != tuple(getattr(instance, field) for field in USER_STATUS_FIELDS)
+    instance._rbac_password_changed = old[-1] != instance.password
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, update_fields=None, **kwargs):
+    """
+    用户新增或状态（是否启用、是否超级管理员/职员）变更：递增报表版本号（登录时仅更新last_login，不触发）；
+    状态或密码实际变更时递增该用户的权限版本号，其权限缓存与已签发的访问令牌随之作废
+    （包括aset_password的save(update_fields=['password'])；登录时的密码哈希升级同样会作废旧令牌）
+    """
+    if getattr(instance, '_rbac_status_changed', False) or getattr(instance, '_rbac_password_changed', False):
+        user_ids = [instance.pk]
+        # invalidate_user_permissions同时递增报表版本号
+        transaction.on_commit(lambda: invalidate_user_permissions(user_ids))
+    elif created or update_fields is None or {'is_active', 'is_superuser'} & set(update_fields):
+        transaction.on_commit(bump_report_version)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, **kwargs):
+    """用户删除（物化记录随外键级联删除）：递增报表版本号"""
+    transaction.on_commit(bump_report_version)
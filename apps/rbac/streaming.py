@@ -0,0 +1,141 @@
+# apps/rbac/streaming.py
+import csv
+import json
+import zlib
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+
+from .matrix import _Echo
+
+# 导出格式
+FORMAT_CSV = 'csv'
+FORMAT_NDJSON = 'ndjson'
+EXPORT_FORMATS = (FORMAT_CSV, FORMAT_NDJSON)
+CONTENT_TYPES = {
+    FORMAT_CSV: 'text/csv; charset=utf-8',
+    FORMAT_NDJSON: 'application/x-ndjson; charset=utf-8',
+}
+# 每批读取的行数
+EXPORT_CHUNK_SIZE = 2000
+# 输出缓冲：攒满该字节数再交给WSGI服务器（逐行产出会产生大量极小的写操作）
+EXPORT_BUFFER_SIZE = 64 * 1024
+
+
+def iter_rows_by_pk(queryset, fields, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    按主键分批（WHERE pk > 上一批最大pk ORDER BY pk LIMIT n）流式读取values_list行：
+    MySQL驱动不支持服务端游标，queryset.iterator() 仍会把整个结果集读入内存，
+    按主键分批则在任何数据库上内存占用都只与批大小有关，且每批都是主键索引上的范围扫描
+    :param fields: values_list字段，第一个字段必须是主键
+    """
+    queryset = queryset.order_by('pk')
+    last_pk = None
+    while True:
+        batch = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        rows = list(batch.values_list(*fields)[:chunk_size])
+        yield from rows
+        if len(rows) < chunk_size:
+            return
+        last_pk = rows[-1][0]
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f'无法序列化的类型：{type(value).__name__}')
+
+
+def iter_csv(headers, rows):
+    """CSV：表头 + 逐行（None输出为空字符串）"""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(headers)
+    for row in rows:
+        yield writer.writerow(['' if value is None else value for value in row])
+
+
+def iter_ndjson(fields, rows):
+    """NDJSON：每行一个JSON对象"""
+    for row in rows:
+        yield json.dumps(dict(zip(fields, row)), ensure_ascii=False, default=_json_default) + '\n'
+
+
+def iter_buffered(chunks, size=EXPORT_BUFFER_SIZE):
+    """将逐行产出的字符串合并为约size字节的块，编码为UTF-8字节"""
+    buffer, length = [], 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        length += len(chunk)
+        if length >= size:
+            yield ''.join(buffer).encode('utf-8')
+            buffer, length = [], 0
+    if buffer:
+        yield ''.join(buffer).encode('utf-8')
+
+
+def iter_gzip(blocks, level=6):
+    """流式gzip压缩（wbits=31输出标准gzip格式），压缩器只保留滑动窗口，内存占用固定"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for block in blocks:
+        data = compressor.compress(block)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def streaming_export_response(rows, fields, headers=None, fmt=FORMAT_CSV, filename='export', compress=False):
+    """
+    构造流式导出响应（CSV/NDJSON，可选gzip压缩）
+    :param rows: values_list行的可迭代对象（应为生成器，如iter_rows_by_pk()）
+    :param fields: 字段名（NDJSON的键）
+    :param headers: CSV表头（默认同fields）
+    :param filename: 下载文件名（不含扩展名）
+    :param compress: 是否gzip压缩（文件名追加.gz）
+    """
+    if fmt == FORMAT_NDJSON:
+        chunks = iter_ndjson(fields, rows)
+    else:
+        fmt = FORMAT_CSV
+        chunks = iter_csv(headers or fields, rows)
+    content = iter_buffered(chunks)
+    filename = f'{filename}.{fmt}'
+    if compress:
+        content = iter_gzip(content)
+        filename += '.gz'
+    response = StreamingHttpResponse(content, content_type='application/gzip' if compress else CONTENT_TYPES[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def get_export_params(params):
+    """导出请求参数：format=csv|ndjson（默认csv），gzip=1 时压缩"""
+    fmt = params.get('format')
+    return (fmt if fmt in EXPORT_FORMATS else FORMAT_CSV), params.get('gzip') in ('1', 'true', 'True')
+
+
+class _PassthroughRenderer(BaseRenderer):
+    """
+    DRF占位渲染器：使 ?format=csv / ?format=ndjson 通过内容协商（否则DRF对未知格式直接返回404），
+    视图自行返回StreamingHttpResponse，不经过渲染器
+    """
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # 仅用于错误响应（如403/400的detail），输出为JSON文本
+        if data is None:
+            return b''
+        return json.dumps(data, ensure_ascii=False, default=_json_default).encode(self.charset)
+
+
+class CSVStreamRenderer(_PassthroughRenderer):
+    media_type = 'text/csv'
+    format = FORMAT_CSV
+
+
+class NDJSONStreamRenderer(_PassthroughRenderer):
+    media_type = 'application/x-ndjson'
+    format = FORMAT_NDJSON
@@ -1,42 +1,67 @@
 # apps/rbac/templatetags/rbac_tags.py
 from django import template
-from apps.rbac.models import Permission
+from django.utils.safestring import mark_safe
+from apps.rbac.navigation import render_nav
+from apps.rbac.registry import permission_registry
+from apps.rbac.services import EMPTY_PERMISSIONS, get_request_permissions
 
 # 注册模板标签库
 register = template.Library()
 
 @register.simple_tag(takes_context=True)
-def has_permission(context, permission_code):
+def load_permissions(context):
+    """
+    自定义简单标签：一次性加载当前用户的有效权限集（同一请求内只加载一次）
+    用法：{% load_permissions as perms %} {% if 'user_view' in perms %}...{% endif %}
+    :param context: 模板上下文（包含request对象）
+    :return: EffectivePermissions
+    """
+    request = context.get('request')
+    if not request:
+        return EMPTY_PERMISSIONS
+    return get_request_permissions(request)
+
+@register.simple_tag(takes_context=True)
+def has_permission(context, *permission_codes, mode='all'):
     """
     自定义简单标签：判断当前用户是否拥有指定权限标识的权限
+    用法：{% has_permission 'user_view' as can_view %}
+          {% has_permission 'user_view' 'user_status_change' mode='any' as can_manage %}
     :param context: 模板上下文（包含request对象）
-    :param permission_code: 权限标识（如：user_status_change）
+    :param permission_codes: 一个或多个权限标识（如：user_status_change）
+    :param mode: 多个权限标识时的判断方式，all=全部拥有，any=拥有任一
     :return: True（有权限）/ False（无权限）
     """
     # 1. 获取request对象和当前用户
     request = context.get('request')
-    if not request or not request.user.is_authenticated:
+    if not request or not request.user.is_authenticated or not permission_codes:
         return False
 
     # 2. 超级管理员直接返回有权限
     if request.user.is_superuser:
         return True
 
-    # 3. 非超级管理员：通过「用户→角色→权限」校验权限标识
+    # 3. 非超级管理员：在请求级缓存的有效权限集中做集合成员判断（同一请求内不重复查询）
+    #    权限标识不存在（进程内权限注册表中查不到）时不必加载权限集：all模式直接拒绝，any模式忽略该标识
     try:
-        # 3.1 获取用户所有角色
-        user_roles = request.user.roles.all()
-        if not user_roles:
+        index = permission_registry.get_index()
+        known_codes = [code for code in permission_codes if code in index.entries]
+        if len(known_codes) < len(permission_codes) and (mode != 'any' or not known_codes):
             return False
-
-        # 3.2 校验是否存在指定权限标识的权限
-        permission = Permission.objects.get(permission_code=permission_code)
-        for role in user_roles:
-            if permission in role.permissions.all():
-                return True
-        return False
-    except Permission.DoesNotExist:
-        # 权限不存在，返回无权限
-        return False
+        permissions = get_request_permissions(request)
+        if mode == 'any':
+            return permissions.has_any(known_codes)
+        return permissions.has_all(known_codes)
     except Exception as e:
-        return False
\ No newline at end of file
+        return False
+
+@register.simple_tag(takes_context=True)
+def rbac_nav(context):
+    """
+    自定义简单标签：渲染按权限筛选的导航菜单（片段按「角色组合+RBAC版本号」缓存，见apps.rbac.navigation）
+    用法：{% rbac_nav %}
+    """
+    request = context.get('request')
+    if not request:
+        return ''
+    return mark_safe(render_nav(request))
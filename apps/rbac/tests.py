@@ -1,3 +1,1082 @@
-from django.test import TestCase
+# apps/rbac/tests.py
+import time
+from datetime import timedelta
+from io import StringIO
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core import signing
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import transaction
+from django.http import Http404, HttpResponse
+from django.template import Context, Template
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import include, path, reverse
+from django.utils import timezone
+from rest_framework import exceptions
+from rest_framework.authentication import SessionAuthentication
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from . import audit, services
+from .assign import ACTION_ADD, ACTION_REMOVE, ACTION_SET, assign_user_roles
+from .authentication import TOKEN_REFRESH_MAX_AGE, TOKEN_SALT, RbacTokenAuthentication, issue_token, refresh_token
+from .discovery import apply_discovery_plan, build_discovery_plan, discover_routes
+from .filters import row_predicate_allows
+from .materialize import rebuild_all, verify_all
+from .matcher import PrefixTrie, build_permission_index
+from .matrix import (
+    FORMAT_CSV, FORMAT_JSON, MatrixError, apply_matrix, diff_matrix, export_matrix, has_changes, load_matrix_arrays,
+    parse_matrix,
+)
+from .middleware import RbacPagePermissionMiddleware
+from .models import (
+    AccessDecisionLog, Permission, RbacVersionStamp, Role, RoleClosure, RowRule, UserEffectivePermission,
+)
+from .navigation import nav_cache_stats, render_nav
+from .pagination import KeysetPaginator
+from .permissions import RbacApiPermission
+from .registry import PermissionRegistry, get_permission_index, permission_registry
+from .reports import resolve_codes, who_can_queryset, who_can_summary
+from .services import bump_permission_version, get_effective_permissions, get_rbac_version, get_user_permission_version
+from .views import RbacTokenObtainView, RoleListView
+from .writers import BufferedBulkWriter
+
+User = get_user_model()
+
+
+class RbacTestCase(TestCase):
+    """RBAC测试基类：每个用例开始前清空版本号缓存与进程内权限注册表，审计日志改为测试内写入"""
+
+    def setUp(self):
+        cache.clear()
+        permission_registry.reset()
+        # 不启动审计后台线程（其独立数据库连接看不到测试事务内的数据）：由flush()在当前线程写入
+        self.audit_writer = BufferedBulkWriter(AccessDecisionLog, max_queue_size=2, name='test-audit-writer')
+        self.audit_writer._ensure_started = lambda: None
+        patcher = mock.patch.object(audit, '_writer', self.audit_writer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def create_user(self, username='alice', phone='13800000000', **extra):
+        return User.objects.create_user(username=username, phone=phone, password='secret123', **extra)
+
+    def create_permission(self, code, url_path=None, route_name=None):
+        return Permission.objects.create(
+            permission_name=code, permission_code=code, url_path=url_path, route_name=route_name,
+        )
+
+    def grant(self, role, *permissions):
+        """为角色授予权限（执行事务提交后的版本号递增）"""
+        with self.captureOnCommitCallbacks(execute=True):
+            role.permissions.add(*permissions)
+
+    def assign(self, user, *roles):
+        """为用户分配角色（执行事务提交后的版本号递增）"""
+        with self.captureOnCommitCallbacks(execute=True):
+            user.roles.add(*roles)
+
+
+# 1. 角色/权限变更后的缓存失效
+class PermissionInvalidationTests(RbacTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user()
+        self.role = Role.objects.create(role_name='editor')
+        self.view = self.create_permission('article_view')
+        self.grant(self.role, self.view)
+        self.assign(self.user, self.role)
+
+    def test_role_permission_change_invalidates_cache(self):
+        self.assertEqual(get_effective_permissions(self.user).codes, {'article_view'})
+        self.grant(self.role, self.create_permission('article_edit'))
+        self.assertEqual(get_effective_permissions(self.user).codes, {'article_view', 'article_edit'})
+        with self.captureOnCommitCallbacks(execute=True):
+            self.role.permissions.remove(self.view)
+        self.assertEqual(get_effective_permissions(self.user).codes, {'article_edit'})
+
+    def test_user_role_change_invalidates_cache(self):
+        self.assertTrue(get_effective_permissions(self.user).has_code('article_view'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.roles.remove(self.role)
+        self.assertEqual(get_effective_permissions(self.user).codes, frozenset())
+
+    def test_version_bumped_only_after_commit(self):
+        version = get_user_permission_version(self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.role.permissions.add(self.create_permission('article_edit'))
+            # 事务提交前不递增版本号：其他请求不会把提交前的旧权限写入新版本号的缓存
+            self.assertEqual(get_user_permission_version(self.user.pk), version)
+        self.assertTrue(callbacks)
+        self.assertNotEqual(get_user_permission_version(self.user.pk), version)
+
+    def test_role_rename_keeps_cache(self):
+        version = get_rbac_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.role.role_name = 'writer'
+            self.role.description = '撰稿'
+            self.role.save()
+        self.assertEqual(get_rbac_version(), version)
+
+    def test_deactivating_user_bumps_version(self):
+        version = get_user_permission_version(self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        self.assertNotEqual(get_user_permission_version(self.user.pk), version)
+
+    def test_last_login_update_skips_status_check(self):
+        version = get_user_permission_version(self.user.pk)
+        self.user.last_login = timezone.now()
+        # 仅一条UPDATE，不查询旧的状态字段
+        with self.assertNumQueries(1), self.captureOnCommitCallbacks(execute=True):
+            self.user.save(update_fields=['last_login'])
+        self.assertEqual(get_user_permission_version(self.user.pk), version)
+
+
+# 2. URL前缀树与路由名称索引
+class PrefixMatchingTests(RbacTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user()
+        self.role = Role.objects.create(role_name='editor')
+        self.grant(
+            self.role,
+            self.create_permission('role_view', url_path='/rbac/role/'),
+            self.create_permission('status_update', route_name='users:user_status_update'),
+        )
+        self.create_permission('permission_view', url_path='/rbac/permission/')
+        self.assign(self.user, self.role)
+        self.middleware = RbacPagePermissionMiddleware(lambda request: HttpResponse('ok'))
+
+    def request(self, path):
+        request = RequestFactory().get(path)
+        request.user = self.user
+        return request
+
+    def test_prefix_trie(self):
+        trie = PrefixTrie([('/rbac/', 'a'), ('/rbac/role/', 'b'), ('/users/', 'c')])
+        self.assertEqual(trie.match('/rbac/role/list/'), {'a', 'b'})
+        self.assertEqual(trie.match('/rbac/permission/'), {'a'})
+        self.assertEqual(trie.match('/rbac'), set())
+        self.assertTrue(trie.has_match('/users/profile/'))
+        self.assertFalse(trie.has_match('/user/'))
+
+    def test_permission_index_matching(self):
+        index = build_permission_index()
+        self.assertTrue(index.match_path('/rbac/role/list/', {'role_view'}))
+        self.assertFalse(index.match_path('/rbac/role/list/', {'permission_view'}))
+        self.assertFalse(index.match_path('/unknown/', {'role_view'}))
+        self.assertTrue(index.match_route('users:user_status_update', {'status_update'}))
+        self.assertFalse(index.match_route('users:user_status_update', {'role_view'}))
+
+    def test_white_list_bypasses_check(self):
+        request = self.request(reverse('users:login'))
+        request.user = AnonymousUser()
+        self.assertEqual(self.middleware(request).status_code, 200)
+
+    def test_prefix_match_allows(self):
+        self.assertEqual(self.middleware(self.request('/rbac/role/list/')).status_code, 200)
+
+    def test_route_name_checked_in_process_view(self):
+        # 前缀未命中但存在按路由名称配置的权限：先放行，由process_view按view_name再校验
+        request = self.request('/users/status/update/1/')
+        self.assertEqual(self.middleware(request).status_code, 200)
+        request.resolver_match = SimpleNamespace(view_name='users:user_status_update')
+        self.assertIsNone(self.middleware.process_view(request, None, (), {}))
+
+        request = self.request('/rbac/permission/list/')
+        self.assertEqual(self.middleware(request).status_code, 200)
+        request.resolver_match = SimpleNamespace(view_name='rbac:permission_list')
+        self.assertEqual(self.middleware.process_view(request, None, (), {}).status_code, 403)
+
+    def test_anonymous_redirected(self):
+        request = self.request('/rbac/role/list/')
+        request.user = AnonymousUser()
+        self.assertEqual(self.middleware(request).status_code, 302)
+
+
+# 3. 模板标签：同一请求内只加载一次权限集
+class PermissionTagTests(RbacTestCase):
+    TEMPLATE = (
+        '{% load rbac_tags %}'
+        '{% has_permission "user_view" as a %}{% has_permission "user_edit" as b %}'
+        '{% has_permission "user_view" "user_edit" mode="any" as c %}'
+        '{% has_permission "user_view" "unknown_code" as d %}'
+        '{% has_permission "user_view" "unknown_code" mode="any" as e %}'
+        '{% load_permissions as perms %}{% if "user_view" in perms %}f{% endif %}'
+        '{{ a }}{{ b }}{{ c }}{{ d }}{{ e }}'
+    )
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user()
+        role = Role.objects.create(role_name='viewer')
+        self.grant(role, self.create_permission('user_view'))
+        self.create_permission('user_edit')
+        self.assign(self.user, role)
+
+    def render(self, user):
+        request = RequestFactory().get('/')
+        request.user = user
+        return Template(self.TEMPLATE).render(Context({'request': request}))
+
+    def test_single_permission_load_per_request(self):
+        permission_registry.get_index()
+        with self.assertNumQueries(1):
+            self.assertEqual(self.render(self.user), 'fTrueFalseTrueFalseTrue')
+
+    def test_anonymous_and_superuser(self):
+        self.assertEqual(self.render(AnonymousUser()), 'FalseFalseFalseFalseFalse')
+        superuser = self.create_user('root', '13800000001', is_superuser=True)
+        self.assertEqual(self.render(superuser), 'fTrueTrueTrueTrueTrue')
+
+
+# 4. 无状态令牌：签发、刷新、版本过期
+class TokenTests(RbacTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user()
+        self.role = Role.objects.create(role_name='editor')
+        self.permissions = [self.create_permission(f'code_{i}') for i in range(3)]
+        self.grant(self.role, self.permissions[2])
+        self.assign(self.user, self.role)
+        self.factory = APIRequestFactory()
+
+    def authenticate(self, token):
+        request = self.factory.get('/', HTTP_AUTHORIZATION=f'Rbac {token}')
+        return RbacTokenAuthentication().authenticate(request)
+
+    def assertAuthFails(self, code, func, *args):
+        with self.assertRaises(exceptions.AuthenticationFailed) as cm:
+            func(*args)
+        self.assertEqual(cm.exception.get_codes(), code)
+
+    def test_issue_and_authenticate(self):
+        token_user, payload = self.authenticate(issue_token(self.user))
+        self.assertEqual(token_user.pk, self.user.pk)
+        self.assertTrue(token_user.has_permission_code('code_2'))
+        self.assertFalse(token_user.has_permission_code('code_0'))
+        self.assertFalse(token_user.has_permission_code('unknown'))
+        self.assertEqual(payload['pv'], get_permission_index().version)
+
+    def test_permission_bits_are_dense(self):
+        # 位序号按权限在目录中的排名分配，与主键大小无关
+        positions = sorted(get_permission_index().code_bits.values())
+        self.assertEqual(positions, list(range(Permission.objects.count())))
+
+    def test_invalid_token_rejected(self):
+        self.assertAuthFails('token_invalid', self.authenticate, 'x' + issue_token(self.user))
+
+    def test_role_change_makes_token_stale(self):
+        token = issue_token(self.user)
+        self.grant(self.role, self.permissions[0])
+        self.assertAuthFails('token_stale', self.authenticate, token)
+        token_user, _ = self.authenticate(refresh_token(token))
+        self.assertTrue(token_user.has_permission_code('code_0'))
+
+    def test_permission_catalog_change_makes_token_stale(self):
+        token = issue_token(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.permissions[0].delete()
+        self.assertAuthFails('token_stale', self.authenticate, token)
+        token_user, _ = self.authenticate(refresh_token(token))
+        self.assertTrue(token_user.has_permission_code('code_2'))
+
+    def test_inactive_user_cannot_refresh(self):
+        token = issue_token(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        self.assertAuthFails('token_stale', self.authenticate, token)
+        self.assertAuthFails('user_inactive', refresh_token, token)
+
+    def test_password_change_makes_token_stale(self):
+        token = issue_token(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.set_password('another-secret')
+            self.user.save(update_fields=['password'])
+        self.assertAuthFails('token_stale', self.authenticate, token)
+
+    def test_refresh_keeps_original_issue_time(self):
+        with mock.patch('time.time', return_value=time.time() - TOKEN_REFRESH_MAX_AGE + 60):
+            token = issue_token(self.user)
+        refreshed = refresh_token(token)
+        self.assertEqual(
+            signing.loads(refreshed, salt=TOKEN_SALT)['iat'], signing.loads(token, salt=TOKEN_SALT)['iat']
+        )
+        # 刷新链的总时长从首次签发算起：超过可刷新期限后，新签发的令牌也不能再刷新
+        with mock.patch('time.time', return_value=time.time() + 120):
+            self.assertAuthFails('token_expired', refresh_token, refreshed)
+
+    def test_obtain_with_token_keeps_issue_time(self):
+        token = issue_token(self.user, issued_at=int(time.time()) - 100)
+        response = RbacTokenObtainView.as_view()(self.factory.post('/', HTTP_AUTHORIZATION=f'Rbac {token}'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            signing.loads(response.data['token'], salt=TOKEN_SALT)['iat'], signing.loads(token, salt=TOKEN_SALT)['iat']
+        )
+
+
+# 5. 角色继承闭包与物化权限的一致性
+class MaterializationTests(RbacTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user()
+        self.root, self.middle, self.leaf = [Role.objects.create(role_name=name) for name in ('root', 'middle', 'leaf')]
+        self.grant(self.root, self.create_permission('root_code'))
+        self.grant(self.leaf, self.create_permission('leaf_code'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.middle.parents.add(self.root)
+            self.leaf.parents.add(self.middle)
+        self.assign(self.user, self.leaf)
+
+    def test_closure_depths(self):
+        self.assertEqual(
+            dict(RoleClosure.objects.filter(descendant=self.leaf).values_list('ancestor_id', 'depth')),
+            {self.leaf.pk: 0, self.middle.pk: 1, self.root.pk: 2},
+        )
+
+    def test_verify_consistent(self):
+        self.assertEqual(verify_all(), {'closure_ok': True, 'mismatched_users': []})
+        self.assertEqual(get_effective_permissions(self.user).codes, {'root_code', 'leaf_code'})
+
+    def test_verify_detects_and_rebuild_repairs(self):
+        UserEffectivePermission.objects.filter(user=self.user, permission_code='root_code').delete()
+        self.assertEqual(verify_all(), {'closure_ok': True, 'mismatched_users': [self.user.pk]})
+        RoleClosure.objects.filter(ancestor=self.root, descendant=self.leaf).delete()
+        self.assertFalse(verify_all()['closure_ok'])
+        rebuild_all()
+        self.assertEqual(verify_all(), {'closure_ok': True, 'mismatched_users': []})
+
+    def test_removing_parent_updates_materialization(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.middle.parents.remove(self.root)
+        self.assertEqual(verify_all(), {'closure_ok': True, 'mismatched_users': []})
+        self.assertEqual(get_effective_permissions(self.user).codes, {'leaf_code'})
+
+    def test_deleting_role_updates_materialization(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.middle.delete()
+        self.assertEqual(verify_all(), {'closure_ok': True, 'mismatched_users': []})
+        self.assertEqual(get_effective_permissions(self.user).codes, {'leaf_code'})
+
+    def test_cycle_rejected(self):
+        with self.assertRaises(ValueError), transaction.atomic():
+            self.root.parents.add(self.leaf)
+        self.assertTrue(verify_all()['closure_ok'])
+
+
+# 6. ASGI：异步中间件预加载接口请求的权限集
+class AsyncPermissionTests(RbacTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user()
+        role = Role.objects.create(role_name='api')
+        self.grant(role, self.create_permission('api_view', url_path='/rbac/role/'))
+        self.create_permission('api_edit')
+        self.assign(self.user, role)
+
+    @staticmethod
+    async def get_response(request):
+        return HttpResponse('ok')
+
+    def check_api_permission(self, request, code):
+        drf_request = Request(request, authenticators=[SessionAuthentication()])
+        view = SimpleNamespace(required_permission_code=code)
+        with self.assertNumQueries(0):
+            return RbacApiPermission().has_permission(drf_request, view)
+
+    async def test_api_request_preloads_permissions(self):
+        middleware = RbacPagePermissionMiddleware(self.get_response)
+        request = RequestFactory().get('/rbac/api/check/')
+        request.user = self.user
+        response = await middleware(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(request._rbac_permissions[1].codes, {'api_view'})
+        # DRF的同步权限类命中请求级缓存，不查询数据库
+        self.assertTrue(await sync_to_async(self.check_api_permission)(request, 'api_view'))
+        self.assertFalse(await sync_to_async(self.check_api_permission)(request, 'api_edit'))
+
+    async def test_async_page_check(self):
+        middleware = RbacPagePermissionMiddleware(self.get_response)
+        request = RequestFactory().get('/rbac/role/list/')
+        request.user = self.user
+        self.assertEqual((await middleware(request)).status_code, 200)
+        request = RequestFactory().get('/rbac/role/list/')
+        request.user = AnonymousUser()
+        self.assertEqual((await middleware(request)).status_code, 302)
+
+
+# 7. 行级数据规则：列表过滤与对象级校验
+class RowRuleTests(RbacTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.staff, self.intern, self.manager = [
+            Role.objects.create(role_name=name) for name in ('staff', 'intern', 'manager')
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.intern.parents.add(self.staff)
+        self.grant(self.manager, self.create_permission('user_view'))
+        self.boss = self.create_user('boss', '13800000001')
+        self.bob = self.create_user('bob', '13800000002')
+        self.carol = self.create_user('carol', '13800000003')
+        self.dave = self.create_user('dave', '13800000004')
+        self.assign(self.boss, self.manager)
+        self.assign(self.bob, self.staff)
+        self.assign(self.carol, self.intern)
+        self.client = APIClient()
+        self.client.force_authenticate(self.boss)
+
+    def add_rule(self, scope, *target_roles, role=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            rule = RowRule.objects.create(role=role or self.manager, model_label='users.User', scope=scope)
+            rule.target_roles.add(*target_roles)
+        return rule
+
+    def list_usernames(self):
+        response = self.client.get(reverse('users:user-list'))
+        self.assertEqual(response.status_code, 200)
+        return sorted(row['username'] for row in response.data)
+
+    def test_without_rules_lists_all(self):
+        self.assertEqual(self.list_usernames(), ['bob', 'boss', 'carol', 'dave'])
+
+    def test_roles_scope_includes_child_roles(self):
+        self.add_rule(RowRule.SCOPE_ROLES, self.staff)
+        self.assertEqual(self.list_usernames(), ['bob', 'carol'])
+        self.assertEqual(self.client.get(reverse('users:user-detail', args=[self.carol.pk])).status_code, 200)
+        self.assertEqual(self.client.get(reverse('users:user-detail', args=[self.dave.pk])).status_code, 404)
+
+    def test_rules_are_unioned(self):
+        self.add_rule(RowRule.SCOPE_ROLES, self.intern)
+        self.add_rule(RowRule.SCOPE_SELF)
+        self.assertEqual(self.list_usernames(), ['boss', 'carol'])
+
+    def test_all_scope_is_unrestricted(self):
+        self.add_rule(RowRule.SCOPE_SELF)
+        self.assertEqual(self.list_usernames(), ['boss'])
+        self.add_rule(RowRule.SCOPE_ALL)
+        self.assertEqual(self.list_usernames(), ['bob', 'boss', 'carol', 'dave'])
+
+    def test_rule_on_unrelated_role_restricts_to_nothing(self):
+        self.add_rule(RowRule.SCOPE_ALL, role=self.staff)
+        self.assertEqual(self.list_usernames(), [])
+
+    def test_superuser_bypasses_rules(self):
+        self.add_rule(RowRule.SCOPE_SELF)
+        self.client.force_authenticate(self.create_user('root', '13800000005', is_superuser=True))
+        self.assertEqual(len(self.list_usernames()), 5)
+
+    def test_object_permission_without_filter_backend(self):
+        self.add_rule(RowRule.SCOPE_ROLES, self.staff)
+        request = Request(RequestFactory().get('/users/api/users/'))
+        request.user = self.boss
+        view = SimpleNamespace(required_permission_code='user_view', filter_backends=())
+        self.assertTrue(row_predicate_allows(request, self.bob))
+        self.assertTrue(RbacApiPermission().has_object_permission(request, view, self.carol))
+        self.assertFalse(RbacApiPermission().has_object_permission(request, view, self.dave))
+
+
+# 8. 批量用户-角色分配：差异计算与越权校验
+class BatchAssignTests(RbacTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.admin, self.staff, self.intern, self.secret = [
+            Role.objects.create(role_name=name) for name in ('admin', 'staff', 'intern', 'secret')
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.intern.parents.add(self.staff)
+        self.grant(self.admin, self.create_permission('user_role_batch_assign'))
+        self.grant(self.staff, self.create_permission('staff_code'))
+        self.grant(self.secret, self.create_permission('secret_code'))
+        self.operator = self.create_user('operator', '13800000001')
+        self.assign(self.operator, self.admin, self.intern)
+        self.bob = self.create_user('bob', '13800000002')
+        self.carol = self.create_user('carol', '13800000003')
+        self.client = APIClient()
+        self.client.force_authenticate(self.operator)
+
+    def role_ids(self, user):
+        return set(user.roles.values_list('id', flat=True))
+
+    def batch_assign(self, user_ids, role_ids, action):
+        with self.captureOnCommitCallbacks(execute=True):
+            return assign_user_roles(user_ids, role_ids, action)
+
+    def post(self, user_ids, role_ids, action):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(
+                reverse('rbac:user_role_batch_assign'),
+                {'user_ids': user_ids, 'role_ids': role_ids, 'action': action}, format='json',
+            )
+
+    def test_add_and_remove_only_touch_differences(self):
+        self.assign(self.bob, self.staff)
+        users = [self.bob.pk, self.carol.pk]
+        self.assertEqual(self.batch_assign(users, [self.staff.pk], ACTION_ADD), {'added': 1, 'removed': 0, 'users': 1})
+        self.assertEqual(self.batch_assign(users, [self.staff.pk], ACTION_ADD), {'added': 0, 'removed': 0, 'users': 0})
+        self.assertEqual(get_effective_permissions(self.carol).codes, {'staff_code'})
+        self.assertEqual(
+            self.batch_assign(users, [self.staff.pk], ACTION_REMOVE), {'added': 0, 'removed': 2, 'users': 2}
+        )
+        self.assertEqual(get_effective_permissions(self.carol).codes, set())
+
+    def test_set_replaces_roles(self):
+        self.assign(self.bob, self.staff, self.secret)
+        result = self.batch_assign([self.bob.pk, self.carol.pk], [self.staff.pk, self.intern.pk], ACTION_SET)
+        self.assertEqual(result, {'added': 3, 'removed': 1, 'users': 2})
+        self.assertEqual(self.role_ids(self.bob), {self.staff.pk, self.intern.pk})
+        self.assertEqual(self.role_ids(self.carol), {self.staff.pk, self.intern.pk})
+        self.assertEqual(get_effective_permissions(self.bob).codes, {'staff_code'})
+        self.assertEqual(verify_all(), {'closure_ok': True, 'mismatched_users': []})
+
+    def test_can_assign_held_and_inherited_roles(self):
+        response = self.post([self.bob.pk], [self.staff.pk, self.intern.pk], ACTION_ADD)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.role_ids(self.bob), {self.staff.pk, self.intern.pk})
+
+    def test_cannot_assign_unheld_role(self):
+        response = self.post([self.bob.pk], [self.staff.pk, self.secret.pk], ACTION_ADD)
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.data['role_ids'], [self.secret.pk])
+        self.assertEqual(self.role_ids(self.bob), set())
+
+    def test_set_cannot_remove_unheld_role(self):
+        self.assign(self.bob, self.secret)
+        response = self.post([self.bob.pk], [self.staff.pk], ACTION_SET)
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.data['role_ids'], [self.secret.pk])
+        self.assertEqual(self.role_ids(self.bob), {self.secret.pk})
+
+    def test_superuser_unrestricted(self):
+        self.client.force_authenticate(self.create_user('root', '13800000004', is_superuser=True))
+        response = self.post([self.bob.pk], [self.secret.pk], ACTION_ADD)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {'added': 1, 'removed': 0, 'users': 1})
+
+    def test_invalid_payload(self):
+        self.assertEqual(self.post([self.bob.pk], [self.staff.pk], 'replace').status_code, 400)
+        self.assertEqual(self.post([self.bob.pk], [999999], ACTION_ADD).status_code, 400)
+        self.assertEqual(self.post([], [self.staff.pk], ACTION_ADD).status_code, 400)
+
+
+# 9. 角色×权限矩阵的解析、差异与同步
+class MatrixTests(RbacTestCase):
+    CSV_HEADER = 'permission_code,permission_name,url_path,route_name,description,editor\n'
+
+    def test_parse_csv(self):
+        matrix = parse_matrix(self.CSV_HEADER + 'article_view,查看文章,/article/,,,1\narticle_edit,,,,,\n')
+        self.assertEqual(matrix['roles']['editor']['permissions'], {'article_view'})
+        self.assertEqual(matrix['permissions']['article_edit']['permission_name'], 'article_edit')
+
+    def test_parse_csv_errors(self):
+        cases = {
+            'bad header': 'code,name\nx,y\n',
+            'duplicate role': self.CSV_HEADER.rstrip('\n') + ',editor\n',
+            'duplicate code': self.CSV_HEADER + 'a,,,,,1\na,,,,,\n',
+            'duplicate name': self.CSV_HEADER + 'a,同名,,,,1\nb,同名,,,,\n',
+        }
+        for label, text in cases.items():
+            with self.subTest(label), self.assertRaises(MatrixError):
+                parse_matrix(text, FORMAT_CSV)
+
+    def test_parse_json_errors(self):
+        cases = {
+            'invalid json': '{',
+            'not object': '[]',
+            'permissions not list': '{"permissions": {"a": 1}}',
+            'non-string field': '{"permissions": [{"permission_code": 1}]}',
+            'non-string grant': '{"permissions": [{"permission_code": "a"}], "roles": [{"role_name": "r", "permissions": [1]}]}',
+            'undefined permission': '{"permissions": [], "roles": [{"role_name": "r", "permissions": ["a"]}]}',
+            'empty role name': '{"roles": [{"role_name": " "}]}',
+        }
+        for label, text in cases.items():
+            with self.subTest(label), self.assertRaises(MatrixError):
+                parse_matrix(text, FORMAT_JSON)
+
+    def test_diff(self):
+        self.grant(Role.objects.create(role_name='editor'), self.create_permission('article_view'))
+        diff = diff_matrix(parse_matrix(self.CSV_HEADER + 'article_view,,,,,\narticle_edit,,,,,1\n'))
+        self.assertEqual(diff['permission_create'], ['article_edit'])
+        self.assertEqual(diff['grant_add'], [('editor', 'article_edit')])
+        self.assertEqual(diff['grant_remove'], [('editor', 'article_view')])
+        self.assertEqual(diff['role_create'], [])
+
+    def test_diff_rejects_name_owned_by_other_permission(self):
+        Permission.objects.create(permission_name='查看文章', permission_code='article_view')
+        with self.assertRaises(MatrixError):
+            diff_matrix(parse_matrix(self.CSV_HEADER + 'article_read,查看文章,,,,1\n'))
+
+    def test_apply_and_export_round_trip(self):
+        user = self.create_user()
+        editor = Role.objects.create(role_name='editor')
+        self.grant(editor, self.create_permission('article_view'))
+        self.assign(user, editor)
+        matrix = parse_matrix(self.CSV_HEADER.rstrip('\n') + ',viewer\narticle_view,,,,,,1\narticle_edit,,,,,1,\n')
+        with self.captureOnCommitCallbacks(execute=True):
+            apply_matrix(matrix)
+        self.assertEqual(get_effective_permissions(user).codes, {'article_edit'})
+        viewer = Role.objects.get(role_name='viewer')
+        self.assertEqual(set(viewer.permissions.values_list('permission_code', flat=True)), {'article_view'})
+        self.assertEqual(verify_all(), {'closure_ok': True, 'mismatched_users': []})
+        for fmt in (FORMAT_CSV, FORMAT_JSON):
+            with self.subTest(fmt):
+                self.assertFalse(has_changes(diff_matrix(parse_matrix(''.join(export_matrix(fmt)), fmt))))
+
+
+# 10. 访问决策审计：拒绝必记、放行抽样、队列满时丢弃
+class AuditTests(RbacTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user()
+        role = Role.objects.create(role_name='editor')
+        self.grant(role, self.create_permission('role_view', url_path='/rbac/role/'))
+        self.create_permission('permission_view', url_path='/rbac/permission/')
+        self.assign(self.user, role)
+
+    def check_api(self, code):
+        request = Request(RequestFactory().get('/rbac/api/check/'))
+        request.user = self.user
+        return RbacApiPermission().has_permission(request, SimpleNamespace(required_permission_code=code))
+
+    def check_page(self, path):
+        request = RequestFactory().get(path)
+        request.user = self.user
+        return RbacPagePermissionMiddleware(lambda request: HttpResponse('ok'))(request).status_code
+
+    def logged(self):
+        self.audit_writer.flush()
+        return list(AccessDecisionLog.objects.order_by('id').values_list('source', 'path', 'permission_code', 'allowed'))
+
+    def test_denials_recorded_allows_skipped(self):
+        self.assertTrue(self.check_api('role_view'))
+        self.assertFalse(self.check_api('permission_view'))
+        self.assertEqual(self.check_page('/rbac/role/list/'), 200)
+        self.assertEqual(self.check_page('/rbac/permission/list/'), 403)
+        self.assertEqual(self.logged(), [
+            (AccessDecisionLog.SOURCE_API, '/rbac/api/check/', 'permission_view', False),
+            (AccessDecisionLog.SOURCE_PAGE, '/rbac/permission/list/', '', False),
+        ])
+        self.assertEqual(AccessDecisionLog.objects.get(allowed=False, source='api').user_id, self.user.pk)
+
+    def test_allow_sampling(self):
+        with mock.patch.object(audit, 'AUDIT_ALLOW_SAMPLE_RATE', 1.0):
+            self.assertTrue(self.check_api('role_view'))
+        self.assertEqual(self.logged(), [(AccessDecisionLog.SOURCE_API, '/rbac/api/check/', 'role_view', True)])
+
+    def test_disabled(self):
+        with mock.patch.object(audit, 'AUDIT_ENABLED', False):
+            self.assertFalse(self.check_api('permission_view'))
+        self.assertEqual(self.logged(), [])
+
+    def test_full_queue_drops_without_blocking(self):
+        for _ in range(3):
+            self.assertFalse(self.check_api('permission_view'))
+        self.assertEqual(self.audit_writer.stats(), {'written': 0, 'inline_written': 0, 'dropped': 1, 'pending': 2})
+        self.assertEqual(len(self.logged()), 2)
+        self.assertEqual(self.audit_writer.stats()['written'], 2)
+
+
+# 11. 进程内权限注册表：检查间隔、版本戳与重建
+class PermissionRegistryTests(RbacTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.create_permission('article_view')
+        self.registry = PermissionRegistry(check_interval=60)
+        self.registry.get_index()
+
+    def create_in_other_worker(self, code):
+        """模拟其他worker新增权限：不经过本进程的信号，只递增共享的版本号"""
+        Permission.objects.bulk_create([Permission(permission_name=code, permission_code=code)])
+        version = services.get_permission_version()
+        with mock.patch.object(services, 'local_permission_bumps', services.local_permission_bumps):
+            bump_permission_version()
+        return version
+
+    def test_lookups_within_interval_skip_io(self):
+        with self.assertNumQueries(0):
+            self.assertTrue(self.registry.exists('article_view'))
+            self.assertFalse(self.registry.exists('unknown_code'))
+            self.assertIsNotNone(self.registry.lookup('article_view'))
+        self.assertEqual(self.registry.stats()['rebuilds'], 1)
+
+    def test_other_worker_change_visible_after_interval(self):
+        version = self.create_in_other_worker('article_edit')
+        # 检查间隔内沿用旧索引（有界的陈旧期）
+        self.assertFalse(self.registry.exists('article_edit'))
+        self.registry.invalidate()
+        self.assertTrue(self.registry.exists('article_edit'))
+        self.assertEqual(self.registry.stats()['version'], version + 1)
+        self.assertEqual(self.registry.stats()['rebuilds'], 2)
+
+    def test_unchanged_version_does_not_rebuild(self):
+        self.registry.invalidate()
+        self.assertTrue(self.registry.exists('article_view'))
+        self.assertEqual(self.registry.stats(), {'version': 0, 'permissions': 1, 'checks': 2, 'rebuilds': 1})
+
+    def test_local_change_rebuilds_immediately(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_permission('article_edit')
+        self.assertTrue(self.registry.exists('article_edit'))
+        with self.captureOnCommitCallbacks(execute=True):
+            Permission.objects.get(permission_code='article_view').delete()
+        self.assertFalse(self.registry.exists('article_view'))
+
+    def test_version_stamp_in_db(self):
+        with mock.patch.object(services, 'VERSION_SOURCE', 'db'):
+            self.assertEqual(services.get_permission_version(), 0)
+            self.assertEqual(bump_permission_version(), 1)
+            self.assertEqual(bump_permission_version(), 2)
+            self.assertEqual(services.get_permission_version(), 2)
+        self.assertEqual(RbacVersionStamp.objects.get(key=services.PERMISSION_VERSION_KEY).version, 2)
+
+
+class DiscoveryURLConf:
+    """路由自动发现测试用的URLconf"""
+    view = staticmethod(lambda request, **kwargs: HttpResponse('ok'))
+    urlpatterns = [
+        path('users/', include(([
+            path('login/', view, name='login'),
+            path('register/', view, name='register'),
+            path('profile/', view, name='profile'),
+            path('profile/update/', view, name='profile_update'),
+            path('status/update/<int:user_id>/', view, name='user_status_update'),
+        ], 'users'))),
+        path('other/', include(([path('page/', view, name='page')], 'other'))),
+    ]
+
+
+# 12. 按URLconf自动发现路由权限
+@override_settings(ROOT_URLCONF=DiscoveryURLConf)
+class RouteDiscoveryTests(RbacTestCase):
+
+    def discover(self):
+        return discover_routes(('users',), white_list=('/users/login/', '/users/register/'))
+
+    def test_discover_routes(self):
+        discovered = self.discover()
+        self.assertEqual(
+            {view_name: url_path for view_name, (url_path, _) in discovered.items()},
+            {
+                # /users/profile/ 会覆盖 /users/profile/update/，仅按路由名称匹配
+                'users:profile': None,
+                'users:profile_update': '/users/profile/update/',
+                'users:user_status_update': '/users/status/update/',
+            },
+        )
+        self.assertTrue(discovered['users:user_status_update'][1].dynamic)
+
+    def test_plan_reuses_existing_codes_and_reports_orphans(self):
+        self.create_permission('profile_edit', url_path='/users/profile/update/')
+        self.create_permission('gone', route_name='users:gone')
+        self.create_permission('nowhere', url_path='/nowhere/')
+        plan = build_discovery_plan(self.discover())
+        self.assertEqual([p.permission_code for p in plan['create']], ['users_profile', 'users_user_status_update'])
+        self.assertEqual(
+            [(p.permission_code, p.route_name) for p in plan['update']], [('profile_edit', 'users:profile_update')]
+        )
+        self.assertEqual([p.permission_code for p in plan['orphans']], ['gone', 'nowhere'])
+
+    def test_apply_is_idempotent(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(apply_discovery_plan(build_discovery_plan(self.discover())), 3)
+        self.assertTrue(get_permission_index().match_route('users:profile', {'users_profile'}))
+        plan = build_discovery_plan(self.discover())
+        self.assertEqual((plan['create'], plan['update'], plan['unchanged']), ([], [], 3))
+
+    def test_command_dry_run(self):
+        self.create_permission('gone', route_name='users:gone')
+        out = StringIO()
+        call_command('rbac_discover_routes', '--dry-run', stdout=out)
+        self.assertIn('孤立 gone', out.getvalue())
+        self.assertIn('dry-run', out.getvalue())
+        self.assertFalse(Permission.objects.filter(route_name='users:profile').exists())
+
+
+# 13. 键集分页的边界
+class KeysetPaginationTests(RbacTestCase):
+
+    def setUp(self):
+        super().setUp()
+        now = timezone.now()
+        # 前4个角色时间相同（须按id区分先后），其余每个早1分钟
+        for index in range(7):
+            Role.objects.create(role_name=f'role_{index}', create_time=now - timedelta(minutes=max(index - 3, 0)))
+        self.ordered = list(Role.objects.order_by('-create_time', '-pk'))
+        self.paginator = KeysetPaginator(Role.objects.all(), per_page=2)
+
+    def walk(self):
+        pages = [self.paginator.page()]
+        while pages[-1].has_next():
+            pages.append(self.paginator.page(after=pages[-1].next_cursor))
+        return pages
+
+    def test_forward_walk_covers_all_rows_once(self):
+        pages = self.walk()
+        self.assertEqual([row for page in pages for row in page], self.ordered)
+        self.assertEqual([len(page) for page in pages], [2, 2, 2, 1])
+        self.assertFalse(pages[0].has_previous())
+        self.assertIsNone(pages[-1].next_cursor)
+
+    def test_exact_multiple_has_no_empty_last_page(self):
+        Role.objects.filter(pk=self.ordered[-1].pk).delete()
+        pages = self.walk()
+        self.assertEqual([len(page) for page in pages], [2, 2, 2])
+        self.assertFalse(pages[-1].has_next())
+
+    def test_backward_walk_returns_previous_pages(self):
+        pages = self.walk()
+        previous = self.paginator.page(before=pages[2].previous_cursor)
+        self.assertEqual(previous.object_list, pages[1].object_list)
+        self.assertTrue(previous.has_next())
+        first = self.paginator.page(before=previous.previous_cursor)
+        self.assertEqual(first.object_list, pages[0].object_list)
+        self.assertFalse(first.has_previous())
+        self.assertIsNone(first.previous_cursor)
+
+    def test_invalid_cursor(self):
+        for cursor in ('not-a-cursor', KeysetPaginator.encode_cursor(timezone.now(), 1)[:-3]):
+            with self.subTest(cursor), self.assertRaises(ValueError):
+                self.paginator.page(after=cursor)
+
+    def test_list_view_invalid_cursor_is_404(self):
+        view = RoleListView()
+        view.request = RequestFactory().get('/rbac/role/list/', {'after': 'not-a-cursor'})
+        with self.assertRaises(Http404):
+            view.paginate_queryset(Role.objects.all(), 2)
+        view.request = RequestFactory().get('/rbac/role/list/')
+        paginator, page, object_list, is_paginated = view.paginate_queryset(Role.objects.all(), 2)
+        self.assertEqual((list(object_list), is_paginated), (self.ordered[:2], True))
+
+
+# 14. 「谁拥有该权限」报表
+class WhoCanReportTests(RbacTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.parent, self.child = Role.objects.create(role_name='parent'), Role.objects.create(role_name='child')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.child.parents.add(self.parent)
+        self.grant(self.parent, self.create_permission('role_view', url_path='/rbac/role/'))
+        self.grant(self.child, self.create_permission('role_update', route_name='rbac:role_update'))
+        self.alice = self.create_user('alice', '13800000001')
+        self.bob = self.create_user('bob', '13800000002')
+        self.root = self.create_user('root', '13800000003', is_superuser=True)
+        self.assign(self.alice, self.child)
+        self.client.force_login(self.root)
+
+    def test_resolve_codes(self):
+        self.assertEqual(resolve_codes('role_view'), ['role_view'])
+        self.assertEqual(resolve_codes('unknown_code'), [])
+        self.assertEqual(resolve_codes(path='/rbac/role/list/'), ['role_view'])
+        self.assertEqual(resolve_codes(path='/rbac/role/update/1/'), ['role_update', 'role_view'])
+
+    def test_inherited_permissions_and_superusers(self):
+        self.assertEqual(list(who_can_queryset(['role_view'])), [self.alice, self.root])
+        self.assertEqual(list(who_can_queryset(['role_view'], include_superusers=False)), [self.alice])
+        summary = who_can_summary(['role_view'])
+        self.assertEqual((summary['users'], summary['superusers'], summary['by_code']), (2, 1, {'role_view': 1}))
+
+    def test_summary_cache_invalidated(self):
+        self.assertEqual(who_can_summary(['role_view'])['users'], 2)
+        with self.assertNumQueries(0):
+            who_can_summary(['role_view'])
+        self.assign(self.bob, self.parent)
+        self.assertEqual(who_can_summary(['role_view'])['users'], 3)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.bob.is_active = False
+            self.bob.save()
+        self.assertEqual(who_can_summary(['role_view'])['active_users'], 2)
+
+    def test_api_pages_by_user_id(self):
+        url = reverse('rbac:who_can_api')
+        data = self.client.get(url, {'path': '/rbac/role/list/', 'limit': 1}).json()
+        self.assertEqual([user['username'] for user in data['users']], ['alice'])
+        data = self.client.get(url, {'path': '/rbac/role/list/', 'limit': 1, 'after_id': data['next_after_id']}).json()
+        self.assertEqual(([user['username'] for user in data['users']], data['next_after_id']), (['root'], None))
+        self.assertEqual(self.client.get(url).status_code, 400)
+
+    def test_csv_export(self):
+        params = {'permission_code': 'role_view', 'include_superusers': '0'}
+        response = self.client.get(reverse('rbac:who_can_export'), params)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].startswith(f'{self.alice.pk},alice,'))
+
+
+# 15. 矩阵在线编辑：紧凑数据加载与单元格差异保存
+class MatrixEditorTests(RbacTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.parent, self.child = Role.objects.create(role_name='parent'), Role.objects.create(role_name='child')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.child.parents.add(self.parent)
+        self.view, self.edit = self.create_permission('article_view'), self.create_permission('article_edit')
+        self.grant(self.parent, self.view)
+        self.user = self.create_user('alice', '13800000001')
+        self.assign(self.user, self.child)
+        self.client.force_login(self.create_user('root', '13800000002', is_superuser=True))
+
+    def post(self, payload):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse('rbac:matrix_editor'), payload, content_type='application/json')
+
+    def test_load_matrix_arrays(self):
+        data = load_matrix_arrays()
+        self.assertEqual(data['roles'], {'ids': [self.parent.pk, self.child.pk], 'names': ['parent', 'child']})
+        self.assertEqual(data['permissions']['codes'], ['article_view', 'article_edit'])
+        self.assertEqual(data['grants'], [[self.view.pk], []])
+
+    def test_save_cell_diff(self):
+        response = self.post({'add': [[self.child.pk, self.edit.pk]], 'remove': [[self.parent.pk, self.view.pk]]})
+        self.assertEqual(response.json(), {'added': 1, 'removed': 1, 'roles': 2})
+        self.assertEqual(get_effective_permissions(self.user).codes, {'article_edit'})
+        self.assertEqual(verify_all(), {'closure_ok': True, 'mismatched_users': []})
+        # 重复授予已存在的单元格不报错
+        self.assertEqual(self.post({'add': [[self.child.pk, self.edit.pk]]}).status_code, 200)
+
+    def test_invalid_diff_rejected(self):
+        cases = {
+            'conflict': {'add': [[self.child.pk, self.edit.pk]], 'remove': [[self.child.pk, self.edit.pk]]},
+            'missing role': {'add': [[999999, self.edit.pk]]},
+            'bad pair': {'add': [[self.child.pk]]},
+            'not object': [],
+            'invalid json': 'x',
+        }
+        for label, payload in cases.items():
+            with self.subTest(label):
+                self.assertEqual(self.post(payload).status_code, 400)
+        self.assertEqual(get_effective_permissions(self.user).codes, {'article_view'})
+
+    def test_requires_superuser(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.post({'add': [[self.child.pk, self.edit.pk]]}).status_code, 403)
+        self.assertFalse(self.child.permissions.exists())
+
+
+# 16. 批量权限校验接口：结果与ETag/304
+class PermissionCheckTests(RbacTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.role = Role.objects.create(role_name='editor')
+        self.grant(self.role, self.create_permission('role_view', url_path='/rbac/role/'))
+        self.create_permission('permission_view', url_path='/rbac/permission/')
+        self.user = self.create_user()
+        self.assign(self.user, self.role)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.params = {
+            'codes': 'role_view,permission_view,unknown',
+            'paths': '/rbac/role/list/,/rbac/permission/,/users/api/x/',
+        }
+
+    def check(self, **headers):
+        return self.client.get(reverse('rbac:permission_check'), self.params, **headers)
+
+    def test_results(self):
+        response = self.check()
+        self.assertEqual(response.data, {
+            'codes': {'role_view': True, 'permission_view': False, 'unknown': False},
+            'paths': {'/rbac/role/list/': True, '/rbac/permission/': False, '/users/api/x/': True},
+        })
+        post = self.client.post(reverse('rbac:permission_check'), {'codes': ['role_view']}, format='json')
+        self.assertEqual(post.data['codes'], {'role_view': True})
+
+    def test_not_modified_until_permissions_change(self):
+        etag = self.check()['ETag']
+        response = self.check(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual((response.status_code, response['ETag']), (304, etag))
+        self.assertEqual(self.check(HTTP_IF_NONE_MATCH=f'"stale", {etag}').status_code, 304)
+        # 查询内容不同，ETag不同
+        self.params['codes'] = 'role_view'
+        self.assertEqual(self.check(HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        self.params['codes'] = 'role_view,permission_view,unknown'
+        # 用户权限变更后ETag失效
+        with self.captureOnCommitCallbacks(execute=True):
+            self.role.permissions.add(Permission.objects.get(permission_code='permission_view'))
+        response = self.check(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertTrue(response.data['codes']['permission_view'])
+
+    def test_invalid_requests(self):
+        self.assertEqual(self.client.get(reverse('rbac:permission_check')).status_code, 400)
+        self.params = {'codes': ','.join(f'code_{i}' for i in range(201))}
+        self.assertEqual(self.check().status_code, 400)
+        self.client.force_authenticate(None)
+        self.assertIn(self.check().status_code, (401, 403))
+
+
+# 17. 导航菜单：按角色组合缓存的片段
+class NavigationTests(RbacTestCase):
+
+    def setUp(self):
+        super().setUp()
+        nav_cache_stats.reset()
+        self.role = Role.objects.create(role_name='auditor')
+        self.grant(self.role, self.create_permission('login_log_list', url_path=reverse('users:login_log_list')))
+        self.alice = self.create_user('alice', '13800000001')
+        self.bob = self.create_user('bob', '13800000002')
+        self.assign(self.alice, self.role)
+        self.assign(self.bob, self.role)
+
+    def render(self, user):
+        request = RequestFactory().get('/')
+        request.user = user
+        return render_nav(request)
+
+    def test_menu_filtered_by_permissions(self):
+        html = self.render(self.alice)
+        self.assertIn(reverse('users:login_log_list'), html)
+        self.assertNotIn(reverse('rbac:role_list'), html)
+        self.assertNotIn(reverse('users:profile'), html)
+        self.assertIn(reverse('rbac:role_list'), self.render(self.create_user('root', '13800000003', is_superuser=True)))
+        self.assertEqual(self.render(AnonymousUser()), '')
+
+    def test_route_name_permission_shows_item(self):
+        self.grant(self.role, self.create_permission('profile', route_name='users:profile'))
+        self.assertIn(reverse('users:profile'), self.render(self.alice))
+
+    def test_same_roles_share_fragment(self):
+        html = self.render(self.alice)
+        self.render(self.bob)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.render(self.bob), html)
+        self.assertEqual(nav_cache_stats.as_dict(), {'hits': 2, 'misses': 1, 'hit_rate': 0.6667})
+
+    def test_changes_invalidate_fragment(self):
+        self.assertNotIn(reverse('users:profile'), self.render(self.alice))
+        other = Role.objects.create(role_name='member')
+        with self.captureOnCommitCallbacks(execute=True):
+            profile = self.create_permission('profile', url_path=reverse('users:profile'))
+        self.grant(other, profile)
+        self.assign(self.alice, other)
+        self.assertIn(reverse('users:profile'), self.render(self.alice))
+        self.assertNotIn(reverse('users:profile'), self.render(self.bob))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.role.permissions.clear()
+        self.assertNotIn(reverse('users:login_log_list'), self.render(self.bob))
+
+    def test_cache_stats_api(self):
+        self.render(self.alice)
+        client = APIClient()
+        client.force_authenticate(self.create_user('root', '13800000003', is_superuser=True))
+        data = client.get(reverse('rbac:cache_stats')).data
+        self.assertEqual(data['nav'], {'hits': 0, 'misses': 1, 'hit_rate': 0.0})
+        self.assertEqual(set(data), {'nav', 'registry', 'audit_writer'})
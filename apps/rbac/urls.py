@@ -19,4 +19,21 @@ urlpatterns = [
     path('user/role/assign/<int:user_id>/', views.UserRoleAssignView.as_view(), name='user_role_assign'),
     # 15.4 角色-权限分配路由
     path('role/permission/assign/<int:role_id>/', views.RolePermissionAssignView.as_view(), name='role_permission_assign'),
-]
\ No newline at end of file
+    # 15.5 RBAC访问令牌接口
+    path('api/token/', views.RbacTokenObtainView.as_view(), name='token_obtain'),
+    path('api/token/refresh/', views.RbacTokenRefreshView.as_view(), name='token_refresh'),
+    # 15.6 批量用户-角色分配接口
+    path('api/user/role/batch/', views.UserRoleBatchAssignView.as_view(), name='user_role_batch_assign'),
+    # 15.7 角色×权限矩阵导入/导出路由
+    path('matrix/sync/', views.RbacMatrixSyncView.as_view(), name='matrix_sync'),
+    path('matrix/export/', views.RbacMatrixExportView.as_view(), name='matrix_export'),
+    path('matrix/editor/', views.RbacMatrixEditorView.as_view(), name='matrix_editor'),
+    # 15.8 「谁拥有该权限」报表路由
+    path('report/who-can/', views.WhoCanReportView.as_view(), name='who_can_report'),
+    path('report/who-can/export/', views.WhoCanExportView.as_view(), name='who_can_export'),
+    path('api/report/who-can/', views.WhoCanApiView.as_view(), name='who_can_api'),
+    # 15.9 批量权限校验接口
+    path('api/permission/check/', views.PermissionCheckView.as_view(), name='permission_check'),
+    # 15.10 RBAC缓存统计接口
+    path('api/cache/stats/', views.RbacCacheStatsView.as_view(), name='cache_stats'),
+]
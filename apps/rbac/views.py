@@ -1,11 +1,37 @@
 # apps/rbac/views.py
+import hashlib
+import json
+
+from django.views import View
 from django.views.generic import ListView, CreateView, UpdateView, DeleteView
 from django.urls import reverse_lazy
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib import messages
-from .models import Role, Permission
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from .models import Role, Permission, UserEffectivePermission
 from apps.users.models import User
 from django.shortcuts import get_object_or_404, render, redirect
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.views import APIView
+from .authentication import TOKEN_MAX_AGE, RbacTokenUser, issue_token, refresh_token
+from .assign import ACTIONS, assign_role_permissions, assign_user_roles, unassignable_role_ids
+from .audit import get_audit_writer
+from .middleware import get_white_list_trie
+from .navigation import nav_cache_stats
+from .matrix import (
+    DIFF_LABELS, FORMAT_CSV, FORMAT_JSON, MatrixError, apply_cell_diff, apply_matrix, diff_matrix, export_matrix,
+    guess_format, has_changes, load_matrix_arrays, parse_cell_pairs, parse_matrix,
+)
+from .pagination import KeysetPaginationMixin
+from .registry import permission_registry
+from .permissions import RbacApiPermission
+from .reports import USER_FIELDS, codes_for_path, export_who_can, resolve_codes, who_can_queryset, who_can_summary
+from .streaming import CSVStreamRenderer
+from .services import get_permission_version, get_request_permissions, get_user_permission_version
 
 # 超级管理员校验Mixin（复用）
 class SuperAdminRequiredMixin(UserPassesTestMixin):
@@ -19,12 +45,48 @@ class SuperAdminRequiredMixin(UserPassesTestMixin):
         messages.error(self.request, "仅超级管理员可访问该功能！")
         return reverse_lazy('users:profile')
 
+def get_existing_ids(model, raw_ids):
+    """
+    一次查询校验提交的ID均存在（替代逐条get_object_or_404）
+    :return: ID集合；存在非法或不存在的ID时抛出Http404
+    """
+    try:
+        ids = {int(raw_id) for raw_id in raw_ids}
+    except (TypeError, ValueError):
+        raise Http404('提交的ID不合法')
+    existing_ids = set(model.objects.filter(id__in=ids).order_by().values_list('id', flat=True))
+    if existing_ids != ids:
+        raise Http404(f'{model._meta.verbose_name}不存在')
+    return existing_ids
+
+def count_subquery(model, fk_field):
+    """
+    关联记录数的相关子查询（如角色的用户数），用于annotate：
+    与列表在同一条SQL中完成，只对当前页的行计算，避免模板中逐行count（N+1）及多表JOIN后的笛卡尔积
+    """
+    counts = (
+        model.objects
+        .filter(**{fk_field: OuterRef('pk')})
+        .order_by()
+        .values(fk_field)
+        .annotate(count=Count('*'))
+        .values('count')
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
 # 15.1.1 角色列表视图（查）
-class RoleListView(LoginRequiredMixin, SuperAdminRequiredMixin, ListView):
+class RoleListView(LoginRequiredMixin, SuperAdminRequiredMixin, KeysetPaginationMixin, ListView):
     model = Role
     template_name = 'rbac/role_list.html'  # 对应模板文件
     context_object_name = 'role_list'  # 模板中使用的变量名
-    paginate_by = 10  # 分页功能，每页显示10条
+    paginate_by = 10  # 分页功能，每页显示10条（按创建时间键集分页，不执行COUNT(*)）
+
+    def get_queryset(self):
+        # 直接分配的用户数、权限数
+        return Role.objects.annotate(
+            user_count=count_subquery(User.roles.through, 'role_id'),
+            permission_count=count_subquery(Role.permissions.through, 'role_id'),
+        )
 
 # 15.1.2 角色新增视图（增）
 class RoleCreateView(LoginRequiredMixin, SuperAdminRequiredMixin, CreateView):
@@ -60,17 +122,24 @@ class RoleDeleteView(LoginRequiredMixin, SuperAdminRequiredMixin, DeleteView):
         return super().delete(request, *args, **kwargs)
 
 # 15.2.1 权限列表视图（查）
-class PermissionListView(LoginRequiredMixin, SuperAdminRequiredMixin, ListView):
+class PermissionListView(LoginRequiredMixin, SuperAdminRequiredMixin, KeysetPaginationMixin, ListView):
     model = Permission
     template_name = 'rbac/permission_list.html'
     context_object_name = 'permission_list'
     paginate_by = 10
 
+    def get_queryset(self):
+        # 直接绑定的角色数；拥有该权限的用户数取自用户有效权限物化表（含角色继承）
+        return Permission.objects.annotate(
+            role_count=count_subquery(Role.permissions.through, 'permission_id'),
+            user_count=count_subquery(UserEffectivePermission, 'permission_id'),
+        )
+
 # 15.2.2 权限新增视图（增）
 class PermissionCreateView(LoginRequiredMixin, SuperAdminRequiredMixin, CreateView):
     model = Permission
     template_name = 'rbac/permission_form.html'
-    fields = ['permission_name', 'permission_code', 'url_path', 'description']
+    fields = ['permission_name', 'permission_code', 'url_path', 'route_name', 'description']
     success_url = reverse_lazy('rbac:permission_list')
 
     def form_valid(self, form):
@@ -81,7 +150,7 @@ class PermissionCreateView(LoginRequiredMixin, SuperAdminRequiredMixin, CreateVi
 class PermissionUpdateView(LoginRequiredMixin, SuperAdminRequiredMixin, UpdateView):
     model = Permission
     template_name = 'rbac/permission_form.html'
-    fields = ['permission_name', 'permission_code', 'url_path', 'description']
+    fields = ['permission_name', 'permission_code', 'url_path', 'route_name', 'description']
     success_url = reverse_lazy('rbac:permission_list')
 
     def form_valid(self, form):
@@ -100,7 +169,7 @@ class PermissionDeleteView(LoginRequiredMixin, SuperAdminRequiredMixin, DeleteVi
         return super().delete(request, *args, **kwargs)
     
 # 15.3 用户-角色分配视图
-class UserRoleAssignView(LoginRequiredMixin, SuperAdminRequiredMixin):
+class UserRoleAssignView(LoginRequiredMixin, SuperAdminRequiredMixin, View):
     """用户-角色分配视图：展示用户已有角色，支持分配/移除角色"""
     template_name = 'rbac/user_role_assign.html'
 
@@ -109,7 +178,7 @@ class UserRoleAssignView(LoginRequiredMixin, SuperAdminRequiredMixin):
         user = get_object_or_404(User, id=user_id)
         all_roles = Role.objects.all()
         # 获取用户已绑定的角色ID列表
-        user_role_ids = user.roles.values_list('id', flat=True)
+        user_role_ids = set(user.roles.values_list('id', flat=True))
 
         context = {
             'user_obj': user,
@@ -123,17 +192,15 @@ class UserRoleAssignView(LoginRequiredMixin, SuperAdminRequiredMixin):
         # 获取提交的角色ID列表（多选框提交的数组）
         selected_role_ids = request.POST.getlist('role_ids', [])
 
-        # 更新用户角色：先清空原有角色，再添加选中的角色（简化分配逻辑）
-        user.roles.clear()
-        for role_id in selected_role_ids:
-            role = get_object_or_404(Role, id=role_id)
-            user.roles.add(role)
+        # 更新用户角色：一次查询校验角色存在，再与现有记录比对，仅批量插入/删除差异部分
+        role_ids = get_existing_ids(Role, selected_role_ids)
+        assign_user_roles([user.id], role_ids)
 
         messages.success(request, f"用户「{user.username}」的角色分配成功！")
         return redirect('users:user_list')  # 重定向到用户列表页
 
 # 15.4 角色-权限分配视图
-class RolePermissionAssignView(LoginRequiredMixin, SuperAdminRequiredMixin):
+class RolePermissionAssignView(LoginRequiredMixin, SuperAdminRequiredMixin, View):
     """角色-权限分配视图：展示角色已有权限，支持分配/移除权限"""
     template_name = 'rbac/role_permission_assign.html'
 
@@ -142,7 +209,7 @@ class RolePermissionAssignView(LoginRequiredMixin, SuperAdminRequiredMixin):
         role = get_object_or_404(Role, id=role_id)
         all_permissions = Permission.objects.all()
         # 获取角色已绑定的权限ID列表
-        role_perm_ids = role.permissions.values_list('id', flat=True)
+        role_perm_ids = set(role.permissions.values_list('id', flat=True))
 
         context = {
             'role_obj': role,
@@ -156,11 +223,296 @@ class RolePermissionAssignView(LoginRequiredMixin, SuperAdminRequiredMixin):
         # 获取提交的权限ID列表
         selected_perm_ids = request.POST.getlist('perm_ids', [])
 
-        # 更新角色权限：先清空再添加
-        role.permissions.clear()
-        for perm_id in selected_perm_ids:
-            perm = get_object_or_404(Permission, id=perm_id)
-            role.permissions.add(perm)
+        # 更新角色权限：一次查询校验权限存在，再与现有记录比对，仅批量插入/删除差异部分
+        perm_ids = get_existing_ids(Permission, selected_perm_ids)
+        assign_role_permissions(role.id, perm_ids)
 
         messages.success(request, f"角色「{role.role_name}」的权限分配成功！")
-        return redirect('rbac:role_list')  # 重定向到角色列表页
\ No newline at end of file
+        return redirect('rbac:role_list')  # 重定向到角色列表页
+
+# 15.5 RBAC访问令牌接口
+class RbacTokenObtainView(APIView):
+    """
+    签发访问令牌：需先通过会话/Basic认证，返回内嵌权限位图的签名令牌
+    以访问令牌认证的请求沿用该令牌的首次签发时间，不能借此绕过可刷新期限
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        issued_at = request.auth.get('iat') if isinstance(request.user, RbacTokenUser) else None
+        return Response({'token': issue_token(request.user, issued_at), 'expires_in': TOKEN_MAX_AGE})
+
+class RbacTokenRefreshView(APIView):
+    """刷新访问令牌：令牌过期或权限变更（token_stale）后，凭旧令牌按最新权限换取新令牌"""
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def post(self, request):
+        token = request.data.get('token')
+        if not token:
+            return Response({'detail': '缺少token参数'}, status=400)
+        return Response({'token': refresh_token(token), 'expires_in': TOKEN_MAX_AGE})
+
+# 15.6 批量用户-角色分配接口
+class UserRoleBatchAssignView(APIView):
+    """
+    批量为用户分配/移除角色（如整个部门入职）：
+    请求体 {"user_ids": [...], "role_ids": [...], "action": "add" | "remove" | "set"}
+    与现有记录比对后批量插入/删除，受影响用户的权限缓存统一失效一次
+    非超级管理员只能分配/移除自己已拥有的角色（含继承的祖先角色），否则返回403
+    """
+    permission_classes = [RbacApiPermission]
+    required_permission_code = 'user_role_batch_assign'
+
+    def post(self, request):
+        action = request.data.get('action', 'add')
+        if action not in ACTIONS:
+            return Response({'detail': f"action仅支持：{'、'.join(ACTIONS)}"}, status=400)
+        try:
+            user_ids = {int(user_id) for user_id in request.data.get('user_ids') or []}
+            role_ids = {int(role_id) for role_id in request.data.get('role_ids') or []}
+        except (TypeError, ValueError):
+            return Response({'detail': 'user_ids、role_ids须为整数列表'}, status=400)
+        if not user_ids:
+            return Response({'detail': '缺少user_ids参数'}, status=400)
+
+        missing_role_ids = role_ids - set(Role.objects.filter(id__in=role_ids).order_by().values_list('id', flat=True))
+        if missing_role_ids:
+            return Response({'detail': '角色不存在', 'role_ids': sorted(missing_role_ids)}, status=400)
+        existing_user_ids = set(User.objects.filter(id__in=user_ids).order_by().values_list('id', flat=True))
+        missing_user_ids = user_ids - existing_user_ids
+        if missing_user_ids:
+            return Response({'detail': '用户不存在', 'user_ids': sorted(missing_user_ids)[:100]}, status=400)
+
+        forbidden_role_ids = unassignable_role_ids(request.user, user_ids, role_ids, action)
+        if forbidden_role_ids:
+            return Response(
+                {'detail': '只能分配或移除自己已拥有的角色', 'role_ids': sorted(forbidden_role_ids)}, status=403
+            )
+        return Response(assign_user_roles(user_ids, role_ids, action))
+
+# 15.7.1 角色×权限矩阵导入视图
+class RbacMatrixSyncView(LoginRequiredMixin, SuperAdminRequiredMixin, View):
+    """上传角色×权限矩阵文件（CSV/JSON）：可先预览差异，确认后批量同步"""
+    template_name = 'rbac/matrix_sync.html'
+    # 预览时每类差异最多展示的条数
+    preview_limit = 50
+
+    def get(self, request):
+        return render(request, self.template_name)
+
+    def post(self, request):
+        upload = request.FILES.get('matrix_file')
+        if not upload:
+            messages.error(request, '请选择要导入的矩阵文件！')
+            return redirect('rbac:matrix_sync')
+        try:
+            matrix = parse_matrix(upload.read().decode('utf-8-sig'), guess_format(upload.name))
+            diff = diff_matrix(matrix)
+        except (MatrixError, UnicodeDecodeError) as e:
+            messages.error(request, f'矩阵文件解析失败：{e}')
+            return redirect('rbac:matrix_sync')
+
+        if request.POST.get('dry_run'):
+            # 仅预览差异，不写入数据库
+            diff_preview = [
+                {
+                    'label': label,
+                    'count': len(diff[key]),
+                    'items': [' → '.join(item) if isinstance(item, tuple) else item for item in diff[key][:self.preview_limit]],
+                }
+                for key, label in DIFF_LABELS
+            ]
+            return render(request, self.template_name, {'diff_preview': diff_preview, 'has_changes': has_changes(diff)})
+
+        if has_changes(diff):
+            apply_matrix(matrix, diff)
+            messages.success(request, '角色×权限矩阵同步成功！')
+        else:
+            messages.success(request, '矩阵与现有数据一致，无需同步！')
+        return redirect('rbac:matrix_sync')
+
+# 15.7.2 角色×权限矩阵导出视图
+class RbacMatrixExportView(LoginRequiredMixin, SuperAdminRequiredMixin, View):
+    """流式导出当前角色×权限矩阵（?format=csv|json），导出文件可直接再次导入"""
+
+    def get(self, request):
+        fmt = FORMAT_JSON if request.GET.get('format') == FORMAT_JSON else FORMAT_CSV
+        content_type = 'application/json' if fmt == FORMAT_JSON else 'text/csv'
+        response = StreamingHttpResponse(export_matrix(fmt), content_type=f'{content_type}; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="rbac_matrix.{fmt}"'
+        return response
+
+# 15.7.3 角色×权限矩阵编辑视图
+class RbacMatrixEditorView(LoginRequiredMixin, SuperAdminRequiredMixin, View):
+    """
+    在线编辑角色×权限矩阵：
+    GET 三次查询加载全部角色、权限与授权关系，以紧凑的ID数组（json_script）交给前端按需渲染可见区域；
+    POST 接收JSON格式的单元格差异 {"add": [[角色ID, 权限ID], ...], "remove": [...]}，一次请求批量保存
+    """
+    template_name = 'rbac/matrix_editor.html'
+
+    def get(self, request):
+        return render(request, self.template_name, {'matrix_data': load_matrix_arrays()})
+
+    def post(self, request):
+        try:
+            payload = json.loads(request.body or b'{}')
+            result = apply_cell_diff(parse_cell_pairs(payload.get('add')), parse_cell_pairs(payload.get('remove')))
+        except (ValueError, AttributeError) as e:
+            # MatrixError、JSON解析错误（json.JSONDecodeError）均为ValueError子类
+            return JsonResponse({'detail': str(e) if isinstance(e, MatrixError) else '请求体须为JSON对象'}, status=400)
+        return JsonResponse(result)
+
+def get_who_can_params(params):
+    """解析「谁拥有该权限」报表的查询参数：(权限标识, URL路径, 是否包含超级管理员)"""
+    permission_code = (params.get('permission_code') or '').strip()
+    path = (params.get('path') or '').strip()
+    include_superusers = params.get('include_superusers', '1') not in ('0', 'false', '')
+    return permission_code, path, include_superusers
+
+# 15.8.1 「谁拥有该权限」报表视图
+class WhoCanReportView(LoginRequiredMixin, SuperAdminRequiredMixin, View):
+    """按权限标识或URL反查拥有权限的用户：汇总结果按RBAC版本号缓存，完整名单可流式导出CSV"""
+    template_name = 'rbac/who_can_report.html'
+    # 页面上最多展示的用户数（完整名单请导出CSV）
+    preview_limit = 100
+
+    def get(self, request):
+        permission_code, path, include_superusers = get_who_can_params(request.GET)
+        context = {'permission_code': permission_code, 'path': path, 'include_superusers': include_superusers}
+        if permission_code or path:
+            codes = resolve_codes(permission_code, path)
+            context['codes'] = codes
+            context['summary'] = who_can_summary(codes, include_superusers)
+            context['users'] = who_can_queryset(codes, include_superusers).values(*USER_FIELDS)[:self.preview_limit]
+        return render(request, self.template_name, context)
+
+# 15.8.2 「谁拥有该权限」名单导出视图
+class WhoCanExportView(LoginRequiredMixin, SuperAdminRequiredMixin, View):
+    """流式导出拥有指定权限的全部用户（CSV）"""
+
+    def get(self, request):
+        permission_code, path, include_superusers = get_who_can_params(request.GET)
+        if not (permission_code or path):
+            raise Http404('缺少permission_code或path参数')
+        codes = resolve_codes(permission_code, path)
+        response = StreamingHttpResponse(export_who_can(codes, include_superusers), content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = 'attachment; filename="rbac_who_can.csv"'
+        return response
+
+# 15.8.3 「谁拥有该权限」接口
+class WhoCanApiView(APIView):
+    """
+    按权限标识或URL反查拥有权限的用户：
+    GET ?permission_code=xxx 或 ?path=/users/login/logs/，可选 include_superusers=0、limit、after_id（按用户ID翻页）
+    返回汇总（缓存）与一页用户；?format=csv 时流式返回完整名单
+    """
+    permission_classes = [RbacApiPermission]
+    required_permission_code = 'rbac_who_can_report'
+    # 允许 ?format=csv 通过DRF内容协商
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, CSVStreamRenderer]
+    max_limit = 1000
+
+    def get(self, request):
+        permission_code, path, include_superusers = get_who_can_params(request.query_params)
+        if not (permission_code or path):
+            return Response({'detail': '缺少permission_code或path参数'}, status=400)
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', 100)), self.max_limit))
+            after_id = int(request.query_params.get('after_id', 0))
+        except ValueError:
+            return Response({'detail': 'limit、after_id须为整数'}, status=400)
+
+        codes = resolve_codes(permission_code, path)
+        if request.query_params.get('format') == 'csv':
+            response = StreamingHttpResponse(export_who_can(codes, include_superusers), content_type='text/csv; charset=utf-8')
+            response['Content-Disposition'] = 'attachment; filename="rbac_who_can.csv"'
+            return response
+
+        # 多取一条判断是否还有下一页
+        users = list(who_can_queryset(codes, include_superusers).filter(id__gt=after_id).values(*USER_FIELDS)[:limit + 1])
+        has_next = len(users) > limit
+        users = users[:limit]
+        return Response({
+            'summary': who_can_summary(codes, include_superusers),
+            'users': users,
+            'next_after_id': users[-1]['id'] if has_next else None,
+        })
+
+# 15.9 批量权限校验接口
+class PermissionCheckView(APIView):
+    """
+    批量判断当前用户对一组权限标识/URL的访问权限（前端按钮、内部服务一次请求获取全部结果）：
+    GET ?codes=a,b&paths=/x/,/y/ 或 POST {"codes": [...], "paths": [...]}
+    返回 {"codes": {标识: bool}, "paths": {路径: bool}}，全部基于同一份内存中的权限集计算；
+    响应带ETag（用户权限版本号+权限目录版本号+查询内容），客户端携带If-None-Match且未变化时返回304
+    """
+    permission_classes = [IsAuthenticated]
+    # 单次最多校验的权限标识/路径数量
+    max_items = 200
+
+    def get(self, request):
+        return self.check(request, self.split(request.query_params.get('codes')), self.split(request.query_params.get('paths')))
+
+    def post(self, request):
+        codes = request.data.get('codes') or []
+        paths = request.data.get('paths') or []
+        if not isinstance(codes, list) or not isinstance(paths, list):
+            return Response({'detail': 'codes、paths须为字符串列表'}, status=400)
+        return self.check(request, [str(code) for code in codes], [str(path) for path in paths])
+
+    @staticmethod
+    def split(value):
+        return [item.strip() for item in (value or '').split(',') if item.strip()]
+
+    def get_etag(self, user, codes, paths):
+        """ETag：用户权限版本号（令牌用户取令牌内的版本号）+ 权限目录版本号 + 超级管理员标识 + 查询内容摘要"""
+        if isinstance(user, RbacTokenUser):
+            user_version = user.permission_version
+        else:
+            user_version = get_user_permission_version(user.pk)
+        digest = hashlib.md5('\n'.join(codes + ['|'] + paths).encode()).hexdigest()[:16]
+        return f'"{user.pk}-{int(user.is_superuser)}-{user_version}-{get_permission_version()}-{digest}"'
+
+    def check(self, request, codes, paths):
+        if not codes and not paths:
+            return Response({'detail': '缺少codes或paths参数'}, status=400)
+        if len(codes) + len(paths) > self.max_items:
+            return Response({'detail': f'单次最多校验{self.max_items}项'}, status=400)
+
+        user = request.user
+        etag = self.get_etag(user, codes, paths)
+        if etag in [tag.strip() for tag in request.headers.get('If-None-Match', '').split(',')]:
+            return Response(status=304, headers={'ETag': etag})
+
+        # 令牌用户直接对令牌内的权限位图做位运算；其他用户（含超级管理员）使用请求级缓存的有效权限集
+        if isinstance(user, RbacTokenUser) and not user.is_superuser:
+            has_code = user.has_permission_code
+        else:
+            has_code = get_request_permissions(request).has_code
+        white_list_trie = get_white_list_trie()
+        result = {
+            'codes': {code: has_code(code) for code in codes},
+            'paths': {
+                path: user.is_superuser or white_list_trie.has_match(path) or any(
+                    has_code(code) for code in codes_for_path(path)
+                )
+                for path in paths
+            },
+        }
+        return Response(result, headers={'ETag': etag, 'Cache-Control': 'private, no-cache'})
+
+# 15.10 RBAC进程内缓存统计接口
+class RbacCacheStatsView(APIView):
+    """当前worker进程的RBAC缓存统计：导航片段缓存命中率、权限注册表、审计日志写入器"""
+    permission_classes = [RbacApiPermission]
+    required_permission_code = 'rbac_cache_stats'
+
+    def get(self, request):
+        return Response({
+            'nav': nav_cache_stats.as_dict(),
+            'registry': permission_registry.stats(),
+            'audit_writer': get_audit_writer().stats(),
+        })
+
@@ -0,0 +1,186 @@
+# apps/rbac/writers.py
+import atexit
+import logging
+import queue
+import threading
+import time
+
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+
+class BufferedBulkWriter:
+    """
+    异步批量写入器：业务线程只把待写入的数据放入有界队列（不访问数据库），
+    后台线程按「条数达到batch_size」或「距上次写入超过flush_interval秒」批量bulk_create；
+    队列已满时按overflow策略处理：drop（丢弃并计数，不拖慢请求）/ block（最多等待put_timeout秒，
+    仍满则在调用线程中直接写入，即对业务线程施加背压，数据不丢失）；进程退出时（atexit）尽量写完剩余数据
+    on_flush：每个写入周期（及flush()）写完本批数据后在写入线程中调用，用于附带的批量更新（如累加计数）
+    """
+    OVERFLOW_DROP = 'drop'
+    OVERFLOW_BLOCK = 'block'
+
+    def __init__(self, model, batch_size=500, flush_interval=2.0, max_queue_size=10000, name=None,
+                 overflow=OVERFLOW_DROP, put_timeout=0.05, on_flush=None):
+        """
+        :param model: 目标模型类
+        :param batch_size: 每批写入条数
+        :param flush_interval: 最长写入间隔（秒）
+        :param max_queue_size: 队列容量
+        :param overflow: 队列已满时的处理策略（OVERFLOW_DROP / OVERFLOW_BLOCK）
+        :param put_timeout: OVERFLOW_BLOCK策略下等待队列空位的最长时间（秒）
+        :param on_flush: 每个写入周期写完数据后调用的无参函数（可选）
+        """
+        self.model = model
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.name = name or f'{model._meta.label}-writer'
+        self.queue = queue.Queue(maxsize=max_queue_size)
+        self.overflow = overflow
+        self.put_timeout = put_timeout
+        self.on_flush = on_flush
+        self.written = 0
+        self.dropped = 0
+        # 队列已满、在调用线程中直接写入的条数（OVERFLOW_BLOCK策略）
+        self.inline_written = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._atexit_registered = False
+        # 后台线程已取出、尚未写入的数据（受_flush_lock保护，flush()时一并写入）
+        self._pending = []
+
+    def put(self, **fields):
+        """
+        提交一条待写入数据（字段关键字参数，写入时构造模型实例）
+        :return: True（已入队或已直接写入）/ False（队列已满被丢弃）
+        """
+        self._ensure_started()
+        try:
+            self.queue.put_nowait(fields)
+            return True
+        except queue.Full:
+            pass
+        if self.overflow == self.OVERFLOW_BLOCK:
+            try:
+                self.queue.put(fields, timeout=self.put_timeout)
+            except queue.Full:
+                # 后台线程跟不上：在调用线程中直接写入，以请求变慢为代价保证数据不丢失
+                self._write([fields])
+                with self._lock:
+                    self.inline_written += 1
+            return True
+        with self._lock:
+            self.dropped += 1
+        return False
+
+    def _ensure_started(self):
+        """首次写入时才启动后台线程（兼容多进程服务器fork后再启动线程）"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+            if not self._atexit_registered:
+                atexit.register(self.stop)
+                self._atexit_registered = True
+
+    def _drain(self, limit, timeout=None):
+        """从队列取出最多limit条数据；timeout为首条数据的最长等待时间（None表示不等待）"""
+        items = []
+        try:
+            if timeout is not None:
+                items.append(self.queue.get(timeout=timeout))
+            while len(items) < limit:
+                items.append(self.queue.get_nowait())
+        except queue.Empty:
+            pass
+        return items
+
+    def _write(self, items):
+        """批量写入一批数据；整批失败时（如个别数据的外键已失效）逐条重试，只丢弃写入失败的数据"""
+        if not items:
+            return
+        try:
+            self.model.objects.bulk_create([self.model(**fields) for fields in items], batch_size=self.batch_size)
+            written, failed = len(items), 0
+        except Exception:
+            if len(items) == 1:
+                logger.exception('%s 写入失败，丢弃1条数据', self.name)
+                written, failed = 0, 1
+            else:
+                written = failed = 0
+                for fields in items:
+                    try:
+                        self.model.objects.create(**fields)
+                        written += 1
+                    except Exception:
+                        failed += 1
+                if failed:
+                    logger.error('%s 批量写入失败，逐条重试后丢弃%d条数据', self.name, failed)
+        with self._lock:
+            self.written += written
+            self.dropped += failed
+
+    def _run(self):
+        deadline = time.monotonic() + self.flush_interval
+        while not self._stopping.is_set():
+            items = self._drain(self.batch_size, timeout=max(deadline - time.monotonic(), 0.01))
+            with self._flush_lock:
+                self._pending.extend(items)
+                if len(self._pending) >= self.batch_size or time.monotonic() >= deadline:
+                    self._write_pending()
+                    self._run_on_flush()
+                    close_old_connections()
+                    deadline = time.monotonic() + self.flush_interval
+        # 退出前写完已取出的数据，剩余队列数据由stop()在调用线程中写入
+        with self._flush_lock:
+            self._write_pending()
+            self._run_on_flush()
+            close_old_connections()
+
+    def _write_pending(self):
+        """写入已取出的数据（调用方需持有_flush_lock）"""
+        items, self._pending = self._pending, []
+        self._write(items)
+
+    def _run_on_flush(self):
+        """调用on_flush（调用方需持有_flush_lock），异常只记录日志，不中断写入线程"""
+        if self.on_flush is None:
+            return
+        try:
+            self.on_flush()
+        except Exception:
+            logger.exception('%s on_flush执行失败', self.name)
+
+    def flush(self):
+        """在调用线程中立即写入已取出及队列中的全部数据（测试、管理命令或进程退出时使用）"""
+        with self._flush_lock:
+            while True:
+                self._pending.extend(self._drain(self.batch_size))
+                if not self._pending:
+                    break
+                self._write_pending()
+            self._run_on_flush()
+
+    def stop(self, timeout=5.0):
+        """停止后台线程并写完剩余数据（进程退出时由atexit自动调用）"""
+        self._stopping.set()
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            thread.join(timeout)
+        self.flush()
+
+    def stats(self):
+        """运行统计：已写入（含直接写入）、直接写入、已丢弃、队列中的条数"""
+        return {
+            'written': self.written,
+            'inline_written': self.inline_written,
+            'dropped': self.dropped,
+            'pending': self.queue.qsize() + len(self._pending),
+        }
@@ -0,0 +1,324 @@
+# apps/users/archive.py
+import csv
+import gzip
+import hashlib
+import heapq
+import json
+import os
+import time
+from collections import namedtuple
+from datetime import datetime
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from apps.rbac.pagination import KeysetPaginator
+from .models import LoginLog, LoginLogArchive
+
+# 归档文件目录、热表保留月数（含当月）、删除热表数据时每批条数，可在settings中覆盖
+LOGIN_LOG_ARCHIVE_DIR = getattr(
+    settings, 'LOGIN_LOG_ARCHIVE_DIR', os.path.join(getattr(settings, 'BASE_DIR', ''), 'archive', 'login_logs')
+)
+LOGIN_LOG_RETENTION_MONTHS = getattr(settings, 'LOGIN_LOG_RETENTION_MONTHS', 3)
+LOGIN_LOG_ARCHIVE_CHUNK_SIZE = getattr(settings, 'LOGIN_LOG_ARCHIVE_CHUNK_SIZE', 1000)
+# 日志查询跨越归档时，最多从归档文件中返回的条数
+LOGIN_LOG_ARCHIVE_QUERY_LIMIT = getattr(settings, 'LOGIN_LOG_ARCHIVE_QUERY_LIMIT', 1000)
+
+# 归档字段（含用户名，用户改名/删除后归档仍可读）
+ARCHIVE_FIELDS = ('id', 'user_id', 'username', 'login_ip', 'login_time', 'device', 'status', 'attempts')
+_QUERY_FIELDS = ('id', 'user_id', 'user__username', 'login_ip', 'login_time', 'device', 'status', 'attempts')
+
+# 归档日志中的用户（只有ID与用户名，供模板 log.user.username 使用）
+ArchivedUser = namedtuple('ArchivedUser', ('id', 'username'))
+
+
+class ArchivedLoginLog(namedtuple(
+    'ArchivedLoginLog', ('id', 'user', 'login_ip', 'login_time', 'device', 'status', 'attempts')
+)):
+    """归档文件中的一条登录日志（只读，属性与LoginLog一致，可与热表数据混合渲染）"""
+    __slots__ = ()
+    archived = True
+
+    @property
+    def pk(self):
+        return self.id
+
+
+def month_start(value):
+    """月份（date/datetime）→ 当前时区该月1日0点"""
+    return timezone.make_aware(datetime(value.year, value.month, 1))
+
+
+def add_months(value, months):
+    """月份加减（返回该月1日的date）"""
+    index = value.year * 12 + value.month - 1 + months
+    return value.replace(year=index // 12, month=index % 12 + 1, day=1)
+
+
+def month_range(month):
+    """月份 → [该月1日0点, 下月1日0点)"""
+    return month_start(month), month_start(add_months(month, 1))
+
+
+def retention_cutoff(keep_months=LOGIN_LOG_RETENTION_MONTHS):
+    """热表保留的最早月份（含当月共keep_months个月），早于该月的月份均已关闭、可归档"""
+    current = timezone.localdate().replace(day=1)
+    return add_months(current, -(max(keep_months, 1) - 1))
+
+
+def archivable_months(keep_months=LOGIN_LOG_RETENTION_MONTHS):
+    """热表中早于保留期、可归档的月份（升序）"""
+    cutoff = month_start(retention_cutoff(keep_months))
+    return list(LoginLog.objects.filter(login_time__lt=cutoff).dates('login_time', 'month'))
+
+
+def _serialize_row(row):
+    values = dict(zip(ARCHIVE_FIELDS, row))
+    values['login_time'] = values['login_time'].isoformat()
+    return values
+
+
+def _write_archive(path, rows, file_format):
+    """
+    流式写入gzip压缩的归档文件（先写临时文件，写完后原子替换，避免留下半个文件）
+    :return: (条数, 最小ID, 最大ID, 最早登录时间, 最晚登录时间)
+    """
+    count, min_id, max_id, start_time, end_time = 0, None, None, None, None
+    tmp_path = f'{path}.tmp'
+    with gzip.open(tmp_path, 'wt', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f) if file_format == LoginLogArchive.FORMAT_CSV else None
+        if writer:
+            writer.writerow(ARCHIVE_FIELDS)
+        for row in rows:
+            values = _serialize_row(row)
+            if writer:
+                writer.writerow(values[field] for field in ARCHIVE_FIELDS)
+            else:
+                f.write(json.dumps(values, ensure_ascii=False, separators=(',', ':')))
+                f.write('\n')
+            count += 1
+            min_id = row[0] if min_id is None else min(min_id, row[0])
+            max_id = row[0] if max_id is None else max(max_id, row[0])
+            start_time = row[4] if start_time is None else min(start_time, row[4])
+            end_time = row[4] if end_time is None else max(end_time, row[4])
+    os.replace(tmp_path, path)
+    return count, min_id, max_id, start_time, end_time
+
+
+def _file_checksum(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def purge_archived(month, max_id, chunk_size=LOGIN_LOG_ARCHIVE_CHUNK_SIZE, pause=0):
+    """
+    从热表中分批删除已归档的日志（每批按主键取chunk_size条，一条DELETE一个短事务，
+    避免长时间锁表、生成超大undo日志或拖慢主从复制）
+    :param max_id: 已归档日志的最大ID（只删除ID不超过该值的日志，迟到写入的日志留待下次归档）
+    :param pause: 每批之间的休眠秒数
+    :return: 删除条数
+    """
+    start, end = month_range(month)
+    queryset = LoginLog.objects.filter(login_time__gte=start, login_time__lt=end, id__lte=max_id)
+    deleted = 0
+    while True:
+        ids = list(queryset.order_by('id').values_list('id', flat=True)[:chunk_size])
+        if not ids:
+            return deleted
+        deleted += LoginLog.objects.filter(id__in=ids).delete()[0]
+        if pause:
+            time.sleep(pause)
+
+
+def archive_month(month, file_format=LoginLogArchive.FORMAT_NDJSON, chunk_size=LOGIN_LOG_ARCHIVE_CHUNK_SIZE, pause=0):
+    """
+    归档一个已关闭月份的登录日志：
+    1. 先删除该月已归档（ID不超过已有归档max_id）但上次未删完的日志（中断后重跑可续做）；
+    2. 按主键顺序分块读取剩余日志，流式写入gzip压缩文件并登记归档目录；
+    3. 分批从热表删除已写入文件的日志
+    :return: (新建的LoginLogArchive或None, 删除条数)
+    """
+    month = month.replace(day=1)
+    if month >= retention_cutoff(1):
+        raise ValueError(f'{month:%Y-%m} 尚未结束，不能归档')
+    start, end = month_range(month)
+
+    deleted = 0
+    archived_max_id = (
+        LoginLogArchive.objects.filter(month=month).order_by('-max_id').values_list('max_id', flat=True).first()
+    )
+    if archived_max_id is not None:
+        deleted += purge_archived(month, archived_max_id, chunk_size, pause)
+
+    queryset = LoginLog.objects.filter(login_time__gte=start, login_time__lt=end)
+    if archived_max_id is not None:
+        queryset = queryset.filter(id__gt=archived_max_id)
+    # 以开始归档时的最大ID为快照上界，归档期间迟到写入的日志不进入本次文件，也不会被删除
+    snapshot_max_id = queryset.order_by('-id').values_list('id', flat=True).first()
+    if snapshot_max_id is None:
+        return None, deleted
+
+    os.makedirs(LOGIN_LOG_ARCHIVE_DIR, exist_ok=True)
+    file_path = f'login_log_{month:%Y%m}_{snapshot_max_id}.{file_format}.gz'
+    full_path = os.path.join(LOGIN_LOG_ARCHIVE_DIR, file_path)
+    rows = (
+        queryset.filter(id__lte=snapshot_max_id)
+        .order_by('id')
+        .values_list(*_QUERY_FIELDS)
+        .iterator(chunk_size=chunk_size)
+    )
+    count, min_id, max_id, start_time, end_time = _write_archive(full_path, rows, file_format)
+
+    archive = LoginLogArchive.objects.create(
+        month=month,
+        file_path=file_path,
+        file_format=file_format,
+        row_count=count,
+        min_id=min_id,
+        max_id=max_id,
+        start_time=start_time,
+        end_time=end_time,
+        file_size=os.path.getsize(full_path),
+        checksum=_file_checksum(full_path),
+    )
+    deleted += purge_archived(month, max_id, chunk_size, pause)
+    return archive, deleted
+
+
+def iter_archive(archive):
+    """逐条读取归档文件（gzip流式解压，内存占用与文件大小无关）"""
+    path = os.path.join(LOGIN_LOG_ARCHIVE_DIR, archive.file_path)
+    with gzip.open(path, 'rt', encoding='utf-8', newline='') as f:
+        if archive.file_format == LoginLogArchive.FORMAT_CSV:
+            records = csv.DictReader(f)
+        else:
+            records = (json.loads(line) for line in f if line.strip())
+        for record in records:
+            status = record['status']
+            yield ArchivedLoginLog(
+                id=int(record['id']),
+                user=ArchivedUser(int(record['user_id']), record['username']),
+                login_ip=record['login_ip'],
+                login_time=datetime.fromisoformat(record['login_time']),
+                device=record['device'] or None,
+                status=status if isinstance(status, bool) else status == 'True',
+                # 早期归档文件没有尝试次数字段
+                attempts=int(record.get('attempts') or 1),
+            )
+
+
+def parse_time_bound(value):
+    """查询参数中的日期/日期时间字符串 → 当前时区的datetime（日期取0点，与热表的字符串比较一致），非法值返回None"""
+    if not value:
+        return None
+    try:
+        parsed = parse_datetime(value)
+        if parsed is None:
+            day = parse_date(value)
+            parsed = datetime(day.year, day.month, day.day) if day else None
+    except ValueError:
+        return None
+    if parsed is not None and timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def _log_key(log):
+    return log.login_time, log.pk
+
+
+def _log_filter(start=None, end=None, username='', status=None):
+    """归档日志筛选条件（与日志查询页的筛选一致）"""
+    keyword = username.lower()
+
+    def matches(log):
+        return (
+            (start is None or log.login_time >= start)
+            and (end is None or log.login_time <= end)
+            and (not keyword or keyword in log.user.username.lower())
+            and (status is None or log.status == status)
+        )
+    return matches
+
+
+def _overlapping_archives(start=None, end=None):
+    archives = LoginLogArchive.objects.all()
+    if start is not None:
+        archives = archives.filter(end_time__gte=start)
+    if end is not None:
+        archives = archives.filter(start_time__lte=end)
+    return archives
+
+
+def iter_archived_logs(start=None, end=None, username='', status=None):
+    """逐条读取与时间范围有交集的归档文件中符合条件的日志（按归档月份、ID升序，流式，供导出使用）"""
+    matches = _log_filter(start, end, username, status)
+    for archive in _overlapping_archives(start, end).order_by('month', 'max_id'):
+        for log in iter_archive(archive):
+            if matches(log):
+                yield log
+
+
+def query_archived_logs(start=None, end=None, username='', status=None, limit=LOGIN_LOG_ARCHIVE_QUERY_LIMIT,
+                        after=None, before=None):
+    """
+    在归档文件中查询登录日志（最多limit条）：
+    只读取月份与时间范围有交集的归档文件，逐月读取，取满limit条即停止
+    :param start/end: 登录时间范围（datetime，闭区间，None表示不限）
+    :param username: 用户名（模糊匹配，不区分大小写）
+    :param status: 登录状态（True/False，None表示不限）
+    :param after: 键集游标 (登录时间, id)：只取该键之后（更早）的日志，按键倒序返回
+    :param before: 键集游标 (登录时间, id)：只取该键之前（更新）的日志，按键正序返回
+    :return: ArchivedLoginLog列表（未指定before时按键倒序）
+    """
+    archives = _overlapping_archives(start, end)
+    if after is not None:
+        archives = archives.filter(start_time__lte=after[0])
+    if before is not None:
+        archives = archives.filter(end_time__gte=before[0])
+    by_month = {}
+    for archive in archives:
+        by_month.setdefault(archive.month, []).append(archive)
+
+    matches = _log_filter(start, end, username, status)
+    # 向后翻页由近到远读取、取最新的若干条；向前翻页由远到近读取、取紧邻游标的若干条
+    select = heapq.nsmallest if before is not None else heapq.nlargest
+    result = []
+    for month in sorted(by_month, reverse=before is None):
+        remaining = limit - len(result)
+        if remaining <= 0:
+            break
+        logs = (
+            log for archive in by_month[month] for log in iter_archive(archive)
+            if matches(log)
+            and (after is None or _log_key(log) < after)
+            and (before is None or _log_key(log) > before)
+        )
+        # 同一月份可能有多个归档文件，按 (登录时间, ID) 取remaining条
+        result.extend(select(remaining, logs, key=_log_key))
+    return result
+
+
+class LoginLogPaginator(KeysetPaginator):
+    """
+    登录日志的键集分页：热表按 (login_time, id) 索引取一页，指定了归档查询条件时，
+    再从归档文件中取同一游标之后的一页，两者按键合并，每页最多读取 2 × (每页条数 + 1) 条
+    :param archive_filters: query_archived_logs的筛选参数（start/end/username/status），None表示不查询归档
+    """
+
+    def __init__(self, queryset, per_page, archive_filters=None):
+        super().__init__(queryset, per_page, field='login_time')
+        self.archive_filters = archive_filters
+
+    def fetch(self, after=None, before=None, limit=None):
+        rows = super().fetch(after, before, limit)
+        if self.archive_filters is None:
+            return rows
+        archived = query_archived_logs(**self.archive_filters, limit=limit, after=after, before=before)
+        if not archived:
+            return rows
+        return sorted([*rows, *archived], key=_log_key, reverse=before is None)[:limit]
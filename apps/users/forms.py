@@ -263,4 +263,16 @@ class UserPasswordResetForm(forms.Form):
         old_password = cleaned_data.get('old_password')
         if new_password and old_password and new_password == old_password:
             raise forms.ValidationError('新密码不能与原密码一致，请更换新密码')
-        return cleaned_data
\ No newline at end of file
+        return cleaned_data
+
+
+# 7.5 异步登录表单：跳过表单内的密码哈希校验，由异步视图在密码哈希线程池中校验（见hashing.py）
+class AsyncUserLoginForm(UserLoginForm):
+    def clean(self):
+        return super(UserLoginForm, self).clean()
+
+
+# 7.6 异步密码重置表单：跳过原密码的哈希校验，由异步视图在密码哈希线程池中校验
+class AsyncUserPasswordResetForm(UserPasswordResetForm):
+    def clean_old_password(self):
+        return self.cleaned_data.get('old_password')
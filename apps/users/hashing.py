@@ -0,0 +1,150 @@
+# apps/users/hashing.py
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+
+# 密码哈希线程池大小（同时计算哈希的请求数上限，默认不超过CPU核数），可在settings中覆盖
+PASSWORD_HASH_WORKERS = getattr(settings, 'PASSWORD_HASH_WORKERS', min(4, os.cpu_count() or 1))
+# 排队上限：超过「线程数 + 排队数」的请求等待空位，等待超时后拒绝
+PASSWORD_HASH_QUEUE_SIZE = getattr(settings, 'PASSWORD_HASH_QUEUE_SIZE', PASSWORD_HASH_WORKERS * 8)
+# 等待空位的最长时间（秒）
+PASSWORD_HASH_TIMEOUT = getattr(settings, 'PASSWORD_HASH_TIMEOUT', 5.0)
+
+
+class PasswordHashBusy(Exception):
+    """密码哈希排队超时（登录/改密请求过多）"""
+
+
+class BoundedHashExecutor:
+    """
+    有界的密码哈希执行器：哈希在独立的线程池中计算，不占用事件循环与其他请求的线程；
+    同时在执行或排队的任务数不超过 workers + queue_size，超出的请求异步等待空位，超时抛出PasswordHashBusy
+    使用线程池而不是进程池：PBKDF2（hashlib/OpenSSL）、bcrypt、argon2 计算期间均释放GIL，
+    线程即可并行利用多核，且无需在子进程中初始化Django、序列化用户对象
+    """
+
+    def __init__(self, workers=PASSWORD_HASH_WORKERS, queue_size=PASSWORD_HASH_QUEUE_SIZE,
+                 timeout=PASSWORD_HASH_TIMEOUT):
+        self.workers = workers
+        self.capacity = workers + queue_size
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(self.capacity)
+        self._executor = None
+        self._lock = threading.Lock()
+        self.completed = 0
+        self.rejected = 0
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='password-hash')
+        return self._executor
+
+    def _done(self, future):
+        self._slots.release()
+        with self._lock:
+            self.completed += 1
+
+    async def run(self, fn, *args):
+        """
+        在线程池中执行fn(*args)并等待结果
+        等待空位时只让出事件循环（不阻塞线程）；任务提交后即使调用方被取消，也在任务结束时才释放空位
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+        delay = 0.001
+        while not self._slots.acquire(blocking=False):
+            if loop.time() >= deadline:
+                with self._lock:
+                    self.rejected += 1
+                raise PasswordHashBusy(f'密码哈希排队超过{self.timeout}秒')
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.05)
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(self._done)
+        return await asyncio.wrap_future(future)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'capacity': self.capacity,
+                'completed': self.completed,
+                'rejected': self.rejected,
+            }
+
+
+password_hash_executor = BoundedHashExecutor()
+
+
+async def acheck_password(user, raw_password):
+    """
+    异步校验密码（哈希在线程池中计算）
+    密码正确但哈希需要升级（算法或迭代次数已调整）时，同样在线程池中重新哈希后保存
+    """
+    needs_update = []
+    correct = await password_hash_executor.run(check_password, raw_password, user.password, needs_update.append)
+    if correct and needs_update:
+        await aset_password(user, raw_password)
+    return correct
+
+
+async def aset_password(user, raw_password, save=True):
+    """异步设置密码（哈希在线程池中计算），与User.set_password一致，保存后触发密码校验器的password_changed"""
+    user.password = await password_hash_executor.run(make_password, raw_password)
+    user._password = raw_password
+    if save:
+        await sync_to_async(user.save)(update_fields=['password'])
+
+
+def bench_hasher(hasher, password='benchmark-password', duration=1.0, threads=1):
+    """
+    测量单个哈希算法的校验吞吐量
+    :param threads: 并行线程数（>1时测量线程池并行扩展性）
+    :return: {'summary': 参数摘要, 'verifies': 次数, 'per_second': 次/秒, 'ms_per_hash': 单次耗时（毫秒）}
+    """
+    encoded = hasher.encode(password, hasher.salt())
+    try:
+        # 工作因子参数（迭代次数、work_factor、memory_cost等），不含盐与哈希值
+        summary = {
+            key: value for key, value in hasher.decode(encoded).items()
+            if key not in ('algorithm', 'salt', 'hash', 'checksum')
+        }
+    except NotImplementedError:
+        summary = {}
+    counts = [0] * threads
+
+    def worker(index, deadline):
+        while time.perf_counter() < deadline:
+            hasher.verify(password, encoded)
+            counts[index] += 1
+
+    # 预热一次（加载依赖库、初始化）
+    hasher.verify(password, encoded)
+    start = time.perf_counter()
+    deadline = start + duration
+    if threads == 1:
+        worker(0, deadline)
+    else:
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            for index in range(threads):
+                executor.submit(worker, index, deadline)
+    elapsed = time.perf_counter() - start
+    total = sum(counts)
+    return {
+        'summary': summary,
+        'verifies': total,
+        'per_second': total / elapsed if elapsed else 0,
+        'ms_per_hash': elapsed * 1000 * threads / total if total else None,
+    }
@@ -0,0 +1,167 @@
+# apps/users/login_log.py
+import hashlib
+import logging
+import threading
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+
+from apps.rbac.writers import BufferedBulkWriter
+from .models import LoginLog
+from .throttling import counter_store
+
+# 后台批量写入参数：每批条数、最长写入间隔（秒）、队列容量，可在settings中覆盖
+LOGIN_LOG_BATCH_SIZE = getattr(settings, 'LOGIN_LOG_BATCH_SIZE', 200)
+LOGIN_LOG_FLUSH_INTERVAL = getattr(settings, 'LOGIN_LOG_FLUSH_INTERVAL', 1.0)
+LOGIN_LOG_QUEUE_SIZE = getattr(settings, 'LOGIN_LOG_QUEUE_SIZE', 10000)
+# 队列已满时等待空位的最长时间（秒），超时后在登录请求中直接写入（背压，日志不丢失）
+LOGIN_LOG_PUT_TIMEOUT = getattr(settings, 'LOGIN_LOG_PUT_TIMEOUT', 0.05)
+# 登录失败合并窗口（秒）：同一用户、同一IP在同一窗口（按时间对齐的固定窗口）内的失败只写一条记录，累加尝试次数
+LOGIN_FAILURE_MERGE_WINDOW = getattr(settings, 'LOGIN_FAILURE_MERGE_WINDOW', 900)
+# 合并记录尚未写入（其他worker的写入器还未落库）时，累加的尝试次数最多保留的写入周期数，超过后丢弃并记录日志
+LOGIN_FAILURE_MERGE_RETRIES = getattr(settings, 'LOGIN_FAILURE_MERGE_RETRIES', 10)
+# 合并窗口内失败次数的计数键模板（共享计数存储，第一次失败的请求负责写入记录）
+FAILURE_LOG_KEY = 'login:failure_log:{user_id}:{ip}:{window}'
+
+logger = logging.getLogger(__name__)
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def failure_window(now, window=None):
+    """时间所在的合并窗口：(窗口序号, 窗口开始时间)"""
+    window = window or LOGIN_FAILURE_MERGE_WINDOW
+    number = int(now.timestamp() // window)
+    return number, datetime.fromtimestamp(number * window, tz=dt_timezone.utc)
+
+
+class FailureAttemptMerger:
+    """
+    合并窗口内后续失败的尝试次数：请求中只在进程内累加（不访问数据库），
+    由登录日志写入线程每个写入周期批量累加到对应记录（一条UPDATE），撞库期间不再在请求中争抢同一行的行锁
+    """
+
+    def __init__(self, max_retries=LOGIN_FAILURE_MERGE_RETRIES):
+        self.max_retries = max_retries
+        self.dropped = 0
+        # {(user_id, login_ip, 窗口开始时间): [待累加次数, 已重试周期数]}
+        self._pending = {}
+        # 已定位的合并记录ID：{(user_id, login_ip, 窗口开始时间): 日志ID}
+        self._log_ids = {}
+        self._lock = threading.Lock()
+
+    def add(self, user_id, login_ip, window_start):
+        with self._lock:
+            self._pending.setdefault((user_id, login_ip, window_start), [0, 0])[0] += 1
+
+    def _locate(self, keys):
+        """定位各窗口的合并记录（窗口内最早的一条失败记录）"""
+        window = timedelta(seconds=LOGIN_FAILURE_MERGE_WINDOW)
+        for key in keys:
+            if key in self._log_ids:
+                continue
+            user_id, login_ip, window_start = key
+            log_id = (
+                LoginLog.objects
+                .filter(user_id=user_id, login_ip=login_ip, status=False,
+                        login_time__gte=window_start, login_time__lt=window_start + window)
+                .order_by('id').values_list('id', flat=True).first()
+            )
+            if log_id is not None:
+                self._log_ids[key] = log_id
+
+    def apply(self):
+        """将累加的尝试次数批量写入合并记录（写入线程中调用）"""
+        with self._lock:
+            items, self._pending = self._pending, {}
+        # 丢弃已结束窗口的记录ID缓存
+        expired = timezone.now() - timedelta(seconds=LOGIN_FAILURE_MERGE_WINDOW * 2)
+        self._log_ids = {key: log_id for key, log_id in self._log_ids.items() if key[2] >= expired}
+        if not items:
+            return
+        self._locate(items)
+        increments = {self._log_ids[key]: item[0] for key, item in items.items() if key in self._log_ids}
+        if increments:
+            LoginLog.objects.filter(pk__in=increments).update(attempts=F('attempts') + Case(
+                *[When(pk=log_id, then=Value(n)) for log_id, n in increments.items()],
+                default=Value(0), output_field=IntegerField(),
+            ))
+        # 合并记录尚未落库（其他worker的写入器还未写入）：下个周期重试
+        retry = {key: item for key, item in items.items() if key not in self._log_ids}
+        with self._lock:
+            for key, (attempts, retries) in retry.items():
+                if retries >= self.max_retries:
+                    self.dropped += attempts
+                    logger.warning('登录失败合并记录不存在，丢弃%d次尝试计数', attempts)
+                    continue
+                item = self._pending.setdefault(key, [0, retries + 1])
+                item[0] += attempts
+
+
+failure_merger = FailureAttemptMerger()
+
+
+def get_login_log_writer():
+    """获取进程内唯一的登录日志写入器（首次使用时创建）"""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = BufferedBulkWriter(
+                    LoginLog,
+                    batch_size=LOGIN_LOG_BATCH_SIZE,
+                    flush_interval=LOGIN_LOG_FLUSH_INTERVAL,
+                    max_queue_size=LOGIN_LOG_QUEUE_SIZE,
+                    name='login-log-writer',
+                    overflow=BufferedBulkWriter.OVERFLOW_BLOCK,
+                    put_timeout=LOGIN_LOG_PUT_TIMEOUT,
+                    on_flush=failure_merger.apply,
+                )
+    return _writer
+
+
+def record_login(user, login_ip, device, status, login_time=None):
+    """
+    记录一次登录（成功/失败）：默认仅入队，由后台线程批量写入，登录请求不再等待单行INSERT；
+    settings.LOGIN_LOG_SYNC=True时同步写入（测试环境使用，写入后可立即查询到日志）
+    """
+    fields = {
+        'user_id': user.pk,
+        'login_ip': login_ip,
+        'login_time': login_time or timezone.now(),
+        'device': device,
+        'status': status,
+    }
+    if getattr(settings, 'LOGIN_LOG_SYNC', False):
+        LoginLog.objects.create(**fields)
+        return
+    get_login_log_writer().put(**fields)
+
+
+def flush_login_logs():
+    """立即写入队列中的登录日志（管理命令、测试或查询前需要完整数据时使用）"""
+    if _writer is not None:
+        _writer.flush()
+
+
+def record_login_failure(user, login_ip, device):
+    """
+    记录一次登录失败：在共享计数存储中计数同一用户、同一IP在当前合并窗口内的失败次数，
+    窗口内第一次失败写入一条记录（与成功日志一样入队批量写入），后续失败只在进程内累加，
+    由写入线程批量累加到该记录的尝试次数；撞库等连续失败因此只产生少量记录，且不在请求中执行UPDATE
+    """
+    now = timezone.now()
+    if LOGIN_FAILURE_MERGE_WINDOW <= 0:
+        record_login(user, login_ip, device, status=False, login_time=now)
+        return
+    number, window_start = failure_window(now)
+    key = FAILURE_LOG_KEY.format(user_id=user.pk, ip=hashlib.md5(login_ip.encode()).hexdigest(), window=number)
+    if counter_store.incr(key, LOGIN_FAILURE_MERGE_WINDOW * 2) == 1:
+        record_login(user, login_ip, device, status=False, login_time=now)
+        return
+    failure_merger.add(user.pk, login_ip, window_start)
+    if getattr(settings, 'LOGIN_LOG_SYNC', False):
+        failure_merger.apply()
@@ -0,0 +1,47 @@
+# apps/users/management/commands/benchmark_hashers.py
+from django.contrib.auth.hashers import get_hashers
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.users.hashing import PASSWORD_HASH_WORKERS, bench_hasher
+
+
+class Command(BaseCommand):
+    help = (
+        '测量PASSWORD_HASHERS中各哈希算法的校验吞吐量（单线程与线程池并行），'
+        '用于评估工作因子与PASSWORD_HASH_WORKERS配置'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--duration', type=float, default=1.0, help='每个算法、每种模式的测量时长（秒），默认1')
+        parser.add_argument(
+            '--threads', type=int, default=PASSWORD_HASH_WORKERS,
+            help=f'并行测量的线程数，默认{PASSWORD_HASH_WORKERS}（PASSWORD_HASH_WORKERS）',
+        )
+        parser.add_argument('--algorithm', action='append', dest='algorithms', help='只测量指定算法（可重复指定）')
+
+    def handle(self, *args, **options):
+        if options['duration'] <= 0 or options['threads'] < 1:
+            raise CommandError('--duration须大于0，--threads须不小于1')
+        hashers = get_hashers()
+        if options['algorithms']:
+            hashers = [hasher for hasher in hashers if hasher.algorithm in options['algorithms']]
+            if not hashers:
+                raise CommandError(f"PASSWORD_HASHERS中没有算法：{', '.join(options['algorithms'])}")
+
+        threads = options['threads']
+        for index, hasher in enumerate(hashers):
+            try:
+                single = bench_hasher(hasher, duration=options['duration'])
+                parallel = bench_hasher(hasher, duration=options['duration'], threads=threads) if threads > 1 else single
+            except ValueError as e:
+                # 依赖库未安装（如bcrypt、argon2-cffi）
+                self.stdout.write(self.style.WARNING(f'{hasher.algorithm}：跳过（{e}）'))
+                continue
+            params = '，'.join(f'{key}={value}' for key, value in single['summary'].items()) or '-'
+            speedup = parallel['per_second'] / single['per_second'] if single['per_second'] else 0
+            self.stdout.write(
+                f"{hasher.algorithm}{'（默认）' if index == 0 else ''}：参数 {params}；"
+                f"单次{single['ms_per_hash']:.2f}ms，单线程{single['per_second']:.1f}次/秒，"
+                f"{threads}线程{parallel['per_second']:.1f}次/秒（{speedup:.1f}倍）"
+            )
+        self.stdout.write(self.style.SUCCESS('测量完成：默认算法的并行吞吐量即每个进程每秒可处理的登录/改密上限'))
@@ -0,0 +1,84 @@
+# apps/users/management/commands/login_log_archive.py
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+
+from apps.users.archive import (
+    LOGIN_LOG_ARCHIVE_CHUNK_SIZE,
+    LOGIN_LOG_ARCHIVE_DIR,
+    LOGIN_LOG_RETENTION_MONTHS,
+    archivable_months,
+    archive_month,
+    month_range,
+    retention_cutoff,
+)
+from apps.users.models import LoginLog, LoginLogArchive
+from apps.users.stats import rollup_login_stats
+
+
+class Command(BaseCommand):
+    help = '将热表中已关闭月份的登录日志归档为gzip压缩文件（NDJSON/CSV），并分批从热表删除'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--keep-months', type=int, default=LOGIN_LOG_RETENTION_MONTHS,
+            help=f'热表保留的月数（含当月），默认{LOGIN_LOG_RETENTION_MONTHS}',
+        )
+        parser.add_argument(
+            '--month', action='append', dest='months',
+            help='只归档指定月份（YYYY-MM，可重复指定；必须是已结束的月份）',
+        )
+        parser.add_argument(
+            '--format', dest='file_format', default=LoginLogArchive.FORMAT_NDJSON,
+            choices=[choice for choice, _ in LoginLogArchive.FORMAT_CHOICES], help='归档文件格式，默认ndjson',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=LOGIN_LOG_ARCHIVE_CHUNK_SIZE,
+            help=f'读取/删除每批条数，默认{LOGIN_LOG_ARCHIVE_CHUNK_SIZE}',
+        )
+        parser.add_argument('--pause', type=float, default=0, help='每批删除之间的休眠秒数（降低对线上库的压力）')
+        parser.add_argument('--dry-run', action='store_true', help='仅列出待归档的月份与条数，不写文件、不删除')
+
+    def handle(self, *args, **options):
+        if options['months']:
+            try:
+                months = sorted({datetime.strptime(value, '%Y-%m').date() for value in options['months']})
+            except ValueError as e:
+                raise CommandError(f'月份格式应为YYYY-MM：{e}')
+            current = retention_cutoff(1)
+            if any(month >= current for month in months):
+                raise CommandError('只能归档已结束的月份')
+        else:
+            months = archivable_months(options['keep_months'])
+
+        if not months:
+            self.stdout.write('没有需要归档的月份')
+            return
+
+        if not options['dry_run']:
+            # 归档会从热表删除日志，先把尚未汇总的日志计入登录统计
+            rollup_login_stats()
+
+        for month in months:
+            start, end = month_range(month)
+            if options['dry_run']:
+                count = LoginLog.objects.filter(login_time__gte=start, login_time__lt=end).aggregate(n=Count('id'))['n']
+                self.stdout.write(f'{month:%Y-%m}：{count}条待归档')
+                continue
+            try:
+                archive, deleted = archive_month(month, options['file_format'], options['chunk_size'], options['pause'])
+            except ValueError as e:
+                raise CommandError(str(e))
+            if archive is None:
+                self.stdout.write(f'{month:%Y-%m}：无新日志（清理已归档残留{deleted}条）')
+                continue
+            self.stdout.write(
+                f'{month:%Y-%m}：归档{archive.row_count}条 → {archive.file_path}'
+                f'（{archive.file_size}字节），从热表删除{deleted}条'
+            )
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('dry-run：未写入文件、未删除数据'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'归档完成，文件目录：{LOGIN_LOG_ARCHIVE_DIR}'))
@@ -0,0 +1,68 @@
+# Generated by Django 4.2.17 on 2026-10-17 03:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0002_user_roles"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LoginLogArchive",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("month", models.DateField(db_index=True, verbose_name="归档月份")),
+                (
+                    "file_path",
+                    models.CharField(
+                        max_length=255, unique=True, verbose_name="归档文件"
+                    ),
+                ),
+                (
+                    "file_format",
+                    models.CharField(
+                        choices=[
+                            ("ndjson", "NDJSON（gzip压缩）"),
+                            ("csv", "CSV（gzip压缩）"),
+                        ],
+                        default="ndjson",
+                        max_length=16,
+                        verbose_name="文件格式",
+                    ),
+                ),
+                (
+                    "row_count",
+                    models.PositiveIntegerField(default=0, verbose_name="日志条数"),
+                ),
+                ("min_id", models.BigIntegerField(verbose_name="最小日志ID")),
+                ("max_id", models.BigIntegerField(verbose_name="最大日志ID")),
+                ("start_time", models.DateTimeField(verbose_name="最早登录时间")),
+                ("end_time", models.DateTimeField(verbose_name="最晚登录时间")),
+                (
+                    "file_size",
+                    models.BigIntegerField(default=0, verbose_name="文件大小（字节）"),
+                ),
+                ("checksum", models.CharField(max_length=64, verbose_name="文件摘要")),
+                (
+                    "create_time",
+                    models.DateTimeField(auto_now_add=True, verbose_name="归档时间"),
+                ),
+            ],
+            options={
+                "verbose_name": "登录日志归档",
+                "verbose_name_plural": "登录日志归档管理",
+                "ordering": ["-month", "-max_id"],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.17 on 2026-10-17 03:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0003_loginlogarchive"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="loginlog",
+            index=models.Index(fields=["login_time"], name="users_log_time_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="loginlog",
+            index=models.Index(
+                fields=["user", "login_time"], name="users_log_user_time_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="loginlog",
+            index=models.Index(
+                fields=["status", "login_time"], name="users_log_status_time_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,124 @@
+# Generated by Django 4.2.17 on 2026-10-17 03:56
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0004_loginlog_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LoginDailyStat",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField(verbose_name="日期")),
+                (
+                    "device",
+                    models.CharField(
+                        blank=True, default="", max_length=32, verbose_name="登录设备"
+                    ),
+                ),
+                ("status", models.BooleanField(verbose_name="登录状态")),
+                ("count", models.BigIntegerField(default=0, verbose_name="登录次数")),
+            ],
+            options={
+                "verbose_name": "登录日统计",
+                "verbose_name_plural": "登录日统计",
+                "ordering": ["-day", "device", "status"],
+            },
+        ),
+        migrations.CreateModel(
+            name="LoginStatWatermark",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "name",
+                    models.CharField(
+                        max_length=64, unique=True, verbose_name="汇总名称"
+                    ),
+                ),
+                (
+                    "last_id",
+                    models.BigIntegerField(
+                        default=0, verbose_name="已汇总的最大日志ID"
+                    ),
+                ),
+                (
+                    "update_time",
+                    models.DateTimeField(auto_now=True, verbose_name="更新时间"),
+                ),
+            ],
+            options={
+                "verbose_name": "登录统计水位线",
+                "verbose_name_plural": "登录统计水位线",
+            },
+        ),
+        migrations.CreateModel(
+            name="LoginUserDailyStat",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField(verbose_name="日期")),
+                ("status", models.BooleanField(verbose_name="登录状态")),
+                ("count", models.BigIntegerField(default=0, verbose_name="登录次数")),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="login_daily_stats",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="关联用户",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "用户登录日统计",
+                "verbose_name_plural": "用户登录日统计",
+                "ordering": ["-day", "user", "status"],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="logindailystat",
+            constraint=models.UniqueConstraint(
+                fields=("day", "device", "status"), name="users_login_daily_stat_uniq"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="loginuserdailystat",
+            index=models.Index(fields=["day"], name="users_login_user_stat_day_idx"),
+        ),
+        migrations.AddConstraint(
+            model_name="loginuserdailystat",
+            constraint=models.UniqueConstraint(
+                fields=("user", "day", "status"), name="users_login_user_stat_uniq"
+            ),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.17 on 2026-10-17 03:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0005_login_stats"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="loginlog",
+            name="attempts",
+            field=models.PositiveIntegerField(default=1, verbose_name="尝试次数"),
+        ),
+    ]
@@ -87,14 +87,182 @@ class LoginLog(models.Model):
         default=True,
         help_text='True=登录成功，False=登录失败'
     )
+    # 尝试次数：同一用户、同一IP在合并窗口内的连续登录失败合并为一条记录，成功登录恒为1
+    attempts = models.PositiveIntegerField(
+        verbose_name='尝试次数',
+        default=1
+    )
 
     # 6.3 配置模型元信息
     class Meta:
         verbose_name = '登录日志'
         verbose_name_plural = '登录日志管理'
         ordering = ['-login_time']  # 按登录时间倒序排序
+        # 日志列表按 (login_time, id) 键集分页，并常按用户/状态筛选（InnoDB二级索引隐含主键，相当于以id收尾）
+        indexes = [
+            models.Index(fields=['login_time'], name='users_log_time_idx'),
+            models.Index(fields=['user', 'login_time'], name='users_log_user_time_idx'),
+            models.Index(fields=['status', 'login_time'], name='users_log_status_time_idx'),
+        ]
 
     def __str__(self):
         # 后台显示：用户名 + 登录IP + 登录状态
         status_text = '成功' if self.status else '失败'
         return f'{self.user.username} - {self.login_ip} - {status_text}'
+
+
+# 登录日志归档目录：每个已关闭月份的登录日志转存为压缩文件后，从热表中删除，本表记录文件位置供查询时读取
+class LoginLogArchive(models.Model):
+    FORMAT_NDJSON = 'ndjson'
+    FORMAT_CSV = 'csv'
+    FORMAT_CHOICES = (
+        (FORMAT_NDJSON, 'NDJSON（gzip压缩）'),
+        (FORMAT_CSV, 'CSV（gzip压缩）'),
+    )
+
+    # 归档月份（取该月1日）
+    month = models.DateField(
+        verbose_name='归档月份',
+        db_index=True
+    )
+    # 归档文件路径（相对于LOGIN_LOG_ARCHIVE_DIR）
+    file_path = models.CharField(
+        verbose_name='归档文件',
+        max_length=255,
+        unique=True
+    )
+    file_format = models.CharField(
+        verbose_name='文件格式',
+        max_length=16,
+        choices=FORMAT_CHOICES,
+        default=FORMAT_NDJSON
+    )
+    row_count = models.PositiveIntegerField(
+        verbose_name='日志条数',
+        default=0
+    )
+    # 本次归档的日志ID范围（同一月份可多次归档，后一次只归档ID大于前一次max_id的迟到日志）
+    min_id = models.BigIntegerField(
+        verbose_name='最小日志ID'
+    )
+    max_id = models.BigIntegerField(
+        verbose_name='最大日志ID'
+    )
+    # 归档日志的登录时间范围
+    start_time = models.DateTimeField(
+        verbose_name='最早登录时间'
+    )
+    end_time = models.DateTimeField(
+        verbose_name='最晚登录时间'
+    )
+    file_size = models.BigIntegerField(
+        verbose_name='文件大小（字节）',
+        default=0
+    )
+    # 压缩文件的SHA-256摘要，用于核对归档文件是否损坏或被改动
+    checksum = models.CharField(
+        verbose_name='文件摘要',
+        max_length=64
+    )
+    create_time = models.DateTimeField(
+        verbose_name='归档时间',
+        auto_now_add=True
+    )
+
+    class Meta:
+        verbose_name = '登录日志归档'
+        verbose_name_plural = '登录日志归档管理'
+        ordering = ['-month', '-max_id']
+
+    def __str__(self):
+        return f'{self.month:%Y-%m} - {self.row_count}条'
+
+
+# 登录统计汇总表：按 (日期, 登录设备, 登录状态) 预聚合登录次数，报表/看板直接读取汇总，无需扫描登录日志表
+class LoginDailyStat(models.Model):
+    day = models.DateField(
+        verbose_name='日期'
+    )
+    # 登录设备（日志中为空时记为空字符串，便于唯一约束）
+    device = models.CharField(
+        verbose_name='登录设备',
+        max_length=32,
+        blank=True,
+        default=''
+    )
+    status = models.BooleanField(
+        verbose_name='登录状态'
+    )
+    count = models.BigIntegerField(
+        verbose_name='登录次数',
+        default=0
+    )
+
+    class Meta:
+        verbose_name = '登录日统计'
+        verbose_name_plural = '登录日统计'
+        ordering = ['-day', 'device', 'status']
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'device', 'status'], name='users_login_daily_stat_uniq'),
+        ]
+
+    def __str__(self):
+        return f'{self.day} - {self.device or "-"} - {"成功" if self.status else "失败"}：{self.count}'
+
+
+# 按用户的登录统计汇总表：(日期, 用户, 登录状态) → 登录次数
+class LoginUserDailyStat(models.Model):
+    day = models.DateField(
+        verbose_name='日期'
+    )
+    user = models.ForeignKey(
+        verbose_name='关联用户',
+        to='User',
+        on_delete=models.CASCADE,
+        related_name='login_daily_stats'
+    )
+    status = models.BooleanField(
+        verbose_name='登录状态'
+    )
+    count = models.BigIntegerField(
+        verbose_name='登录次数',
+        default=0
+    )
+
+    class Meta:
+        verbose_name = '用户登录日统计'
+        verbose_name_plural = '用户登录日统计'
+        ordering = ['-day', 'user', 'status']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'day', 'status'], name='users_login_user_stat_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['day'], name='users_login_user_stat_day_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.day} - {self.user_id} - {"成功" if self.status else "失败"}：{self.count}'
+
+
+# 登录统计汇总水位线：已汇总到的最大登录日志ID（汇总只处理ID大于水位线的新日志）
+class LoginStatWatermark(models.Model):
+    name = models.CharField(
+        verbose_name='汇总名称',
+        max_length=64,
+        unique=True
+    )
+    last_id = models.BigIntegerField(
+        verbose_name='已汇总的最大日志ID',
+        default=0
+    )
+    update_time = models.DateTimeField(
+        verbose_name='更新时间',
+        auto_now=True
+    )
+
+    class Meta:
+        verbose_name = '登录统计水位线'
+        verbose_name_plural = '登录统计水位线'
+
+    def __str__(self):
+        return f'{self.name}={self.last_id}'
@@ -0,0 +1,141 @@
+# apps/users/stats.py
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from .login_log import LOGIN_FAILURE_MERGE_WINDOW
+from .models import LoginDailyStat, LoginLog, LoginStatWatermark, LoginUserDailyStat
+
+# 每个事务汇总的日志ID跨度（事务短小，中断后从水位线续做）
+LOGIN_STAT_BATCH_SIZE = getattr(settings, 'LOGIN_STAT_BATCH_SIZE', 50000)
+# 安全延迟（秒）：只汇总登录时间早于该延迟的日志所对应的ID范围，
+# 给仍在后台队列/未提交事务中的较小ID留出写入时间，避免水位线越过尚未可见的日志
+LOGIN_STAT_SAFETY_LAG = getattr(settings, 'LOGIN_STAT_SAFETY_LAG', 60)
+# 水位线名称
+WATERMARK_NAME = 'login_daily_stat'
+
+# 两张汇总表的维度（不含日期）
+DEVICE_DIMENSIONS = ('device', 'status')
+USER_DIMENSIONS = ('user_id', 'status')
+
+
+def get_watermark():
+    """已汇总到的最大登录日志ID（未汇总过为0）"""
+    return LoginStatWatermark.objects.filter(name=WATERMARK_NAME).values_list('last_id', flat=True).first() or 0
+
+
+def _aggregate(queryset, dimensions):
+    """
+    在数据库中按 (日期, 维度...) 分组累加尝试次数（日期按当前时区截取；合并的失败记录按尝试次数计）
+    :return: {(日期, 维度值...): 次数}
+    """
+    rows = (
+        queryset.order_by()
+        .annotate(day=TruncDate('login_time'), device_key=Coalesce('device', Value('')))
+        .values_list('day', *('device_key' if field == 'device' else field for field in dimensions))
+        .annotate(n=Sum('attempts'))
+    )
+    return {tuple(row[:-1]): row[-1] for row in rows}
+
+
+def _apply_increments(model, dimensions, increments):
+    """
+    将增量累加到汇总表：读取受影响的已有行，相加后按唯一键批量upsert
+    （调用方持有水位线行锁，汇总任务串行执行，读-改-写不会丢失增量）
+    """
+    if not increments:
+        return
+    key_fields = ('day', *dimensions)
+    lookup = {
+        f'{field}__in': {key[index] for key in increments} for index, field in enumerate(key_fields)
+    }
+    existing = {
+        tuple(row[:-1]): row[-1]
+        for row in model.objects.filter(**lookup).order_by().values_list(*key_fields, 'count')
+    }
+    model.objects.bulk_create(
+        [
+            model(**dict(zip(key_fields, key)), count=existing.get(key, 0) + n)
+            for key, n in increments.items()
+        ],
+        update_conflicts=True,
+        unique_fields=key_fields,
+        update_fields=['count'],
+        batch_size=1000,
+    )
+
+
+def rollup_login_stats(batch_size=LOGIN_STAT_BATCH_SIZE, lag=LOGIN_STAT_SAFETY_LAG):
+    """
+    增量汇总登录统计：只处理ID大于水位线的新日志，按ID分段，每段一个事务
+    （锁定水位线行 → 分组计数 → 累加到汇总表 → 推进水位线），重复执行或中断后重跑都不会重复计数
+    :return: {'rows': 本次汇总的登录次数, 'watermark': 汇总后的水位线}
+    """
+    LoginStatWatermark.objects.get_or_create(name=WATERMARK_NAME)
+    # 失败记录在其合并窗口结束前仍会累加尝试次数（由写入线程批量累加），延迟再加上一个合并窗口，汇总时其次数已不再变化
+    cutoff = timezone.now() - timedelta(seconds=lag + max(LOGIN_FAILURE_MERGE_WINDOW, 0))
+    upper = LoginLog.objects.filter(login_time__lt=cutoff).order_by('-id').values_list('id', flat=True).first()
+    rows = 0
+    while True:
+        with transaction.atomic():
+            watermark = LoginStatWatermark.objects.select_for_update().get(name=WATERMARK_NAME)
+            if upper is None or watermark.last_id >= upper:
+                return {'rows': rows, 'watermark': watermark.last_id}
+            end = min(watermark.last_id + batch_size, upper)
+            logs = LoginLog.objects.filter(id__gt=watermark.last_id, id__lte=end)
+            device_increments = _aggregate(logs, DEVICE_DIMENSIONS)
+            _apply_increments(LoginDailyStat, DEVICE_DIMENSIONS, device_increments)
+            _apply_increments(LoginUserDailyStat, USER_DIMENSIONS, _aggregate(logs, USER_DIMENSIONS))
+            watermark.last_id = end
+            watermark.save(update_fields=['last_id', 'update_time'])
+            rows += sum(device_increments.values())
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _filter_stats(stats, tail, start, end, user_id):
+    """按日期范围/用户筛选汇总表与尾部日志"""
+    if start is not None:
+        stats = stats.filter(day__gte=start)
+        tail = tail.filter(login_time__gte=_day_start(start))
+    if end is not None:
+        stats = stats.filter(day__lte=end)
+        tail = tail.filter(login_time__lt=_day_start(end + timedelta(days=1)))
+    if user_id is not None:
+        stats = stats.filter(user_id=user_id)
+        tail = tail.filter(user_id=user_id)
+    return stats, tail
+
+
+def query_login_stats(start=None, end=None, by_user=False, user_id=None):
+    """
+    查询每日登录统计：水位线以内的日志读取汇总表，水位线之后尚未汇总的日志（通常只是当天的部分数据）
+    按主键范围从日志表实时分组计数，两者相加，结果与直接统计日志表一致
+    :param start/end: 日期范围（date，闭区间，None表示不限）
+    :param by_user: True按 (日期, 用户, 状态) 统计，否则按 (日期, 设备, 状态) 统计
+    :param user_id: 按用户统计时只统计该用户
+    :return: [{'day', 'device'/'user_id', 'status', 'count'}, ...]（按日期、维度升序）
+    """
+    model, dimensions = (LoginUserDailyStat, USER_DIMENSIONS) if by_user else (LoginDailyStat, DEVICE_DIMENSIONS)
+    totals = defaultdict(int)
+    # 水位线、汇总表与尾部日志在同一事务内读取（MySQL默认的可重复读隔离级别下为一致快照），
+    # 汇总任务同时推进水位线时既不会重复计数也不会漏算
+    with transaction.atomic():
+        watermark = get_watermark()
+        stats, tail = _filter_stats(model.objects.order_by(), LoginLog.objects.filter(id__gt=watermark),
+                                    start, end, user_id if by_user else None)
+        for *key, n in stats.values_list('day', *dimensions, 'count'):
+            totals[tuple(key)] += n
+        for key, n in _aggregate(tail, dimensions).items():
+            totals[key] += n
+    return [
+        {'day': key[0], **dict(zip(dimensions, key[1:])), 'count': n}
+        for key, n in sorted(totals.items())
+    ]
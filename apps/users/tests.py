@@ -1,3 +1,538 @@
-from django.test import TestCase
+# apps/users/tests.py
+import asyncio
+import gzip
+import json
+import os
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.messages.storage.fallback import FallbackStorage
+from django.contrib.sessions.backends.cache import SessionStore
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db.models import Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.rbac.models import Permission, Role, RowRule
+from apps.rbac.streaming import iter_rows_by_pk
+from apps.rbac.writers import BufferedBulkWriter
+from . import archive, hashing, login_log
+from .archive import (
+    LoginLogPaginator, add_months, archivable_months, archive_month, iter_archive, purge_archived,
+)
+from .forms import AsyncUserLoginForm
+from .hashing import BoundedHashExecutor, PasswordHashBusy, acheck_password, aset_password
+from .login_log import FailureAttemptMerger, flush_login_logs, record_login, record_login_failure
+from .models import LoginLog, LoginLogArchive, User
+from .stats import query_login_stats, rollup_login_stats
+from .throttling import (
+    CounterStore, SlidingWindowCounter, account_counter, check_login_attempt, get_throttle_ip,
+    ip_counter, record_failed_attempt, reset_login_failures,
+)
+from .views import AsyncUserLoginView
+
+
+class BrokenCache:
+    """模拟不可用的共享缓存（所有操作抛出异常）"""
+
+    def __getattr__(self, name):
+        def fail(*args, **kwargs):
+            raise ConnectionError('cache unavailable')
+        return fail
+
+
+def create_user(username='alice', phone='13800000000', **extra):
+    return User.objects.create_user(username=username, phone=phone, password='secret123', **extra)
+
+
+# 1. 登录日志：批量写入与登录失败合并
+class LoginLogWriterTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.merger = FailureAttemptMerger(max_retries=1)
+        # 不启动后台线程（其独立数据库连接看不到测试事务内的数据）：由flush_login_logs()在当前线程写入
+        self.writer = BufferedBulkWriter(
+            LoginLog, max_queue_size=2, name='test-login-log-writer',
+            overflow=BufferedBulkWriter.OVERFLOW_BLOCK, put_timeout=0, on_flush=self.merger.apply,
+        )
+        self.writer._ensure_started = lambda: None
+        for patcher in (
+            mock.patch.object(login_log, '_writer', self.writer),
+            mock.patch.object(login_log, 'failure_merger', self.merger),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.user = create_user()
+
+    def test_logs_queued_until_flush(self):
+        record_login(self.user, '10.0.0.1', 'PC', status=True)
+        record_login(self.user, '10.0.0.1', 'PC', status=True)
+        self.assertFalse(LoginLog.objects.exists())
+        flush_login_logs()
+        self.assertEqual(LoginLog.objects.count(), 2)
+        self.assertEqual(self.writer.stats(), {'written': 2, 'inline_written': 0, 'dropped': 0, 'pending': 0})
+
+    def test_full_queue_writes_inline(self):
+        for _ in range(3):
+            record_login(self.user, '10.0.0.1', 'PC', status=True)
+        # 队列已满时在调用线程中直接写入（背压），日志不丢失
+        self.assertEqual(LoginLog.objects.count(), 1)
+        flush_login_logs()
+        self.assertEqual(LoginLog.objects.count(), 3)
+        self.assertEqual(self.writer.stats()['inline_written'], 1)
+
+    def test_failures_in_window_merged_on_flush(self):
+        for _ in range(4):
+            record_login_failure(self.user, '10.0.0.1', 'PC')
+        record_login_failure(self.user, '10.0.0.2', 'PC')
+        flush_login_logs()
+        self.assertEqual(
+            sorted(LoginLog.objects.values_list('login_ip', 'status', 'attempts')),
+            [('10.0.0.1', False, 4), ('10.0.0.2', False, 1)],
+        )
+
+    @override_settings(LOGIN_LOG_SYNC=True)
+    def test_sync_mode_merges_immediately(self):
+        for _ in range(3):
+            record_login_failure(self.user, '10.0.0.1', 'PC')
+        self.assertEqual(list(LoginLog.objects.values_list('attempts', flat=True)), [3])
+
+    @override_settings(LOGIN_LOG_SYNC=True)
+    def test_missing_merge_log_dropped_after_retries(self):
+        record_login_failure(self.user, '10.0.0.1', 'PC')
+        LoginLog.objects.all().delete()
+        record_login_failure(self.user, '10.0.0.1', 'PC')
+        with self.assertLogs(login_log.logger, 'WARNING'):
+            self.merger.apply()
+        self.assertEqual(self.merger.dropped, 1)
+        self.assertFalse(LoginLog.objects.exists())
+
+
+# 2. 登录日志归档：已关闭月份写入压缩文件并分批删除
+class LoginLogArchiveTests(TestCase):
+
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        patcher = mock.patch.object(archive, 'LOGIN_LOG_ARCHIVE_DIR', tmp_dir.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = create_user()
+        self.month = add_months(timezone.localdate().replace(day=1), -5)
+        self.old_logs = [self.create_log(day, status=day != 10) for day in (3, 10, 20)]
+        self.recent_log = self.create_log(timezone.localdate().day, month=timezone.localdate())
+
+    def create_log(self, day, month=None, status=True):
+        month = month or self.month
+        login_time = timezone.make_aware(datetime(month.year, month.month, day, 8))
+        return LoginLog.objects.create(
+            user=self.user, login_ip='10.0.0.1', device='PC', status=status, attempts=1 if status else 3,
+            login_time=login_time,
+        )
+
+    def test_archive_and_read_back(self):
+        self.assertEqual(archivable_months(), [self.month])
+        for file_format in (LoginLogArchive.FORMAT_NDJSON, LoginLogArchive.FORMAT_CSV):
+            with self.subTest(file_format):
+                logs = self.old_logs if file_format == 'ndjson' else [self.create_log(5), self.create_log(6, status=False)]
+                record, deleted = archive_month(self.month, file_format)
+                self.assertEqual((record.row_count, deleted), (len(logs), len(logs)))
+                self.assertEqual((record.min_id, record.max_id), (logs[0].pk, logs[-1].pk))
+                self.assertTrue(os.path.exists(os.path.join(archive.LOGIN_LOG_ARCHIVE_DIR, record.file_path)))
+                self.assertEqual(
+                    [(log.pk, log.user.username, log.login_time, log.status, log.attempts) for log in iter_archive(record)],
+                    [(log.pk, 'alice', log.login_time, log.status, log.attempts) for log in logs],
+                )
+        self.assertEqual(list(LoginLog.objects.all()), [self.recent_log])
+
+    def test_open_month_rejected(self):
+        with self.assertRaises(ValueError):
+            archive_month(timezone.localdate())
+
+    def test_interrupted_purge_resumed(self):
+        with mock.patch.object(archive, 'purge_archived', return_value=0):
+            record, deleted = archive_month(self.month)
+        self.assertEqual((record.row_count, deleted, LoginLog.objects.count()), (3, 0, 4))
+        # 中断后迟到写入的日志不在已有归档中：重跑时先删完已归档的日志，再单独归档新日志
+        late_log = self.create_log(25)
+        record, deleted = archive_month(self.month)
+        self.assertEqual((record.row_count, record.min_id, deleted), (1, late_log.pk, 4))
+        self.assertEqual(archive_month(self.month), (None, 0))
+        self.assertEqual(LoginLogArchive.objects.count(), 2)
+
+    def test_purge_in_chunks(self):
+        self.assertEqual(purge_archived(self.month, self.old_logs[1].pk, chunk_size=1), 2)
+        self.assertEqual(list(LoginLog.objects.order_by('id')), [self.old_logs[2], self.recent_log])
+
+
+# 3. 登录日志键集分页：热表与归档文件按 (login_time, id) 合并
+class LoginLogPaginationTests(TestCase):
+
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        patcher = mock.patch.object(archive, 'LOGIN_LOG_ARCHIVE_DIR', tmp_dir.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.alice = create_user()
+        self.bob = create_user('bob', '13800000001')
+        month = add_months(timezone.localdate().replace(day=1), -5)
+        self.start = timezone.make_aware(datetime(month.year, month.month, 1))
+        for day in range(1, 6):
+            # 同一时间的两条日志须按ID区分先后
+            login_time = timezone.make_aware(datetime(month.year, month.month, min(day, 4), 8))
+            self.create_log(self.alice if day % 2 else self.bob, login_time)
+        archive_month(month)
+        now = timezone.now()
+        for hours in range(3):
+            self.create_log(self.alice, now - timedelta(hours=hours), status=bool(hours))
+        self.expected = sorted(
+            [(log.login_time, log.pk) for log in LoginLog.objects.all()]
+            + [(log.login_time, log.pk) for record in LoginLogArchive.objects.all() for log in iter_archive(record)],
+            reverse=True,
+        )
+
+    def create_log(self, user, login_time, status=True):
+        return LoginLog.objects.create(user=user, login_ip='10.0.0.1', device='PC', status=status, login_time=login_time)
+
+    def paginator(self, username=''):
+        archive_filters = {'start': self.start, 'end': None, 'username': username, 'status': None}
+        return LoginLogPaginator(LoginLog.objects.filter(user__username__icontains=username), 3, archive_filters)
+
+    def walk(self, paginator):
+        pages = [paginator.page()]
+        while pages[-1].has_next():
+            pages.append(paginator.page(after=pages[-1].next_cursor))
+        return pages
+
+    def test_walk_spans_hot_and_archived_rows(self):
+        pages = self.walk(self.paginator())
+        self.assertEqual([(log.login_time, log.pk) for page in pages for log in page], self.expected)
+        self.assertEqual([len(page) for page in pages], [3, 3, 2])
+        self.assertTrue(all(getattr(log, 'archived', False) for log in pages[-1]))
+
+    def test_backward_walk(self):
+        paginator = self.paginator()
+        pages = self.walk(paginator)
+        previous = paginator.page(before=pages[2].previous_cursor)
+        self.assertEqual([log.pk for log in previous], [log.pk for log in pages[1]])
+        first = paginator.page(before=previous.previous_cursor)
+        self.assertEqual([log.pk for log in first], [log.pk for log in pages[0]])
+        self.assertFalse(first.has_previous())
+
+    def test_archive_filters(self):
+        pages = self.walk(self.paginator(username='BOB'))
+        self.assertEqual({log.user.username for page in pages for log in page}, {'bob'})
+        self.assertEqual(sum(len(page) for page in pages), 2)
+        # 未指定时间范围时只查询热表
+        hot_only = self.walk(LoginLogPaginator(LoginLog.objects.all(), 3))
+        self.assertEqual([len(page) for page in hot_only], [3])
+
+    def test_query_view(self):
+        self.client.force_login(create_user('root', '13800000002', is_superuser=True))
+        url = reverse('users:login_log_list')
+        response = self.client.get(url, {'start_time': self.start.isoformat(), 'status': 'True'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['include_archives'])
+        # 热表2条成功日志 + 归档5条
+        self.assertEqual(len(response.context['login_logs']), 7)
+        self.assertFalse(response.context['page_obj'].has_next())
+        self.assertFalse(self.client.get(url).context['include_archives'])
+        self.assertEqual(self.client.get(url, {'after': 'not-a-cursor'}).status_code, 404)
+
+
+# 4. 流式导出：用户列表（行级规则过滤）与登录日志（热表 + 归档）
+class StreamingExportTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        patcher = mock.patch.object(archive, 'LOGIN_LOG_ARCHIVE_DIR', tmp_dir.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.users = [create_user(f'user{i}', f'1380000000{i}') for i in range(3)]
+        self.root = create_user('root', '13800000009', is_superuser=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.root)
+
+    def export_users(self, **params):
+        return self.client.get(reverse('users:user-export'), params)
+
+    def test_iter_rows_by_pk(self):
+        rows = list(iter_rows_by_pk(User.objects.all(), ('id', 'username'), chunk_size=2))
+        self.assertEqual(rows, list(User.objects.order_by('pk').values_list('id', 'username')))
+
+    def test_user_export_csv(self):
+        response = self.export_users(format='csv')
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('filename="users.csv"', response['Content-Disposition'])
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], '用户ID,用户名,手机号,邮箱,是否启用')
+        self.assertEqual(lines[1], f'{self.users[0].pk},user0,13800000000,,True')
+        self.assertEqual(len(lines), 5)
+
+    def test_user_export_ndjson_gzip(self):
+        response = self.export_users(format='ndjson', gzip='1')
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertIn('filename="users.ndjson.gz"', response['Content-Disposition'])
+        rows = [json.loads(line) for line in gzip.decompress(b''.join(response.streaming_content)).splitlines()]
+        self.assertEqual([row['username'] for row in rows], ['user0', 'user1', 'user2', 'root'])
+        self.assertEqual(set(rows[0]), {'id', 'username', 'phone', 'email', 'is_active'})
+
+    def test_user_export_applies_row_rules(self):
+        role = Role.objects.create(role_name='viewer')
+        with self.captureOnCommitCallbacks(execute=True):
+            role.permissions.add(Permission.objects.create(permission_name='user_view', permission_code='user_view'))
+            RowRule.objects.create(role=role, model_label='users.User', scope=RowRule.SCOPE_SELF)
+            self.users[1].roles.add(role)
+        self.client.force_authenticate(self.users[1])
+        response = self.export_users(format='ndjson')
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual([row['username'] for row in rows], ['user1'])
+
+    def test_login_log_export_includes_archives(self):
+        month = add_months(timezone.localdate().replace(day=1), -5)
+        archived_time = timezone.make_aware(datetime(month.year, month.month, 2, 8))
+        archived = LoginLog.objects.create(
+            user=self.users[0], login_ip='10.0.0.1', status=True, login_time=archived_time,
+        )
+        archive_month(month)
+        hot = LoginLog.objects.create(user=self.users[1], login_ip='10.0.0.2', device='PC', status=False, attempts=3)
+        self.client.force_login(self.root)
+        url = reverse('users:login_log_export')
+
+        response = self.client.get(url, {'format': 'ndjson'})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual([(row['id'], row['username'], row['attempts']) for row in rows], [(hot.pk, 'user1', 3)])
+
+        response = self.client.get(url, {'start_time': archived_time.replace(day=1).isoformat(), 'gzip': '1'})
+        self.assertIn('filename="login_logs.csv.gz"', response['Content-Disposition'])
+        lines = gzip.decompress(b''.join(response.streaming_content)).decode().splitlines()
+        self.assertEqual(lines[0], '日志ID,用户ID,用户名,登录IP,登录设备,登录状态,尝试次数,登录时间')
+        self.assertEqual([line.split(',')[:3] for line in lines[1:]], [
+            [str(hot.pk), str(self.users[1].pk), 'user1'],
+            [str(archived.pk), str(self.users[0].pk), 'user0'],
+        ])
+
+
+# 5. 每日登录统计：增量汇总与直接统计日志表一致
+@override_settings(LOGIN_LOG_SYNC=True)
+class LoginStatsTests(TestCase):
+
+    def setUp(self):
+        self.users = [create_user(f'user{i}', f'1380000000{i}') for i in range(2)]
+        self.now = timezone.now()
+
+    def create_logs(self, days_ago):
+        for days in days_ago:
+            for index, user in enumerate(self.users):
+                login_time = self.now - timedelta(days=days, hours=index)
+                record_login(user, '10.0.0.1', 'PC' if index else None, status=True, login_time=login_time)
+                LoginLog.objects.create(
+                    user=user, login_ip='10.0.0.2', device='iOS', status=False, attempts=3, login_time=login_time,
+                )
+
+    def raw_stats(self, dimension):
+        rows = (
+            LoginLog.objects.order_by()
+            .annotate(day=TruncDate('login_time'), device_key=Coalesce('device', Value('')))
+            .values_list('day', dimension, 'status')
+            .annotate(n=Sum('attempts'))
+        )
+        return sorted(rows)
+
+    def query(self, **kwargs):
+        key = 'user_id' if kwargs.get('by_user') else 'device'
+        return sorted((row['day'], row[key], row['status'], row['count']) for row in query_login_stats(**kwargs))
+
+    def assertMatchesRaw(self):
+        self.assertEqual(self.query(), self.raw_stats('device_key'))
+        self.assertEqual(self.query(by_user=True), self.raw_stats('user_id'))
+
+    def test_rollup_matches_raw_query(self):
+        self.create_logs([3, 2])
+        result = rollup_login_stats(lag=0)
+        self.assertEqual(result['rows'], 2 * 2 * (1 + 3))
+        self.assertEqual(result['watermark'], LoginLog.objects.order_by('-id').values_list('id', flat=True)[0])
+        self.assertMatchesRaw()
+
+    def test_tail_added_after_rollup(self):
+        self.create_logs([3])
+        rollup_login_stats(lag=0)
+        # 汇总后新增的日志（含当前合并窗口内、尚不能汇总的日志）由查询实时补齐
+        self.create_logs([3, 1, 0])
+        self.assertMatchesRaw()
+        rollup_login_stats(lag=0)
+        self.assertMatchesRaw()
+
+    def test_rollup_is_idempotent(self):
+        self.create_logs([2])
+        first = rollup_login_stats(lag=0)
+        self.assertEqual(rollup_login_stats(lag=0), {'rows': 0, 'watermark': first['watermark']})
+        self.assertMatchesRaw()
+
+    def test_query_filters(self):
+        self.create_logs([3, 2, 1])
+        rollup_login_stats(lag=0, batch_size=2)
+        day = timezone.localdate(self.now - timedelta(days=2))
+        user_id = self.users[1].pk
+        expected = [row for row in self.raw_stats('user_id') if row[0] == day and row[1] == user_id]
+        self.assertEqual(self.query(start=day, end=day, by_user=True, user_id=user_id), expected)
+
+    def test_stats_api(self):
+        self.create_logs([2])
+        rollup_login_stats(lag=0)
+        client = APIClient()
+        client.force_authenticate(create_user('root', '13800000009', is_superuser=True))
+        url = reverse('users:login_stats_api')
+        data = client.get(url, {'by': 'user', 'user_id': self.users[0].pk}).data
+        self.assertEqual(data['by'], 'user')
+        self.assertEqual(
+            sorted((row['status'], row['count']) for row in data['results']), [(False, 3), (True, 1)]
+        )
+        for params in ({'start': '2024-13-01'}, {'start': '2024-01-02', 'end': '2024-01-01'}, {'start': '2020-01-01'}):
+            with self.subTest(params):
+                self.assertEqual(client.get(url, params).status_code, 400)
+
+
+# 6. 登录限流：滑动窗口计数、锁定与重置
+class SlidingWindowCounterTests(SimpleTestCase):
+
+    def setUp(self):
+        backend = LocMemCache('test-throttle', {})
+        backend.clear()
+        self.counter = SlidingWindowCounter('test', limit=3, window=60, store=CounterStore(backend))
+
+    def test_previous_window_weight_decays(self):
+        for _ in range(3):
+            self.counter.hit('ident', now=0)
+        self.assertEqual(self.counter.count('ident', now=30), 3)
+        self.assertEqual(self.counter.count('ident', now=60), 3)
+        self.assertEqual(self.counter.count('ident', now=90), 1.5)
+        self.assertEqual(self.counter.count('ident', now=120), 0)
+
+    def test_retry_after(self):
+        for _ in range(3):
+            self.counter.hit('ident', now=60)
+        # 当前窗口已满：等到下一窗口开始
+        self.assertEqual(self.counter.retry_after('ident', now=90), 31)
+        # 上一窗口的3次按比例衰减：到第80秒估计值降到2（上限以下）
+        self.assertEqual(self.counter.retry_after('ident', now=120), 20)
+        self.assertLess(self.counter.count('ident', now=140), self.counter.limit)
+
+    def test_reset(self):
+        for _ in range(3):
+            self.counter.hit('ident', now=10)
+        self.counter.reset('ident', now=10)
+        self.assertEqual(self.counter.count('ident', now=10), 0)
+
+    def test_falls_back_to_local_store(self):
+        counter = SlidingWindowCounter('test', limit=3, window=60, store=CounterStore(BrokenCache()))
+        self.assertEqual(counter.hit('ident', now=0), 1)
+        self.assertEqual(counter.hit('ident', now=0), 2)
+        self.assertEqual(counter.count('ident', now=0), 2)
+
+
+class LoginThrottleTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_account_lockout_and_reset(self):
+        for _ in range(account_counter.limit):
+            self.assertEqual(check_login_attempt('10.0.0.1', 'Alice'), 0)
+            record_failed_attempt('Alice')
+        # 账号按规范化后的值计数：大小写、首尾空白不同也是同一账号
+        self.assertGreater(check_login_attempt('10.0.0.2', ' alice '), 0)
+        reset_login_failures('ALICE')
+        self.assertEqual(check_login_attempt('10.0.0.3', 'alice'), 0)
+
+    def test_ip_lockout(self):
+        for _ in range(ip_counter.limit):
+            self.assertEqual(check_login_attempt('10.0.0.1', ''), 0)
+        self.assertGreater(check_login_attempt('10.0.0.1', ''), 0)
+        self.assertEqual(check_login_attempt('10.0.0.2', ''), 0)
+
+    def test_throttle_ip_ignores_untrusted_forwarded_for(self):
+        request = RequestFactory().get('/', REMOTE_ADDR='10.0.0.9', HTTP_X_FORWARDED_FOR='1.1.1.1, 2.2.2.2')
+        self.assertEqual(get_throttle_ip(request), '10.0.0.9')
+        self.assertEqual(get_throttle_ip(request, trusted_proxies=1), '2.2.2.2')
+        self.assertEqual(get_throttle_ip(request, trusted_proxies=5), '1.1.1.1')
+
+    @override_settings(LOGIN_LOG_SYNC=True)
+    def test_login_view_returns_429(self):
+        create_user()
+        data = {'account': 'alice', 'password': 'wrong', 'captcha_0': 'x', 'captcha_1': 'PASSED'}
+        for _ in range(account_counter.limit):
+            self.assertEqual(self.client.post(reverse('users:login'), data).status_code, 200)
+        response = self.client.post(reverse('users:login'), data)
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+
+
+# 7. 异步登录：有界的密码哈希线程池
+class BoundedHashExecutorTests(SimpleTestCase):
+
+    async def test_rejects_when_full(self):
+        executor = BoundedHashExecutor(workers=1, queue_size=1, timeout=0.05)
+        release = threading.Event()
+        running = [asyncio.ensure_future(executor.run(release.wait, 5)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        # 1个线程 + 1个排队位已占满：第3个请求等待超时后被拒绝
+        with self.assertRaises(PasswordHashBusy):
+            await executor.run(release.wait, 5)
+        release.set()
+        self.assertEqual(await asyncio.gather(*running), [True, True])
+        self.assertEqual(await executor.run(sum, (1, 2)), 3)
+        self.assertEqual(executor.stats(), {'workers': 1, 'capacity': 2, 'completed': 3, 'rejected': 1})
+
+    async def test_waits_for_free_slot(self):
+        executor = BoundedHashExecutor(workers=1, queue_size=0, timeout=1)
+        release = threading.Event()
+        first = asyncio.ensure_future(executor.run(release.wait, 5))
+        await asyncio.sleep(0.01)
+        second = asyncio.ensure_future(executor.run(sum, (1, 2)))
+        await asyncio.sleep(0.01)
+        self.assertFalse(second.done())
+        release.set()
+        self.assertEqual(await asyncio.gather(first, second), [True, 3])
+        self.assertEqual(executor.stats()['rejected'], 0)
+
+
+class AsyncLoginTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = create_user()
+
+    async def test_check_and_set_password(self):
+        self.assertTrue(await acheck_password(self.user, 'secret123'))
+        self.assertFalse(await acheck_password(self.user, 'wrong'))
+        await aset_password(self.user, 'changed456')
+        user = await User.objects.aget(pk=self.user.pk)
+        self.assertTrue(await acheck_password(user, 'changed456'))
+
+    async def test_busy_pool_returns_503(self):
+        request = RequestFactory().post(
+            '/users/login/', {'account': '13800000000', 'password': 'secret123', 'captcha_0': 'x', 'captcha_1': 'PASSED'},
+        )
+        request.session = SessionStore()
+        request._messages = FallbackStorage(request)
+        busy = BoundedHashExecutor(workers=1, queue_size=0, timeout=0)
+        busy._slots.acquire()
+        # 账号查询不是本用例关注点，直接返回用户，只验证哈希线程池繁忙时的响应
+        with mock.patch.object(hashing, 'password_hash_executor', busy), \
+                mock.patch.object(AsyncUserLoginForm, 'clean_account', return_value=self.user):
+            response = await AsyncUserLoginView.as_view()(request)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertEqual(busy.stats()['rejected'], 1)
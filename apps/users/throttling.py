@@ -0,0 +1,222 @@
+# apps/users/throttling.py
+import hashlib
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+# 每个IP的登录尝试次数上限：(次数, 窗口秒数)，可在settings中覆盖
+LOGIN_THROTTLE_IP_RATE = getattr(settings, 'LOGIN_THROTTLE_IP_RATE', (30, 300))
+# 每个账号的登录失败次数上限：(次数, 窗口秒数)
+LOGIN_THROTTLE_ACCOUNT_RATE = getattr(settings, 'LOGIN_THROTTLE_ACCOUNT_RATE', (5, 900))
+# 登录限流按IP计数时信任的反向代理层数：0（默认）直接使用REMOTE_ADDR；
+# N>0时取X-Forwarded-For中倒数第N个地址（由最外层可信代理追加），客户端伪造的更靠前的地址不参与计数
+LOGIN_THROTTLE_TRUSTED_PROXIES = getattr(settings, 'LOGIN_THROTTLE_TRUSTED_PROXIES', 0)
+# 进程内备用存储的最大条目数（超限时清理过期条目，仍超限则整体清空）
+LOCAL_STORE_MAX_SIZE = 10000
+
+
+class LocalStore:
+    """进程内计数存储（带过期时间），共享缓存不可用时使用"""
+
+    def __init__(self, max_size=LOCAL_STORE_MAX_SIZE):
+        self.max_size = max_size
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def _get(self, key, now):
+        item = self._data.get(key)
+        if item is None or item[1] <= now:
+            return None
+        return item[0]
+
+    def _purge(self, now):
+        if len(self._data) < self.max_size:
+            return
+        self._data = {key: item for key, item in self._data.items() if item[1] > now}
+        if len(self._data) >= self.max_size:
+            self._data.clear()
+
+    def get(self, key):
+        with self._lock:
+            return self._get(key, time.monotonic())
+
+    def get_many(self, keys):
+        now = time.monotonic()
+        with self._lock:
+            return {key: value for key in keys if (value := self._get(key, now)) is not None}
+
+    def set(self, key, value, timeout):
+        now = time.monotonic()
+        with self._lock:
+            self._purge(now)
+            self._data[key] = (value, now + timeout)
+
+    def incr(self, key, timeout):
+        now = time.monotonic()
+        with self._lock:
+            value = self._get(key, now)
+            if value is None:
+                self._purge(now)
+                self._data[key] = (1, now + timeout)
+                return 1
+            self._data[key] = (value + 1, self._data[key][1])
+            return value + 1
+
+    def delete_many(self, keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+
+class CounterStore:
+    """
+    计数存储：优先使用共享缓存（多个worker共用计数），缓存不可用（连接失败、Dummy缓存不支持incr等）时
+    改用进程内存储，限流降级为按worker计数而不是失效
+    """
+
+    def __init__(self, backend=cache):
+        self.backend = backend
+        self.local = LocalStore()
+
+    def get(self, key):
+        try:
+            return self.backend.get(key)
+        except Exception:
+            return self.local.get(key)
+
+    def get_many(self, keys):
+        try:
+            return self.backend.get_many(keys)
+        except Exception:
+            return self.local.get_many(keys)
+
+    def set(self, key, value, timeout):
+        try:
+            self.backend.set(key, value, timeout)
+        except Exception:
+            self.local.set(key, value, timeout)
+
+    def incr(self, key, timeout):
+        """计数加一并返回新值（键不存在时以timeout为过期时间新建）"""
+        try:
+            self.backend.add(key, 0, timeout)
+            return self.backend.incr(key)
+        except Exception:
+            return self.local.incr(key, timeout)
+
+    def delete_many(self, keys):
+        try:
+            self.backend.delete_many(keys)
+        except Exception:
+            pass
+        self.local.delete_many(keys)
+
+
+counter_store = CounterStore()
+
+
+class SlidingWindowCounter:
+    """
+    滑动窗口计数（两个固定窗口加权近似）：
+    估计值 = 上一窗口计数 × (1 - 当前窗口已过比例) + 当前窗口计数，
+    每个标识只占两个缓存键，每次判断一次get_many，计数一次incr
+    """
+
+    def __init__(self, scope, limit, window, store=counter_store):
+        self.scope = scope
+        self.limit = limit
+        self.window = window
+        self.store = store
+
+    def _key(self, ident, bucket):
+        # 标识来自请求（账号、X-Forwarded-For），取摘要后作为缓存键，避免非法字符与超长键
+        digest = hashlib.md5(ident.encode()).hexdigest()
+        return f'login:throttle:{self.scope}:{digest}:{bucket}'
+
+    def _state(self, ident, now):
+        bucket, offset = divmod(now, self.window)
+        bucket = int(bucket)
+        keys = (self._key(ident, bucket), self._key(ident, bucket - 1))
+        return bucket, offset / self.window, keys
+
+    def count(self, ident, now=None):
+        """当前滑动窗口内的估计次数"""
+        _, elapsed, keys = self._state(ident, time.time() if now is None else now)
+        values = self.store.get_many(keys)
+        return values.get(keys[1], 0) * (1 - elapsed) + values.get(keys[0], 0)
+
+    def hit(self, ident, now=None):
+        """计数加一，返回加一后的估计次数"""
+        now = time.time() if now is None else now
+        _, elapsed, keys = self._state(ident, now)
+        current = self.store.incr(keys[0], self.window * 2)
+        previous = self.store.get(keys[1]) or 0
+        return previous * (1 - elapsed) + current
+
+    def retry_after(self, ident, now=None):
+        """估计值降到上限以下还需等待的秒数（上一窗口的权重随时间线性衰减）"""
+        now = time.time() if now is None else now
+        _, elapsed, keys = self._state(ident, now)
+        values = self.store.get_many(keys)
+        previous, current = values.get(keys[1], 0), values.get(keys[0], 0)
+        if current >= self.limit or not previous:
+            # 当前窗口已超限：等到下一窗口开始，当前窗口的计数仍按比例计入
+            return math.ceil(self.window * (1 - elapsed)) + 1
+        needed = (previous + current - self.limit + 1) / previous
+        return max(1, math.ceil(self.window * (needed - elapsed)))
+
+    def reset(self, ident, now=None):
+        _, _, keys = self._state(ident, time.time() if now is None else now)
+        self.store.delete_many(keys)
+
+
+ip_counter = SlidingWindowCounter('ip', *LOGIN_THROTTLE_IP_RATE)
+account_counter = SlidingWindowCounter('account', *LOGIN_THROTTLE_ACCOUNT_RATE)
+
+
+def get_throttle_ip(request, trusted_proxies=LOGIN_THROTTLE_TRUSTED_PROXIES):
+    """
+    限流使用的客户端IP：X-Forwarded-For可由客户端任意填写，每次请求更换即可绕过按IP限流，
+    因此只采信可信代理追加的部分
+    """
+    remote_addr = request.META.get('REMOTE_ADDR') or '127.0.0.1'
+    if trusted_proxies <= 0:
+        return remote_addr
+    forwarded = [ip.strip() for ip in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if ip.strip()]
+    if not forwarded:
+        return remote_addr
+    return forwarded[-min(trusted_proxies, len(forwarded))]
+
+
+def normalize_account(account):
+    return (account or '').strip().lower()
+
+
+def check_login_attempt(ip, account):
+    """
+    登录尝试前置检查（不查询数据库、不计算密码哈希）：
+    计入该IP的一次尝试，IP尝试次数或账号失败次数超过上限时返回需等待的秒数，否则返回0
+    """
+    if ip_counter.hit(ip) > ip_counter.limit:
+        return ip_counter.retry_after(ip)
+    account = normalize_account(account)
+    if account and account_counter.count(account) >= account_counter.limit:
+        return account_counter.retry_after(account)
+    return 0
+
+
+def record_failed_attempt(account):
+    """登录失败：计入该账号的一次失败"""
+    account = normalize_account(account)
+    if account:
+        account_counter.hit(account)
+
+
+def reset_login_failures(account):
+    """登录成功：清除该账号的失败计数"""
+    account = normalize_account(account)
+    if account:
+        account_counter.reset(account)
@@ -2,19 +2,27 @@
 from django.urls import path, include
 # 导入当前应用的所有视图（已编写的类视图）
 from . import views
+from django.conf import settings
 from rest_framework.routers import DefaultRouter
 
 # 配置应用命名空间（关键：避免不同应用路由名称冲突）
 app_name = 'users'
+router = DefaultRouter()
 router.register(r'api/users', views.UserViewSet)  # 注册用户接口路由
 
+# ASGI部署时登录与密码重置使用异步视图（密码哈希在有界线程池中计算，见hashing.py）
+if getattr(settings, 'USERS_ASYNC_AUTH_VIEWS', False):
+    login_view, password_reset_view = views.AsyncUserLoginView, views.AsyncUserPasswordResetView
+else:
+    login_view, password_reset_view = views.UserLoginView, views.UserPasswordResetView
+
 # 路由列表：配置URL路径与视图的映射关系
 urlpatterns = [
     # 9.2.1 基础功能路由
     # 注册页：URL路径 /users/register/，映射UserRegisterView，路由名称 register
     path('register/', views.UserRegisterView.as_view(), name='register'),
-    # 登录页：URL路径 /users/login/，映射UserLoginView，路由名称 login
-    path('login/', views.UserLoginView.as_view(), name='login'),
+    # 登录页：URL路径 /users/login/，映射UserLoginView（异步部署为AsyncUserLoginView），路由名称 login
+    path('login/', login_view.as_view(), name='login'),
     # 退出登录：URL路径 /users/logout/，映射UserLogoutView，路由名称 logout
     path('logout/', views.UserLogoutView.as_view(), name='logout'),
 
@@ -25,14 +33,19 @@ urlpatterns = [
     path('profile/update/', views.UserProfileUpdateView.as_view(), name='profile_update'),
 
     # 9.2.3 密码重置功能路由
-    # 密码重置：URL路径 /users/password/reset/，映射UserPasswordResetView，路由名称 password_reset
-    path('password/reset/', views.UserPasswordResetView.as_view(), name='password_reset'),
+    # 密码重置：URL路径 /users/password/reset/，映射UserPasswordResetView（异步部署为AsyncUserPasswordResetView），路由名称 password_reset
+    path('password/reset/', password_reset_view.as_view(), name='password_reset'),
 
     # 9.2.4 管理员功能路由
     # 登录日志查询：URL路径 /users/login/logs/，映射LoginLogQueryView，路由名称 login_log_list
     path('login/logs/', views.LoginLogQueryView.as_view(), name='login_log_list'),
+    # 登录日志导出：URL路径 /users/login/logs/export/，映射LoginLogExportView，路由名称 login_log_export（流式CSV/NDJSON）
+    path('login/logs/export/', views.LoginLogExportView.as_view(), name='login_log_export'),
     # 用户状态管理（禁用/启用）：URL路径 /users/status/update/用户ID/，映射UserStatusUpdateView，路由名称 user_status_update
     path('status/update/<int:user_id>/', views.UserStatusUpdateView.as_view(), name='user_status_update'),
 
+    # 登录统计接口：URL路径 /users/api/login-stats/，映射LoginStatsApiView，路由名称 login_stats_api
+    path('api/login-stats/', views.LoginStatsApiView.as_view(), name='login_stats_api'),
+
     path('', include(router.urls)),  # 包含DRF路由
 ]
\ No newline at end of file
@@ -1,4 +1,5 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.http import Http404
 from django.views import View
 from django.views.generic import FormView
 from django.contrib.auth import login, logout, authenticate
@@ -7,9 +8,35 @@ from django.urls import reverse_lazy
 from django.contrib import messages
 from .forms import UserRegisterForm, UserLoginForm
 from .models import User, LoginLog
-from django.utils import timezone
+from .login_log import record_login, record_login_failure
+from .throttling import check_login_attempt, get_throttle_ip, record_failed_attempt, reset_login_failures
+from .archive import LoginLogPaginator, iter_archived_logs, parse_time_bound
+from .stats import query_login_stats
 import socket
 from apps.rbac.permissions import RbacApiPermission
+from apps.rbac.filters import RbacRowFilterBackend
+from apps.rbac.streaming import (
+    CSVStreamRenderer,
+    NDJSONStreamRenderer,
+    get_export_params,
+    iter_rows_by_pk,
+    streaming_export_response,
+)
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from rest_framework.serializers import ModelSerializer
+from rest_framework.views import APIView
+from rest_framework.viewsets import ModelViewSet
+from itertools import chain
+from datetime import date, timedelta
+from django.utils import timezone
+
+# 导出字段：登录日志（values_list字段、NDJSON键、CSV表头）与用户（与UserSerializer字段一致）
+LOGIN_LOG_EXPORT_FIELDS = ('id', 'user_id', 'user__username', 'login_ip', 'device', 'status', 'attempts', 'login_time')
+LOGIN_LOG_EXPORT_KEYS = ('id', 'user_id', 'username', 'login_ip', 'device', 'status', 'attempts', 'login_time')
+LOGIN_LOG_EXPORT_HEADERS = ('日志ID', '用户ID', '用户名', '登录IP', '登录设备', '登录状态', '尝试次数', '登录时间')
+USER_EXPORT_FIELDS = ('id', 'username', 'phone', 'email', 'is_active')
+USER_EXPORT_HEADERS = ('用户ID', '用户名', '手机号', '邮箱', '是否启用')
 
 # 辅助函数：获取用户登录IP
 def get_client_ip(request):
@@ -77,39 +104,44 @@ class UserLoginView(FormView):
         # 登录用户（Django内置login方法，创建session）
         login(self.request, user)
 
-        # 记录登录日志
-        LoginLog.objects.create(
-            user=user,
-            login_ip=get_client_ip(self.request),
-            login_time=timezone.now(),
-            device=get_client_device(self.request),
-            status=True  # 登录成功
-        )
+        # 记录登录日志（入队后由后台线程批量写入，见login_log.py）
+        record_login(user, get_client_ip(self.request), get_client_device(self.request), status=True)
+        # 登录成功，清除该账号的失败计数
+        reset_login_failures(self.request.POST.get('account'))
 
         # 添加成功提示
         messages.success(self.request, f'欢迎回来，{user.username}！')
         return super().form_valid(form)
 
+    # 提交登录表单：先按IP/账号滑动窗口限流，超限的尝试在查询数据库、计算密码哈希之前直接拒绝
+    # （IP取REMOTE_ADDR或可信代理追加的X-Forwarded-For地址，见throttling.get_throttle_ip）
+    def post(self, request, *args, **kwargs):
+        retry_after = check_login_attempt(get_throttle_ip(request), request.POST.get('account'))
+        if retry_after:
+            messages.error(request, f'登录尝试过于频繁，请{retry_after}秒后再试！')
+            return self.render_unbound(status=429, retry_after=retry_after)
+        return super().post(request, *args, **kwargs)
+
+    # 使用未绑定的表单渲染，避免模板读取form.errors时触发校验（查询用户、计算哈希）
+    def render_unbound(self, status, retry_after):
+        form = self.get_form_class()(initial={'account': self.request.POST.get('account', '')})
+        response = self.render_to_response(self.get_context_data(form=form), status=status)
+        response['Retry-After'] = str(retry_after)
+        return response
+
     # 表单验证失败后执行的逻辑
     def form_invalid(self, form):
-        # 记录失败日志（若账号存在）
-        account = self.request.POST.get('account')
-        try:
-            is_phone = self.request.POST.get('account').isdigit() and len(account) == 11
-            if is_phone:
-                user = User.objects.get(phone=account)
-            else:
-                user = User.objects.get(email=account)
-            # 记录登录失败日志
-            LoginLog.objects.create(
-                user=user,
-                login_ip=get_client_ip(self.request),
-                login_time=timezone.now(),
-                device=get_client_device(self.request),
-                status=False  # 登录失败
-            )
-        except User.DoesNotExist:
-            pass
+        # 计入该账号的一次失败（账号不存在同样计数，避免借此无限试探）
+        record_failed_attempt(self.request.POST.get('account'))
+        # 记录失败日志（若账号存在）：合并窗口内的连续失败只累加尝试次数
+        user = form.cleaned_data.get('account')
+        if not isinstance(user, User):
+            # clean_account未返回用户时按账号重新查询
+            account = self.request.POST.get('account', '')
+            is_phone = account.isdigit() and len(account) == 11
+            user = User.objects.filter(**{'phone' if is_phone else 'email': account}).first()
+        if user is not None:
+            record_login_failure(user, get_client_ip(self.request), get_client_device(self.request))
 
         # 添加错误提示
         messages.error(self.request, '登录失败，请检查账号、密码或验证码！')
@@ -195,49 +227,185 @@ class UserPasswordResetView(LoginRequiredMixin, View):
                 'form': form
             })
         
+from asgiref.sync import sync_to_async
+from django.contrib.auth.views import redirect_to_login
+from .forms import AsyncUserLoginForm, AsyncUserPasswordResetForm
+from .hashing import PasswordHashBusy, acheck_password, aset_password
+
+# 8.4 异步登录/密码重置视图（ASGI部署时使用，见urls.py）：
+# 密码哈希在有界线程池中计算（hashing.py），请求等待哈希期间不占用线程；
+# 哈希排队超时返回503，数据库读写、模板渲染等仍为同步代码，通过sync_to_async执行
+class AsyncUserLoginView(UserLoginView):
+    form_class = AsyncUserLoginForm  # 表单不校验密码，由视图异步校验
+    http_method_names = ['get', 'post', 'options']
+    # 哈希排队超时时建议客户端重试的等待秒数
+    busy_retry_after = 1
+
+    async def get(self, request, *args, **kwargs):
+        return await sync_to_async(super().get)(request, *args, **kwargs)
+
+    async def post(self, request, *args, **kwargs):
+        retry_after = await sync_to_async(check_login_attempt)(get_throttle_ip(request), request.POST.get('account'))
+        if retry_after:
+            messages.error(request, f'登录尝试过于频繁，请{retry_after}秒后再试！')
+            return await sync_to_async(self.render_unbound)(status=429, retry_after=retry_after)
+
+        form = self.get_form()
+        # 校验验证码、查询账号（不计算密码哈希）
+        if not await sync_to_async(form.is_valid)():
+            return await sync_to_async(self.form_invalid)(form)
+        try:
+            correct = await acheck_password(form.cleaned_data['account'], form.cleaned_data['password'])
+        except PasswordHashBusy:
+            messages.error(request, '登录人数较多，请稍后再试！')
+            return await sync_to_async(self.render_unbound)(status=503, retry_after=self.busy_retry_after)
+        if not correct:
+            form.add_error(None, '密码错误，请重新输入')
+            return await sync_to_async(self.form_invalid)(form)
+        return await sync_to_async(self.form_valid)(form)
+
+
+class AsyncUserPasswordResetView(View):
+    template_name = 'users/password_reset.html'
+    http_method_names = ['get', 'post', 'options']
+
+    @staticmethod
+    def _get_user(request):
+        # 读取request.user会查询session与用户表，需在同步线程中执行
+        user = request.user
+        return user if user.is_authenticated else None
+
+    def _render(self, request, form, status=200):
+        return render(request, self.template_name, {'form': form}, status=status)
+
+    async def get(self, request):
+        user = await sync_to_async(self._get_user)(request)
+        if user is None:
+            return redirect_to_login(request.get_full_path())
+        return await sync_to_async(self._render)(request, AsyncUserPasswordResetForm(user=user))
+
+    async def post(self, request):
+        user = await sync_to_async(self._get_user)(request)
+        if user is None:
+            return redirect_to_login(request.get_full_path())
+        form = AsyncUserPasswordResetForm(request.POST, user=user)
+        if await sync_to_async(form.is_valid)():
+            try:
+                correct = await acheck_password(user, form.cleaned_data['old_password'])
+                if correct:
+                    await aset_password(user, form.cleaned_data['new_password'])
+            except PasswordHashBusy:
+                messages.error(request, '当前请求较多，请稍后再试！')
+                return await sync_to_async(self._render)(request, form, status=503)
+            if correct:
+                # 重置密码后强制退出登录，要求重新登录
+                await sync_to_async(logout)(request)
+                messages.success(request, '密码重置成功，请使用新密码重新登录！')
+                return redirect('users:login')
+            form.add_error('old_password', '原密码错误，请重新输入')
+        messages.error(request, '密码重置失败，请检查表单信息！')
+        return await sync_to_async(self._render)(request, form)
+
 from django.contrib.auth.mixins import PermissionRequiredMixin
 from django.db.models import Q
 
+# 辅助函数：按查询参数筛选登录日志（日志查询页与导出共用）
+def filter_login_logs(params):
+    """
+    :return: (热表查询集, 归档筛选参数或None, 查询参数字典)
+    未指定时间范围时只查询热表；指定了时间范围时还需查询与该范围有交集的归档文件（已从热表删除的历史月份）
+    """
+    username = params.get('username', '')
+    status = params.get('status', '')
+    start_time = params.get('start_time', '')
+    end_time = params.get('end_time', '')
+
+    login_logs = LoginLog.objects.all()
+
+    # 按用户名筛选（模糊查询）
+    if username:
+        login_logs = login_logs.filter(user__username__icontains=username)
+
+    # 按登录状态筛选
+    if status in ['True', 'False']:
+        login_logs = login_logs.filter(status=(status == 'True'))
+
+    # 按时间范围筛选
+    if start_time:
+        login_logs = login_logs.filter(login_time__gte=start_time)
+    if end_time:
+        login_logs = login_logs.filter(login_time__lte=end_time)
+
+    archive_filters = None
+    if start_time or end_time:
+        archive_filters = {
+            'start': parse_time_bound(start_time),
+            'end': parse_time_bound(end_time),
+            'username': username,
+            'status': (status == 'True') if status in ['True', 'False'] else None,
+        }
+    query = {'username': username, 'status': status, 'start_time': start_time, 'end_time': end_time}
+    return login_logs, archive_filters, query
+
 # 8.4 登录日志查询视图（仅超级管理员/有查看权限的管理员可访问）
 class LoginLogQueryView(LoginRequiredMixin, PermissionRequiredMixin, View):
     # 权限要求：必须是超级管理员，或拥有查看登录日志的权限
     permission_required = 'users.view_loginlog'
     # 若权限不足，跳转至登录页（可自定义跳转地址）
     login_url = reverse_lazy('users:login')
+    # 每页显示条数
+    paginate_by = 20
 
     def get(self, request):
-        # 获取查询参数
-        username = request.GET.get('username', '')
-        status = request.GET.get('status', '')
-        start_time = request.GET.get('start_time', '')
-        end_time = request.GET.get('end_time', '')
-
-        # 初始化查询集
-        login_logs = LoginLog.objects.all()
+        # 按查询参数筛选（关联查询用户，避免模板中逐条查询用户名）
+        login_logs, archive_filters, query_params = filter_login_logs(request.GET)
+        login_logs = login_logs.select_related('user')
 
-        # 按用户名筛选（模糊查询）
-        if username:
-            login_logs = login_logs.filter(user__username__icontains=username)
-
-        # 按登录状态筛选
-        if status in ['True', 'False']:
-            login_logs = login_logs.filter(status=(status == 'True'))
+        # 按 (login_time, id) 键集分页：每页只读取固定条数，翻页成本不随页码增长
+        paginator = LoginLogPaginator(login_logs, self.paginate_by, archive_filters)
+        try:
+            page_obj = paginator.page(after=request.GET.get('after'), before=request.GET.get('before'))
+        except ValueError as e:
+            raise Http404(str(e))
 
-        # 按时间范围筛选
-        if start_time:
-            login_logs = login_logs.filter(login_time__gte=start_time)
-        if end_time:
-            login_logs = login_logs.filter(login_time__lte=end_time)
+        # 翻页链接保留查询条件
+        query = request.GET.copy()
+        query.pop('after', None)
+        query.pop('before', None)
 
         # 渲染日志查询模板，传递日志数据和查询参数
         return render(request, 'users/login_log_list.html', {
-            'login_logs': login_logs,
-            'username': username,
-            'status': status,
-            'start_time': start_time,
-            'end_time': end_time
+            'login_logs': page_obj.object_list,
+            'page_obj': page_obj,
+            'query_string': query.urlencode(),
+            'include_archives': archive_filters is not None and any(
+                getattr(log, 'archived', False) for log in page_obj.object_list
+            ),
+            **query_params,
         })
 
+# 8.4.1 登录日志导出视图（与日志查询页相同的筛选条件与权限，流式输出全部匹配日志）
+class LoginLogExportView(LoginRequiredMixin, PermissionRequiredMixin, View):
+    """
+    GET 参数同日志查询页，另支持 format=csv|ndjson、gzip=1；
+    热表按主键分批读取，指定时间范围时再追加归档文件中的匹配日志，内存占用与导出条数无关
+    """
+    permission_required = 'users.view_loginlog'
+    login_url = reverse_lazy('users:login')
+
+    def get(self, request):
+        login_logs, archive_filters, _ = filter_login_logs(request.GET)
+        fmt, compress = get_export_params(request.GET)
+        rows = iter_rows_by_pk(login_logs, LOGIN_LOG_EXPORT_FIELDS)
+        if archive_filters is not None:
+            rows = chain(rows, (
+                (log.id, log.user.id, log.user.username, log.login_ip, log.device, log.status, log.attempts, log.login_time)
+                for log in iter_archived_logs(**archive_filters)
+            ))
+        return streaming_export_response(
+            rows, LOGIN_LOG_EXPORT_KEYS, LOGIN_LOG_EXPORT_HEADERS, fmt, 'login_logs', compress
+        )
+
 # 8.5 用户状态管理视图（禁用/启用普通用户，仅超级管理员可访问）
 class UserStatusUpdateView(LoginRequiredMixin, PermissionRequiredMixin, View):
     permission_required = 'users.change_user'  # 拥有修改用户的权限
@@ -276,5 +444,46 @@ class UserViewSet(ModelViewSet):
     serializer_class = UserSerializer
     # 指定该接口所需的权限标识（与RBAC权限模型中的permission_code一致）
     required_permission_code = 'user_view'
+    # 按RBAC行级规则过滤可见用户（列表一条SQL完成授权，详情/修改经get_object()复用同一条件）
+    filter_backends = [RbacRowFilterBackend]
     # 若未配置DRF全局权限类，可在此处单独指定
-    # permission_classes = [RbacApiPermission]
\ No newline at end of file
+    # permission_classes = [RbacApiPermission]
+
+    # 流式导出当前用户可见的全部用户：GET /users/api/users/export/?format=csv|ndjson&gzip=1
+    # 权限标识与行级过滤与列表接口一致，按主键分批读取，内存占用与导出条数无关
+    @action(detail=False, methods=['get'], renderer_classes=[CSVStreamRenderer, NDJSONStreamRenderer])
+    def export(self, request):
+        fmt, compress = get_export_params(request.query_params)
+        rows = iter_rows_by_pk(self.filter_queryset(self.get_queryset()), USER_EXPORT_FIELDS)
+        return streaming_export_response(rows, USER_EXPORT_FIELDS, USER_EXPORT_HEADERS, fmt, 'users', compress)
+
+# 登录统计接口：读取预聚合的每日登录统计（汇总表 + 水位线之后尚未汇总的日志），不扫描整张登录日志表
+class LoginStatsApiView(APIView):
+    """
+    GET ?start=YYYY-MM-DD&end=YYYY-MM-DD（默认最近30天，最长366天）
+    by=device（默认，按日期/设备/状态）或 by=user（按日期/用户/状态，可选user_id）
+    """
+    required_permission_code = 'login_log_stats'
+    default_days = 30
+    max_days = 366
+
+    def get(self, request):
+        params = request.query_params
+        try:
+            end = date.fromisoformat(params['end']) if params.get('end') else timezone.localdate()
+            start = (
+                date.fromisoformat(params['start']) if params.get('start')
+                else end - timedelta(days=self.default_days - 1)
+            )
+            user_id = int(params['user_id']) if params.get('user_id') else None
+        except ValueError:
+            return Response({'detail': 'start/end须为YYYY-MM-DD格式的日期，user_id须为整数'}, status=400)
+        if start > end or (end - start).days >= self.max_days:
+            return Response({'detail': f'日期范围不合法（最长{self.max_days}天）'}, status=400)
+        by_user = params.get('by') == 'user'
+        return Response({
+            'start': start,
+            'end': end,
+            'by': 'user' if by_user else 'device',
+            'results': query_login_stats(start, end, by_user, user_id),
+        })
@@ -12,4 +12,9 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'django_cms.settings')
 
-application = get_asgi_application()
\ No newline at end of file
+application = get_asgi_application()
+
+# worker启动时预加载RBAC权限注册表（全部权限标识→权限ID/关联路由），首个请求无需再查询权限表
+from apps.rbac.registry import preload_permission_registry  # noqa: E402
+
+preload_permission_registry()
@@ -73,7 +73,7 @@ ROOT_URLCONF = "django_cms.urls"
 TEMPLATES = [
     {
         "BACKEND": "django.template.backends.django.DjangoTemplates",
-        "DIRS": [],
+        "DIRS": [BASE_DIR / "templates"],  # 项目级模板目录（base.html）
         "APP_DIRS": True,
         "OPTIONS": {
             "context_processors": [
@@ -160,9 +160,49 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication',
         'rest_framework.authentication.BasicAuthentication',
+        'apps.rbac.authentication.RbacTokenAuthentication',  # 新增：RBAC无状态令牌认证（Authorization: Rbac <令牌>）
     ],
     # 默认权限类（全局使用RBAC接口权限类）
     'DEFAULT_PERMISSION_CLASSES': [
         'apps.rbac.permissions.RbacApiPermission',
     ],
 }
+
+# RBAC页面级权限中间件的追加白名单：DRF接口不走页面级校验，由RbacApiPermission按权限标识校验
+RBAC_WHITE_LIST = ['/rbac/api/', '/users/api/']
+# RBAC访问令牌有效期（秒）、可刷新期限（秒）
+RBAC_TOKEN_MAX_AGE = 900
+RBAC_TOKEN_REFRESH_MAX_AGE = 86400
+# RBAC访问决策审计：拒绝决策全部记录，放行决策按比例抽样（0~1），由后台线程批量写入
+RBAC_AUDIT_ENABLED = True
+RBAC_AUDIT_ALLOW_SAMPLE_RATE = 0.01
+# RBAC权限注册表：各worker每隔多少秒检查一次权限目录版本号（其他worker的权限变更最迟在该间隔后生效）
+RBAC_REGISTRY_CHECK_INTERVAL = 1.0
+# RBAC进程内权限集缓存有效期（秒）：未配置共享缓存时，其他worker的角色/权限变更最迟在该时间后
+# 回落到缓存读取（缓存条目仍受RBAC_PERMS_CACHE_TIMEOUT限制）
+RBAC_LOCAL_PERMS_TTL = 5
+# 权限目录版本号存储位置：auto（未配置共享缓存时使用数据库版本表）/ cache / db
+RBAC_VERSION_SOURCE = 'auto'
+# rbac_discover_routes默认扫描的路由命名空间（按命名路由自动生成权限）
+RBAC_DISCOVER_NAMESPACES = ('users', 'rbac')
+# 登录日志：默认入队后由后台线程批量写入；测试环境可设为True同步写入
+LOGIN_LOG_SYNC = False
+# 登录日志归档：热表保留最近几个月（含当月），更早的已关闭月份由 login_log_archive 转存为压缩文件后从热表删除
+LOGIN_LOG_RETENTION_MONTHS = 3
+LOGIN_LOG_ARCHIVE_DIR = os.path.join(BASE_DIR, 'archive', 'login_logs')
+# 登录统计汇总：login_stat_rollup 每个事务处理的日志ID跨度、安全延迟（秒）
+LOGIN_STAT_BATCH_SIZE = 50000
+LOGIN_STAT_SAFETY_LAG = 60
+# 登录限流（滑动窗口）：每个IP的尝试次数上限、每个账号的失败次数上限，格式为 (次数, 窗口秒数)
+LOGIN_THROTTLE_IP_RATE = (30, 300)
+LOGIN_THROTTLE_ACCOUNT_RATE = (5, 900)
+# 登录限流信任的反向代理层数（部署在Nginx等代理之后时设为代理层数，否则按REMOTE_ADDR计数）
+LOGIN_THROTTLE_TRUSTED_PROXIES = 0
+# 同一用户、同一IP在该窗口（秒）内的连续登录失败合并为一条日志记录
+LOGIN_FAILURE_MERGE_WINDOW = 900
+# 登录/密码重置使用异步视图（ASGI部署时设为True），密码哈希在有界线程池中计算：
+# 线程数（同时计算哈希的上限）、排队数（超出线程数后允许等待的请求数）、排队等待超时（秒，超时返回503）
+USERS_ASYNC_AUTH_VIEWS = False
+PASSWORD_HASH_WORKERS = 4
+PASSWORD_HASH_QUEUE_SIZE = 32
+PASSWORD_HASH_TIMEOUT = 5.0
@@ -57,7 +57,7 @@ ROOT_URLCONF = "django_cms.urls"
 TEMPLATES = [
     {
         "BACKEND": "django.template.backends.django.DjangoTemplates",
-        "DIRS": [],
+        "DIRS": [BASE_DIR / "templates"],  # 项目级模板目录（base.html）
         "APP_DIRS": True,
         "OPTIONS": {
             "context_processors": [
@@ -89,6 +89,7 @@ DATABASES = {
             'charset': 'utf8mb4',  # 支持所有中文编码，避免乱码
         }
     }
+}
 
 
 # Password validation
@@ -170,4 +171,24 @@ LOGGING = {
             'propagate': True,
         },
     },
-}
\ No newline at end of file
+}
+
+# DRF全局配置（与开发环境一致）
+REST_FRAMEWORK = {
+    # 默认认证类：会话认证 + RBAC无状态令牌认证（Authorization: Rbac <令牌>）
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'rest_framework.authentication.SessionAuthentication',
+        'rest_framework.authentication.BasicAuthentication',
+        'apps.rbac.authentication.RbacTokenAuthentication',
+    ],
+    # 默认权限类（全局使用RBAC接口权限类）
+    'DEFAULT_PERMISSION_CLASSES': [
+        'apps.rbac.permissions.RbacApiPermission',
+    ],
+}
+
+# RBAC页面级权限中间件的追加白名单：DRF接口不走页面级校验，由RbacApiPermission按权限标识校验
+RBAC_WHITE_LIST = ['/rbac/api/', '/users/api/']
+# RBAC访问令牌有效期（秒）、可刷新期限（秒）
+RBAC_TOKEN_MAX_AGE = 900
+RBAC_TOKEN_REFRESH_MAX_AGE = 86400
@@ -17,4 +17,9 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'django_cms.settings')
 # 方式2：手动指定生产环境（线上部署时可使用，注释方式1，启用该方式）
 # os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'django_cms.settings.prod')
 
-application = get_wsgi_application()
\ No newline at end of file
+application = get_wsgi_application()
+
+# worker启动时预加载RBAC权限注册表（全部权限标识→权限ID/关联路由），首个请求无需再查询权限表
+from apps.rbac.registry import preload_permission_registry  # noqa: E402
+
+preload_permission_registry()